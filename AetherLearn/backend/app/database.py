@@ -47,6 +47,8 @@ async def init_db():
         
         try:
             await db.learning_paths.create_index("query")
+            # Cross-worker learning path cache lookups (newest path per canonical query)
+            await db.learning_paths.create_index([("cache_key", 1), ("created_at", -1)])
             print("Created learning_paths query index")
         except Exception as e:
             print(f"Learning paths index creation failed (may already exist): {e}")
@@ -108,7 +110,9 @@ async def ensure_real_data_collections():
             'learning_paths',
             'search_status',
             'saved_courses',
-            'vertex_ai_content'  # For caching real search results
+            'vertex_ai_content',  # For caching real search results
+            'llm_response_cache',  # Content-addressed Gemini responses
+            'resource_features'  # Per-URL derived features and Gemini labels
         ]
         
         existing_collections = await db.list_collection_names()
@@ -122,10 +126,27 @@ async def ensure_real_data_collections():
         try:
             await db.vertex_ai_content.create_index("query")
             await db.vertex_ai_content.create_index("created_at")
+            # Search result cache: one entry per key, removed by MongoDB once expires_at passes
+            await db.vertex_ai_content.create_index("cache_key", unique=True, sparse=True)
+            await db.vertex_ai_content.create_index("expires_at", expireAfterSeconds=0)
             print("📚 Created Vertex AI content indexes")
         except Exception as e:
             print(f"⚠️ Failed to create Vertex AI indexes: {e}")
         
+        try:
+            await db.llm_response_cache.create_index("cache_key", unique=True)
+            await db.llm_response_cache.create_index("expires_at", expireAfterSeconds=0)
+            print("📚 Created LLM response cache indexes")
+        except Exception as e:
+            print(f"⚠️ Failed to create LLM response cache indexes: {e}")
+        
+        try:
+            await db.resource_features.create_index("canonical_url", unique=True)
+            await db.resource_features.create_index("expires_at", expireAfterSeconds=0)
+            print("📚 Created resource feature store indexes")
+        except Exception as e:
+            print(f"⚠️ Failed to create resource feature store indexes: {e}")
+        
     except Exception as e:
         print(f"⚠️ Failed to ensure real data collections: {e}")
 
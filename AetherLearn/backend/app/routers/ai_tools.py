@@ -14,6 +14,7 @@ from models.ai_tools import (
 )
 from utils.vertex_ai import VertexAIClient
 from utils.intelligent_flashcard_generator import IntelligentFlashcardGenerator
+from utils.llm_response_cache import bypass_llm_cache
 # Removed User import - using simple test class instead
 
 logger = logging.getLogger(__name__)
@@ -95,7 +96,8 @@ async def generate_flashcards(
         "options": {
             "num_cards": 10,
             "difficulty": "beginner|intermediate|advanced",
-            "save": true|false
+            "save": true|false,
+            "fresh": true|false
         },
         "user_id": "user_identifier"
     }
@@ -139,10 +141,12 @@ async def generate_flashcards(
             }
             
             # Generate with the Gemini API-powered intelligent system
-            generation_result = await flashcard_generator.generate_flashcards(
-                input_data=request.content,
-                options=generation_options
-            )
+            # ("fresh": true regenerates instead of reusing a cached response for the same text)
+            with bypass_llm_cache(bool(options.get("fresh", False))):
+                generation_result = await flashcard_generator.generate_flashcards(
+                    input_data=request.content,
+                    options=generation_options
+                )
             
             # Extract flashcards and metadata
             flashcards_data = generation_result.get("flashcards", [])
@@ -15,11 +15,13 @@ from models.learning_path import (
 from app.routers.auth import get_current_active_user
 from models.user import User
 from utils.search_manager import SearchManager
-from utils.vertex_ai import VertexAIClient
+from utils.vertex_ai import VertexAIClient, GENERATION_MODES
 from utils.pdf_generator import PDFGenerator
+from utils.cache_warmer import CacheWarmer
 
 router = APIRouter()
 search_manager = SearchManager()
+cache_warmer = CacheWarmer(search_manager)
 vertex_ai = VertexAIClient()
 pdf_generator = PDFGenerator()
 
@@ -47,6 +49,10 @@ async def create_learning_path(
     # Extract data from request
     query = request_data.get("query")
     preferences = request_data.get("preferences", {})
+    # Optional: "one_shot" (single Gemini call) or "two_call"; defaults to COURSE_GENERATION_MODE
+    generation_mode = request_data.get("generation_mode")
+    # Optional: skip cached learning paths and LLM responses
+    fresh = bool(request_data.get("fresh", False))
     
     if not query:
         raise HTTPException(
@@ -54,9 +60,18 @@ async def create_learning_path(
             detail="Query is required"
         )
     
+    if generation_mode is not None and generation_mode not in GENERATION_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"generation_mode must be one of: {', '.join(GENERATION_MODES)}"
+        )
+    
     search_id = str(uuid.uuid4())
     user_id = None  # No user authentication for public endpoint
     
+    # Count the query towards popularity for the cache warmer
+    cache_warmer.record_query(query, preferences)
+    
     # Store query data for mock testing (when database unavailable)
     mock_search_data[search_id] = {
         "query": query,
@@ -64,6 +79,9 @@ async def create_learning_path(
         "created_at": datetime.utcnow()
     }
     
+    # Popular and repeated queries are answered from the (pre-warmed) learning path cache
+    cached_learning_path_id = None if fresh else await search_manager.get_cached_learning_path_id(query, preferences)
+    
     # Create status document (only if database is available)
     status_doc = {
         "search_id": search_id,
@@ -75,6 +93,13 @@ async def create_learning_path(
         "updated_at": datetime.utcnow(),
         "message": "Search initiated"
     }
+    if cached_learning_path_id is not None:
+        status_doc.update({
+            "status": "COMPLETED",
+            "progress": 100,
+            "message": "Learning path retrieved from cache",
+            "learning_path_id": cached_learning_path_id
+        })
     
     # Try to insert status into database if available
     try:
@@ -84,22 +109,56 @@ async def create_learning_path(
         print(f"Database insert failed: {e}")
         # Continue without database for testing
     
+    if cached_learning_path_id is not None:
+        await search_manager.update_search_status(
+            search_id,
+            SearchStatusUpdate(
+                status="COMPLETED",
+                progress=100,
+                message="Learning path retrieved from cache",
+                learning_path_id=cached_learning_path_id
+            )
+        )
+        return {"search_id": search_id, "message": "Search initiated successfully"}
+    
+    # Attach to an identical in-flight search instead of starting another pipeline
+    leader_search_id = await search_manager.coalesce_search(search_id, query, preferences)
+    if leader_search_id is not None:
+        print(f"🔗 Search '{query}' attached to in-flight search {leader_search_id}")
+        return {"search_id": search_id, "message": "Search initiated successfully"}
+    
     # Start the REAL Vertex AI search process (Production Implementation)
+    # as a tracked task so it can be cancelled when the client abandons the search
     try:
-        background_tasks.add_task(
-            search_manager.process_search,
+        search_manager.start_search(
             search_id=search_id,
             query=query,
             user_id=user_id,
-            preferences=preferences
+            preferences=preferences,
+            generation_mode=generation_mode,
+            fresh=fresh
         )
         print(f"✅ Real Vertex AI search process started for query: '{query}'")
     except Exception as e:
         print(f"❌ Failed to start search process: {e}")
+        search_manager.release_flight(search_id)
         # Continue anyway - the status endpoint will handle fallbacks
     
     return {"search_id": search_id, "message": "Search initiated successfully"}
 
+@router.delete("/search/{search_id}")
+async def cancel_search(search_id: str):
+    """
+    Cancel a running learning path search (in-flight LLM calls are cancelled with it).
+    """
+    cancelled = await search_manager.cancel_search(search_id)
+    if not cancelled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No running search with ID {search_id}"
+        )
+    return {"search_id": search_id, "message": "Search cancelled"}
+
 @router.get("/status/{search_id}")
 async def get_search_status(search_id: str):
     """
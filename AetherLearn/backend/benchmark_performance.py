@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+AetherLearn Backend Performance Benchmarks
+Compares pipeline implementations on latency and token usage.
+
+Usage:
+    python benchmark_performance.py [benchmark ...] [--runs N] [--query "..."]
+
+Benchmarks:
+    course_generation   two-call vs one-shot course generation (needs GEMINI_API_KEY)
+    json_parsing        shared streaming JSON parser vs the previous ad-hoc parsers (offline)
+    keyword_signals     single-pass keyword engine vs the previous per-keyword scans (offline)
+    ranking             columnar NumPy ranking engine vs the previous per-item scoring (offline)
+    near_duplicates     batch MinHash/LSH suppression vs exact pairwise Jaccard (offline)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Used when Custom Search is not configured, so runs are comparable across machines
+SAMPLE_SEARCH_RESULTS = [
+    {"title": "Python Tutorial - W3Schools", "link": "https://www.w3schools.com/python/", "snippet": "Well organized and easy to understand Web building tutorials with lots of examples of how to use HTML, CSS, JavaScript, SQL, Python.", "displayLink": "www.w3schools.com"},
+    {"title": "The Python Tutorial — Python 3 documentation", "link": "https://docs.python.org/3/tutorial/", "snippet": "This tutorial introduces the reader informally to the basic concepts and features of the Python language and system.", "displayLink": "docs.python.org"},
+    {"title": "Python for Beginners - Full Course [Programming Tutorial]", "link": "https://www.youtube.com/watch?v=eWRfhZUzrAc", "snippet": "Learn the Python programming language in this full course for beginners.", "displayLink": "www.youtube.com"},
+    {"title": "Learn Python - Free Interactive Python Tutorial", "link": "https://www.learnpython.org/", "snippet": "Whether you are an experienced programmer or not, this website is intended for everyone who wishes to learn the Python programming language.", "displayLink": "www.learnpython.org"},
+    {"title": "Python for Everybody Specialization - Coursera", "link": "https://www.coursera.org/specializations/python", "snippet": "This Specialization builds on the success of the Python for Everybody course and will introduce fundamental programming concepts.", "displayLink": "www.coursera.org"},
+    {"title": "Download Python | Python.org", "link": "https://www.python.org/downloads/", "snippet": "The official home of the Python Programming Language. Download the latest version.", "displayLink": "www.python.org"},
+    {"title": "Python Exercises, Practice, Solution - w3resource", "link": "https://www.w3resource.com/python-exercises/", "snippet": "Python Exercises, Practice, Solution: Practice with solution of exercises on Python basic, data types, control flow and more.", "displayLink": "www.w3resource.com"},
+    {"title": "Real Python Tutorials", "link": "https://realpython.com/", "snippet": "Learn Python online: Python tutorials for developers of all skill levels, Python books and courses, Python news, code examples, articles, and more.", "displayLink": "realpython.com"},
+    {"title": "Python 3.13 released with experimental JIT - tech news", "link": "https://news.example.com/python-313-released", "snippet": "The Python Software Foundation announced the release of Python 3.13 today.", "displayLink": "news.example.com"},
+    {"title": "Introduction to Computer Science and Programming Using Python | edX", "link": "https://www.edx.org/learn/python/massachusetts-institute-of-technology-introduction-to-computer-science-and-programming-using-python", "snippet": "An introduction to computer science as a tool to solve real-world analytical problems using Python 3.5.", "displayLink": "www.edx.org"},
+]
+
+
+def summarize(samples):
+    """Median / min / max of a list of numbers"""
+    if not samples:
+        return "n/a"
+    return f"median {statistics.median(samples):8.1f}  min {min(samples):8.1f}  max {max(samples):8.1f}"
+
+
+def _token_totals(gateway, operations):
+    """Prompt/output token totals recorded by the LLM gateway for the given operations"""
+    snapshot = gateway.snapshot()["operations"]
+    prompt = sum(snapshot.get(op, {}).get("prompt_tokens", 0) for op in operations)
+    output = sum(snapshot.get(op, {}).get("output_tokens", 0) for op in operations)
+    return prompt, output
+
+
+async def benchmark_course_generation(args):
+    """Two-call (categorize + structure) vs one-shot course generation"""
+    runs, query = args.runs, args.query
+    print("\n📚 Course generation: two_call vs one_shot")
+    print("-" * 50)
+
+    if not os.getenv("GEMINI_API_KEY"):
+        print("❌ GEMINI_API_KEY is required for this benchmark")
+        return False
+
+    from utils.vertex_ai import VertexAIClient, get_llm_gateway
+    from utils.url_canonicalizer import canonicalize_results
+
+    client = VertexAIClient()
+    gateway = get_llm_gateway()
+
+    search_results = SAMPLE_SEARCH_RESULTS
+    if os.getenv("SEARCH_API_KEY") and os.getenv("SEARCH_ENGINE_ID"):
+        from utils.custom_search_client import get_custom_search_client
+        try:
+            live_results = await get_custom_search_client().search_items(query)
+            if live_results:
+                search_results = live_results
+                print(f"✅ Using {len(live_results)} live search results for '{query}'")
+        except Exception as e:
+            print(f"⚠️  Live search failed ({e}), using bundled sample results")
+        finally:
+            await get_custom_search_client().close()
+    search_results = canonicalize_results(search_results)
+    print(f"Resources per run: {len(search_results)}, runs per mode: {runs}")
+
+    modes = {
+        "two_call": ["categorize", "course_generation"],
+        "one_shot": ["course_one_shot"]
+    }
+    results = {}
+    for mode, operations in modes.items():
+        latencies, prompt_tokens, output_tokens, module_counts = [], [], [], []
+        for _ in range(runs):
+            before = _token_totals(gateway, operations)
+            started = time.perf_counter()
+            if mode == "two_call":
+                categorized = await client.categorize_resources(search_results, query)
+                course = await client.generate_course_from_search_results(query, categorized, {})
+            else:
+                course, _ = await client.generate_course_one_shot(query, search_results, {})
+            latencies.append((time.perf_counter() - started) * 1000)
+            after = _token_totals(gateway, operations)
+            prompt_tokens.append(after[0] - before[0])
+            output_tokens.append(after[1] - before[1])
+            module_counts.append(len(course.get("modules", [])))
+        results[mode] = (latencies, prompt_tokens, output_tokens, module_counts)
+
+        print(f"\n{mode}")
+        print(f"  latency ms     : {summarize(latencies)}")
+        print(f"  prompt tokens  : {summarize(prompt_tokens)}")
+        print(f"  output tokens  : {summarize(output_tokens)}")
+        print(f"  modules        : {summarize(module_counts)}")
+
+    two_call_latency = statistics.median(results["two_call"][0])
+    one_shot_latency = statistics.median(results["one_shot"][0])
+    two_call_tokens = statistics.median([p + o for p, o in zip(results["two_call"][1], results["two_call"][2])])
+    one_shot_tokens = statistics.median([p + o for p, o in zip(results["one_shot"][1], results["one_shot"][2])])
+    print(f"\none_shot vs two_call: latency {one_shot_latency / two_call_latency:.2f}x")
+    if two_call_tokens:
+        print(f"one_shot vs two_call: total tokens {one_shot_tokens / two_call_tokens:.2f}x")
+    return True
+
+
+def _legacy_clean_json_response(response):
+    """Previous VertexAIClient._clean_json_response (reachable part)"""
+    response = response.replace("```json", "").replace("```", "").strip()
+    lines = [line.strip() for line in response.split('\n')]
+    return '\n'.join(line for line in lines if line and not line.startswith('#') and not line.startswith('//'))
+
+
+def _legacy_parse_ai_response(response_text):
+    """Previous IntelligentFlashcardGenerator._parse_ai_response (parsing steps only)"""
+    cleaned_response = response_text.strip()
+    if "```json" in cleaned_response:
+        start_idx = cleaned_response.find("```json") + len("```json")
+        end_idx = cleaned_response.find("```", start_idx)
+        cleaned_response = cleaned_response[start_idx:end_idx].strip() if end_idx > start_idx else cleaned_response[start_idx:].strip()
+    elif "```" in cleaned_response:
+        json_match = re.search(r'\{.*\}', cleaned_response, re.DOTALL)
+        if json_match:
+            cleaned_response = json_match.group(0)
+    if cleaned_response.endswith('...'):
+        brace_count, last_valid_pos = 0, 0
+        for i, char in enumerate(cleaned_response):
+            if char == '{':
+                brace_count += 1
+            elif char == '}':
+                brace_count -= 1
+                if brace_count == 0:
+                    last_valid_pos = i + 1
+        if last_valid_pos > 0:
+            cleaned_response = cleaned_response[:last_valid_pos]
+    return json.loads(cleaned_response)
+
+
+def _sample_course_response(modules):
+    """Fenced course JSON shaped like a course_generation response"""
+    course = {
+        "title": "Complete Python Programming Path",
+        "description": "From first steps to \"real\" projects: {syntax}, [data structures] and tooling.",
+        "estimated_hours": 40.5,
+        "difficulty": "beginner",
+        "modules": [
+            {
+                "id": f"module_{m + 1}",
+                "title": f"Module {m + 1}: Topic {m + 1}",
+                "description": "What students will learn in this module, with {braces} and [brackets] in prose.",
+                "estimated_hours": 3.0,
+                "resources": [
+                    {**resource, "type": "article", "difficulty": "beginner", "estimated_time_minutes": 45}
+                    for resource in SAMPLE_SEARCH_RESULTS[m % 7:m % 7 + 3]
+                ]
+            }
+            for m in range(modules)
+        ]
+    }
+    return course, "```json\n" + json.dumps(course, indent=2, ensure_ascii=False) + "\n```\n"
+
+
+def _time_ms(function, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def benchmark_json_parsing(args):
+    """Shared streaming JSON parser vs the previous ad-hoc parsers on large responses"""
+    from utils.json_stream_parser import JSONArrayStreamParser, parse_json_response
+
+    print("\n🧩 JSON parsing: previous parsers vs utils.json_stream_parser")
+    print("-" * 50)
+    runs = max(args.runs, 20)
+    course, response = _sample_course_response(200)
+    flashcard_response = response.replace('"modules"', '"flashcards"')
+    print(f"Response size: {len(response) / 1024:.0f} KB, {len(course['modules'])} modules, runs: {runs}")
+
+    def legacy_course():
+        return json.loads(_legacy_clean_json_response(response))
+
+    def stream_chunks(chunk_size=256):
+        parser = JSONArrayStreamParser("modules")
+        modules = []
+        for start in range(0, len(response), chunk_size):
+            modules.extend(parser.feed(response[start:start + chunk_size]))
+        return modules
+
+    assert legacy_course() == course and parse_json_response(response) == course
+    assert stream_chunks() == course["modules"]
+
+    timings = {
+        "legacy _clean_json_response + json.loads": _time_ms(legacy_course, runs),
+        "legacy _parse_ai_response": _time_ms(lambda: _legacy_parse_ai_response(flashcard_response), runs),
+        "parse_json_response": _time_ms(lambda: parse_json_response(response), runs),
+        "JSONArrayStreamParser (256-char chunks)": _time_ms(stream_chunks, runs)
+    }
+    for name, samples in timings.items():
+        print(f"  {name:<42}: {summarize(samples)} ms")
+
+    # Output cut off by max_output_tokens at 60% of the document
+    truncated = response[:int(len(response) * 0.6)]
+    try:
+        legacy_recovered = len(json.loads(_legacy_clean_json_response(truncated))["modules"])
+    except json.JSONDecodeError:
+        legacy_recovered = 0
+    recovered = parse_json_response(truncated) or {}
+    print(f"\nTruncated response (60%): legacy recovered {legacy_recovered} modules, "
+          f"parse_json_response recovered {len(recovered.get('modules', []))}")
+
+    # Prose before the fence ("Here is your course:")
+    with_prose = "Here is your course:\n" + response
+    try:
+        legacy_prose = json.loads(_legacy_clean_json_response(with_prose)) == course
+    except json.JSONDecodeError:
+        legacy_prose = False
+    print(f"Leading prose: legacy parsed={legacy_prose}, parse_json_response parsed={parse_json_response(with_prose) == course}")
+    return True
+
+
+def _legacy_keyword_signals(url, title, description, subject_keywords):
+    """Previous per-keyword substring scans for the signals utils.keyword_engine.analyze_resource emits"""
+    url_lower, title_lower, desc_lower = url.lower(), title.lower(), description.lower()
+    text = (title + " " + description).lower()
+
+    def basic_type():
+        if any(d in url_lower for d in ['youtube.com', 'vimeo.com', 'ted.com']) or 'video' in title_lower:
+            return "video"
+        if any(d in url_lower for d in ['coursera.org', 'edx.org', 'udacity.com', 'khanacademy.org']) or 'course' in title_lower:
+            return "course"
+        if 'docs.' in url_lower or any(t in title_lower for t in ['documentation', 'api reference', 'guide']):
+            return "documentation"
+        if any(t in title_lower for t in ['tutorial', 'hands-on', 'practice', 'exercise', 'lab']):
+            return "interactive"
+        if any(d in url_lower for d in ['arxiv.org', 'ieee.org', 'acm.org', 'researchgate.net']):
+            return "academic"
+        return "article"
+
+    def enhanced_type():
+        for resource_type, indicators in (("video", ["youtube.com", "vimeo.com", "video", "watch"]),):
+            if any(i in url_lower for i in indicators):
+                return resource_type
+        course = ["course", "coursera.org/learn", "udemy.com/course", "edx.org/course", "class", "curriculum"]
+        if any(i in url_lower for i in course) or any(i in title_lower for i in course):
+            return "course"
+        for resource_type, indicators in (
+            ("interactive", ["github.com", "codepen.io", "repl.it", "interactive", "playground", "tutorial"]),
+            ("documentation", ["docs.", "/docs", "documentation", "reference", "api"]),
+            ("academic", [".edu", "arxiv.org", "research", "paper", "journal", "academic"])
+        ):
+            if any(i in url_lower for i in indicators):
+                return resource_type
+        if any(i in title_lower or i in desc_lower for i in ["tutorial", "how-to", "guide", "step-by-step"]):
+            return "tutorial"
+        return "article"
+
+    def basic_difficulty():
+        if any(t in text for t in ['beginner', 'introduction', 'basics', 'getting started', 'fundamentals']):
+            return "beginner"
+        if any(t in text for t in ['advanced', 'expert', 'deep dive', 'mastery', 'professional']):
+            return "advanced"
+        return "intermediate"
+
+    def enhanced_difficulty():
+        beginner = ['beginner', 'introduction', 'intro', 'basic', 'basics', 'start', 'starting', 'fundamental',
+                    'fundamentals', '101', 'starter', 'novice', 'first steps', 'getting started', 'learn', 'learning',
+                    'simple', 'easy']
+        advanced = ['advanced', 'expert', 'complex', 'deep dive', 'mastering', 'master', 'professional', 'comprehensive',
+                    'in-depth', 'optimization', 'architecture', 'enterprise', 'production', 'scaling', 'performance']
+        beginner_score = sum(2 if w in title.lower() else 1 for w in beginner if w in text)
+        advanced_score = sum(2 if w in title.lower() else 1 for w in advanced if w in text)
+        intermediate_score = sum(1 for w in ['intermediate', 'practical', 'application', 'implement'] if w in text)
+        if advanced_score > beginner_score and advanced_score > intermediate_score:
+            return "advanced"
+        return "beginner" if beginner_score > 0 else "intermediate"
+
+    basic_type()  # _estimate_time re-ran type detection
+    return {
+        "resource_type": basic_type(),
+        "resource_type_enhanced": enhanced_type() if url else "article",
+        "difficulty": basic_difficulty(),
+        "difficulty_enhanced": enhanced_difficulty(),
+        "subjects": [s for s, keywords in subject_keywords.items() if any(k in text for k in keywords)]
+    }
+
+
+async def benchmark_keyword_signals(args):
+    """Single-pass Aho-Corasick keyword engine vs the previous per-keyword scans, per resource"""
+    from functools import partial
+    from utils.keyword_engine import analyze_resource, keyword_engine, SUBJECT_KEYWORDS
+
+    count = 10000
+    resources = [
+        (f"{r['link']}?page={i}", f"{r['title']} (part {i})", r["snippet"])
+        for i, r in ((i, SAMPLE_SEARCH_RESULTS[i % len(SAMPLE_SEARCH_RESULTS)]) for i in range(count))
+    ]
+    print("\n🔎 Keyword signals: previous per-keyword scans vs utils.keyword_engine")
+    print("-" * 50)
+    print(f"Resources: {count:,}, keywords: {len(keyword_engine.keywords)}, automaton states: {keyword_engine.state_count}")
+
+    legacy_signals = partial(_legacy_keyword_signals, subject_keywords=SUBJECT_KEYWORDS)
+    for url, title, description in resources[:200]:
+        signals = analyze_resource(url, title, description)
+        assert {key: signals[key] for key in ("resource_type", "resource_type_enhanced", "difficulty",
+                                              "difficulty_enhanced", "subjects")} == legacy_signals(url, title, description)
+
+    def per_resource_us(function):
+        samples = []
+        for _ in range(max(args.runs, 5)):
+            analyze_resource.cache_clear()
+            started = time.perf_counter()
+            for resource in resources:
+                function(*resource)
+            samples.append((time.perf_counter() - started) / count * 1e6)
+        return samples
+
+    def memoized():
+        for resource in resources:
+            analyze_resource(*resource)
+
+    cold = per_resource_us(analyze_resource)
+    legacy = per_resource_us(legacy_signals)
+    memoized()
+    warm = [ms * 1000 / count for ms in _time_ms(memoized, max(args.runs, 5))]
+    print(f"  {'previous per-keyword scans':<42}: {summarize(legacy)} us/resource")
+    print(f"  {'keyword engine (single pass)':<42}: {summarize(cold)} us/resource")
+    print(f"  {'keyword engine (memoized repeat)':<42}: {summarize(warm)} us/resource")
+    print(f"\nkeyword engine vs previous: {statistics.median(legacy) / statistics.median(cold):.2f}x faster per new resource")
+    return True
+
+
+# Content type weights for the offline ranking benchmark (same table as VertexAIClient)
+RANKING_TYPE_WEIGHTS = {
+    "course": 1.0, "documentation": 0.95, "academic": 0.90, "interactive": 0.85, "video": 0.80, "article": 0.75,
+    "tutorial": 0.80, "reference": 0.70, "blog": 0.60, "forum": 0.50, "unknown": 0.40
+}
+
+
+def _legacy_item_score(item):
+    """Previous VertexAIClient._calculate_item_score"""
+    type_weight = RANKING_TYPE_WEIGHTS.get(item.get("resource_type", "unknown"), 0.5)
+    return (item.get("quality_score", 0.5) * 0.4) + (item.get("credibility_score", 0.5) * 0.3) + (type_weight * 0.3)
+
+
+def _legacy_final_ranking(content_items, preferences):
+    """Previous VertexAIClient._apply_final_ranking"""
+    for item in content_items:
+        base_score = _legacy_item_score(item)
+        preference_bonus = 0.0
+        if "learning_style" in preferences:
+            preference_bonus += len(set(item.get("learning_styles", [])) & set(preferences["learning_style"])) * 0.1
+        if "difficulty" in preferences and item.get("difficulty") == preferences["difficulty"]:
+            preference_bonus += 0.15
+        if "preferred_time_range" in preferences:
+            item_time, time_range = item.get("estimated_time_minutes", 30), preferences["preferred_time_range"]
+            if (time_range == "short" and item_time <= 30) or (time_range == "medium" and 30 < item_time <= 90) \
+                    or (time_range == "long" and item_time > 90):
+                preference_bonus += 0.1
+        item["final_score"] = min(1.0, base_score + preference_bonus)
+    return sorted(content_items, key=lambda x: x.get("final_score", 0), reverse=True)
+
+
+def _legacy_content_diversity(content_items, preferences, max_content_items):
+    """Previous VertexAIClient._ensure_content_diversity"""
+    from utils.ranking_engine import RankingEngine
+    if len(content_items) <= 10:
+        return content_items
+    resources_by_type = {}
+    for item in content_items:
+        resources_by_type.setdefault(item.get("resource_type", "article"), []).append(item)
+    max_items = min(max_content_items, len(content_items))
+    diverse_items = []
+    for content_type, target_pct in RankingEngine.type_targets(preferences).items():
+        if content_type in resources_by_type:
+            target_count = max(1, int(max_items * target_pct))
+            items = resources_by_type[content_type]
+            items.sort(key=lambda x: _legacy_item_score(x), reverse=True)
+            diverse_items.extend(items[:target_count])
+            resources_by_type[content_type] = items[target_count:]
+    remaining_slots = max_items - len(diverse_items)
+    if remaining_slots > 0:
+        remaining_items = [item for items in resources_by_type.values() for item in items]
+        remaining_items.sort(key=lambda x: _legacy_item_score(x), reverse=True)
+        diverse_items.extend(remaining_items[:remaining_slots])
+    return diverse_items[:max_items]
+
+
+def _ranking_candidates(count, seed=7):
+    """Synthetic candidates with the fields the ranking reads (many score ties, like real results)"""
+    import random
+    rng = random.Random(seed)
+    types = ["video", "article", "course", "interactive", "documentation", "academic", "tutorial"]
+    styles = ["visual", "auditory", "kinesthetic", "reading"]
+    return [
+        {
+            "title": f"Resource {i}",
+            "quality_score": rng.choice([0.5, 0.7, 0.9, round(rng.random(), 3)]),
+            "credibility_score": rng.choice([0.6, 0.75, 0.95]),
+            "resource_type": rng.choice(types),
+            "learning_styles": rng.sample(styles, rng.randint(1, 3)),
+            "difficulty": rng.choice(["beginner", "intermediate", "advanced"]),
+            "estimated_time_minutes": rng.choice([10, 20, 45, 90, 180])
+        }
+        for i in range(count)
+    ]
+
+
+async def benchmark_ranking(args):
+    """Columnar NumPy ranking engine vs the previous per-item scoring (final ranking + diversity)"""
+    import copy
+    from utils.ranking_engine import RankingEngine
+
+    engine = RankingEngine(RANKING_TYPE_WEIGHTS)
+    preferences = {"learning_style": ["visual"], "difficulty": "beginner", "preferred_time_range": "short",
+                   "formats": ["video", "course"]}
+    max_content_items = 50
+    runs = max(args.runs, 20)
+
+    print("\n📊 Ranking: previous per-item scoring vs utils.ranking_engine")
+    print("-" * 50)
+    for count in (10, 100, 1000, 5000):
+        candidates = _ranking_candidates(count)
+        legacy_items, engine_items = copy.deepcopy(candidates), copy.deepcopy(candidates)
+
+        def legacy():
+            ranked = _legacy_final_ranking(legacy_items, preferences)
+            return ranked, _legacy_content_diversity(ranked, preferences, max_content_items)
+
+        def vectorized():
+            return engine.rank_and_diversify(engine_items, preferences, max_content_items)
+
+        assert legacy() == vectorized() and legacy_items == engine_items, "ranking results differ"
+        legacy_ms, engine_ms = _time_ms(legacy, runs), _time_ms(vectorized, runs)
+        print(f"  {count:>5} candidates: previous {summarize(legacy_ms)} ms")
+        print(f"  {'':>5}             engine   {summarize(engine_ms)} ms "
+              f"({statistics.median(legacy_ms) / statistics.median(engine_ms):.2f}x)")
+    return True
+
+
+def _mirrored_results(count, seed=11):
+    """Synthetic search results where ~30% are reposts of an earlier result (suffixes, small edits)"""
+    import random
+    rng = random.Random(seed)
+    words = ("python java learn tutorial guide function class data code example basic advanced intro web "
+             "api test loop list dict set string async module package error debug deploy").split()
+    results = []
+    while len(results) < count:
+        if results and rng.random() < 0.3:
+            original = rng.choice(results)
+            snippet = original["snippet"].split()
+            snippet[rng.randrange(len(snippet))] = rng.choice(words)
+            results.append({
+                "title": original["title"] + rng.choice([" | Medium", " - DEV Community", ""]),
+                "link": f"https://mirror{len(results)}.example.com/post",
+                "snippet": " ".join(snippet)
+            })
+        else:
+            results.append({
+                "title": " ".join(rng.choice(words) for _ in range(6)).title(),
+                "link": f"https://site{len(results)}.example.org/",
+                "snippet": " ".join(rng.choice(words) for _ in range(25))
+            })
+    return results
+
+
+def _exact_duplicate_pairs(texts, threshold):
+    """Pairs of texts whose character 5-gram sets have Jaccard similarity >= threshold (quadratic baseline)"""
+    from utils.minhash import jaccard
+    from utils.near_duplicates import SHINGLE_SIZE
+    shingles = [{text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)} for text in texts]
+    return {
+        (i, j) for i in range(len(texts)) for j in range(i + 1, len(texts))
+        if jaccard(shingles[i], shingles[j]) >= threshold
+    }
+
+
+async def benchmark_near_duplicates(args):
+    """Batch MinHash/LSH near-duplicate clustering vs exact pairwise Jaccard"""
+    from utils.near_duplicates import NearDuplicateDetector, MIN_TEXT_CHARS, _resource_text
+
+    detector = NearDuplicateDetector(threshold=0.8)
+    runs = max(args.runs, 5)
+
+    print("\n🪞 Near-duplicates: exact pairwise Jaccard vs utils.near_duplicates (MinHash/LSH)")
+    print("-" * 50)
+    for count in (30, 100, 300, 1000):
+        texts = [_resource_text(result) for result in _mirrored_results(count)]
+        texts = [text for text in texts if len(text) >= MIN_TEXT_CHARS]
+
+        # Clusters are transitive, so compare against the connected components of the exact pairs
+        exact_clusters = list(range(len(texts)))
+        for i, j in sorted(_exact_duplicate_pairs(texts, detector.threshold)):
+            root_i, root_j = exact_clusters[i], exact_clusters[j]
+            exact_clusters = [min(root_i, root_j) if root in (root_i, root_j) else root for root in exact_clusters]
+        clusters = detector.clusters(texts)
+        same = lambda labels: {(i, j) for i in range(len(texts)) for j in range(i + 1, len(texts)) if labels[i] == labels[j]}
+        exact_pairs, found_pairs = same(exact_clusters), same(clusters)
+        recall = len(found_pairs & exact_pairs) / len(exact_pairs) if exact_pairs else 1.0
+        precision = len(found_pairs & exact_pairs) / len(found_pairs) if found_pairs else 1.0
+
+        exact_ms = _time_ms(lambda: _exact_duplicate_pairs(texts, detector.threshold), runs)
+        lsh_ms = _time_ms(lambda: detector.clusters(texts), runs)
+        print(f"  {count:>5} results: exact  {summarize(exact_ms)} ms")
+        print(f"  {'':>5}          minhash {summarize(lsh_ms)} ms "
+              f"({statistics.median(exact_ms) / statistics.median(lsh_ms):.2f}x, "
+              f"pair recall {recall:.2f}, precision {precision:.2f})")
+    return True
+
+
+BENCHMARKS = {
+    "course_generation": benchmark_course_generation,
+    "json_parsing": benchmark_json_parsing,
+    "keyword_signals": benchmark_keyword_signals,
+    "ranking": benchmark_ranking,
+    "near_duplicates": benchmark_near_duplicates,
+}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="AetherLearn performance benchmarks")
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per variant")
+    parser.add_argument("--query", default="learn python basics", help="Learning path query")
+    args = parser.parse_args()
+
+    print("AetherLearn Performance Benchmarks")
+    print("=" * 50)
+
+    selected = args.benchmarks or list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        print(f"❌ Unknown benchmark(s): {', '.join(unknown)}")
+        return False
+
+    results = {}
+    for name in selected:
+        results[name] = await BENCHMARKS[name](args)
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    try:
+        result = asyncio.run(main())
+        sys.exit(0 if result else 1)
+    except KeyboardInterrupt:
+        print("\n⏹️  Benchmark interrupted by user")
+        sys.exit(1)
@@ -0,0 +1,442 @@
+"""
+AetherLearn Extractor Manager
+Fetches result pages concurrently (global and per-host limits), parses HTML,
+OpenGraph and JSON-LD metadata, and keeps an on-disk conditional-GET cache so
+real duration, difficulty and type information can replace keyword guesses
+within a fixed latency budget.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+from html.parser import HTMLParser
+from typing import Dict, List, Any, Optional, Callable
+from urllib.parse import urlparse
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ISO 8601 durations used by schema.org (e.g. PT1H25M, P2DT3H)
+ISO_DURATION_PATTERN = re.compile(
+    r"^P(?:(?P<days>\d+(?:\.\d+)?)D)?"
+    r"(?:T(?:(?P<hours>\d+(?:\.\d+)?)H)?(?:(?P<minutes>\d+(?:\.\d+)?)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$",
+    re.IGNORECASE
+)
+
+# schema.org / OpenGraph types -> pipeline resource types
+SCHEMA_TYPE_MAPPING = {
+    "videoobject": "video",
+    "video": "video",
+    "video.other": "video",
+    "video.episode": "video",
+    "course": "course",
+    "courseinstance": "course",
+    "scholarlyarticle": "academic",
+    "techarticle": "documentation",
+    "apireference": "documentation",
+    "howto": "interactive",
+    "learningresource": "interactive",
+    "article": "article",
+    "newsarticle": "article",
+    "blogposting": "article"
+}
+
+DIFFICULTY_MAPPING = {
+    "beginner": "beginner",
+    "introductory": "beginner",
+    "basic": "beginner",
+    "intermediate": "intermediate",
+    "advanced": "advanced",
+    "expert": "advanced"
+}
+
+# Average reading speed used to turn page length into a reading time
+WORDS_PER_MINUTE = 230
+
+# Page bodies are read in chunks of this size up to EXTRACTOR_MAX_PAGE_KB
+READ_CHUNK_BYTES = 64 * 1024
+
+
+def parse_iso_duration(value: Any) -> Optional[int]:
+    """ISO 8601 duration -> whole minutes (at least 1), None when unparseable"""
+    if not isinstance(value, str):
+        return None
+    match = ISO_DURATION_PATTERN.match(value.strip())
+    if not match or not any(match.groupdict().values()):
+        return None
+    parts = {name: float(amount) for name, amount in match.groupdict().items() if amount}
+    minutes = (parts.get("days", 0) * 1440 + parts.get("hours", 0) * 60
+               + parts.get("minutes", 0) + parts.get("seconds", 0) / 60)
+    return max(1, round(minutes))
+
+
+class MetadataHTMLParser(HTMLParser):
+    """Collects <title>, <meta> tags, JSON-LD blocks and a visible word count"""
+
+    SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.meta: Dict[str, str] = {}
+        self.json_ld: List[Any] = []
+        self.word_count = 0
+        self.language: Optional[str] = None
+        self._in_title = False
+        self._in_json_ld = False
+        self._json_ld_buffer: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attributes = {name.lower(): (value or "") for name, value in attrs}
+        if tag == "html" and attributes.get("lang"):
+            self.language = attributes["lang"].split("-")[0].lower()
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            key = attributes.get("property") or attributes.get("name") or attributes.get("itemprop")
+            if key and "content" in attributes:
+                self.meta.setdefault(key.lower(), attributes["content"].strip())
+        elif tag == "script" and attributes.get("type", "").lower() == "application/ld+json":
+            self._in_json_ld = True
+            self._json_ld_buffer = []
+
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "script" and self._in_json_ld:
+            self._in_json_ld = False
+            try:
+                self.json_ld.append(json.loads("".join(self._json_ld_buffer)))
+            except ValueError:
+                pass
+
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_json_ld:
+            self._json_ld_buffer.append(data)
+        elif self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self.word_count += len(data.split())
+
+
+def _json_ld_nodes(blocks: List[Any]) -> List[Dict[str, Any]]:
+    """Flatten JSON-LD blocks (lists and @graph containers) into typed nodes"""
+    nodes = []
+    pending = list(blocks)
+    while pending:
+        block = pending.pop(0)
+        if isinstance(block, list):
+            pending.extend(block)
+        elif isinstance(block, dict):
+            if "@graph" in block:
+                pending.extend(block["@graph"] if isinstance(block["@graph"], list) else [block["@graph"]])
+            if "@type" in block:
+                nodes.append(block)
+    return nodes
+
+
+def _node_types(node: Dict[str, Any]) -> List[str]:
+    node_type = node.get("@type", [])
+    return [str(t).lower() for t in (node_type if isinstance(node_type, list) else [node_type])]
+
+
+def extract_generic(url: str, parser: MetadataHTMLParser) -> Dict[str, Any]:
+    """Default extractor: <title>, description, OpenGraph and schema.org JSON-LD"""
+    meta = parser.meta
+    metadata: Dict[str, Any] = {
+        "title": (meta.get("og:title") or parser.title).strip() or None,
+        "description": meta.get("og:description") or meta.get("description") or None,
+        "site_name": meta.get("og:site_name") or None,
+        "language": parser.language,
+        "word_count": parser.word_count,
+        "resource_type": SCHEMA_TYPE_MAPPING.get(meta.get("og:type", "").lower()),
+        "duration_minutes": parse_iso_duration(meta.get("duration") or meta.get("video:duration")),
+        "difficulty": None,
+        "published_at": meta.get("article:published_time") or None
+    }
+
+    # OpenGraph video:duration is in seconds
+    if metadata["duration_minutes"] is None and meta.get("video:duration", "").isdigit():
+        metadata["duration_minutes"] = max(1, round(int(meta["video:duration"]) / 60))
+
+    for node in _json_ld_nodes(parser.json_ld):
+        for node_type in _node_types(node):
+            if metadata["resource_type"] is None and node_type in SCHEMA_TYPE_MAPPING:
+                metadata["resource_type"] = SCHEMA_TYPE_MAPPING[node_type]
+        if metadata["duration_minutes"] is None:
+            metadata["duration_minutes"] = (
+                parse_iso_duration(node.get("duration"))
+                or parse_iso_duration(node.get("timeRequired"))
+                or parse_iso_duration(node.get("totalTime"))
+            )
+        if metadata["difficulty"] is None:
+            level = node.get("educationalLevel") or node.get("proficiencyLevel") or ""
+            if isinstance(level, dict):
+                level = level.get("name", "")
+            metadata["difficulty"] = DIFFICULTY_MAPPING.get(str(level).strip().lower())
+        metadata["published_at"] = metadata["published_at"] or node.get("datePublished")
+
+    if metadata["duration_minutes"] is None and parser.word_count and metadata["resource_type"] != "video":
+        metadata["reading_time_minutes"] = max(1, round(parser.word_count / WORDS_PER_MINUTE))
+
+    return metadata
+
+
+def extract_youtube(url: str, parser: MetadataHTMLParser) -> Dict[str, Any]:
+    """YouTube watch pages expose the duration as an itemprop meta tag"""
+    metadata = extract_generic(url, parser)
+    metadata["resource_type"] = "video"
+    metadata.pop("reading_time_minutes", None)
+    return metadata
+
+
+def extract_documentation(url: str, parser: MetadataHTMLParser) -> Dict[str, Any]:
+    """Documentation sites rarely declare a type; their pages are reference reading"""
+    metadata = extract_generic(url, parser)
+    metadata["resource_type"] = metadata["resource_type"] or "documentation"
+    return metadata
+
+
+class ExtractorManager:
+    """
+    Async page metadata extractor.
+    - Global and per-host concurrency limits so a result list never floods one site
+    - On-disk cache with ETag / Last-Modified revalidation (304s cost no parsing)
+    - Pluggable per-site extractors keyed by host suffix
+    - enrich_results() never spends more than the configured latency budget
+    """
+
+    def __init__(self, session: aiohttp.ClientSession = None, cache_dir: str = None,
+                 max_concurrency: int = None, per_host_concurrency: int = None,
+                 latency_budget_ms: int = None):
+        self.enabled = os.getenv("EXTRACTOR_ENABLED", "true").lower() == "true"
+        self.max_concurrency = max_concurrency or int(os.getenv("EXTRACTOR_MAX_CONCURRENCY", "10"))
+        self.per_host_concurrency = per_host_concurrency or int(os.getenv("EXTRACTOR_PER_HOST_CONCURRENCY", "2"))
+        self.latency_budget = (latency_budget_ms or int(os.getenv("EXTRACTOR_LATENCY_BUDGET_MS", "1500"))) / 1000
+        self.fetch_timeout = float(os.getenv("EXTRACTOR_FETCH_TIMEOUT_SECONDS", "3"))
+        self.max_bytes = int(os.getenv("EXTRACTOR_MAX_PAGE_KB", "512")) * 1024
+        self.cache_ttl = int(os.getenv("EXTRACTOR_CACHE_TTL_HOURS", "24")) * 3600
+        self.cache_dir = cache_dir or os.getenv(
+            "EXTRACTOR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "aetherlearn_page_metadata")
+        )
+
+        self.session = session
+        self._owns_session = session is None
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        # host suffix -> extractor(url, parser) -> metadata
+        self.extractors: Dict[str, Callable[[str, MetadataHTMLParser], Dict[str, Any]]] = {}
+        self.register_extractor("youtube.com", extract_youtube)
+        for host in ("docs.python.org", "developer.mozilla.org", "docs.microsoft.com",
+                     "learn.microsoft.com", "readthedocs.io"):
+            self.register_extractor(host, extract_documentation)
+
+        self.stats = {"fetched": 0, "revalidated": 0, "cache_hits": 0, "failed": 0, "over_budget": 0}
+
+    def register_extractor(self, host_suffix: str, extractor: Callable[[str, MetadataHTMLParser], Dict[str, Any]]):
+        """Use `extractor` for pages whose host is host_suffix or a subdomain of it"""
+        self.extractors[host_suffix.lower()] = extractor
+
+    def _extractor_for(self, host: str) -> Callable[[str, MetadataHTMLParser], Dict[str, Any]]:
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            extractor = self.extractors.get(".".join(labels[i:]))
+            if extractor is not None:
+                return extractor
+        return extract_generic
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.per_host_concurrency,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"User-Agent": "AetherLearnBot/1.0 (+learning path metadata)"}
+            )
+            self._owns_session = True
+        return self.session
+
+    async def close(self):
+        """Close the session if this manager created it"""
+        if self._owns_session and self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_semaphores[host]
+
+    # On-disk conditional-GET cache
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_cache(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._cache_path(url), "r", encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, url: str, entry: Dict[str, Any]):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(url)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(entry, cache_file)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.debug(f"Could not write page metadata cache for {url}: {e}")
+
+    async def extract(self, url: str) -> Optional[Dict[str, Any]]:
+        """Metadata for one page (cached, revalidated or freshly fetched); None on failure"""
+        host = (urlparse(url).hostname or "").lower()
+        if not host:
+            return None
+
+        loop = asyncio.get_event_loop()
+        cached = await loop.run_in_executor(None, self._read_cache, url)
+        if cached and time.time() - cached.get("fetched_at", 0) < self.cache_ttl:
+            self.stats["cache_hits"] += 1
+            return cached["metadata"]
+
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        try:
+            async with self._global_semaphore, self._host_semaphore(host):
+                timeout = aiohttp.ClientTimeout(total=self.fetch_timeout)
+                async with self._get_session().get(url, headers=headers, timeout=timeout) as response:
+                    if response.status == 304 and cached:
+                        self.stats["revalidated"] += 1
+                        cached["fetched_at"] = time.time()
+                        await loop.run_in_executor(None, self._write_cache, url, cached)
+                        return cached["metadata"]
+
+                    content_type = response.headers.get("Content-Type", "")
+                    if response.status != 200 or "html" not in content_type.lower():
+                        self.stats["failed"] += 1
+                        return None
+
+                    # content.read(n) returns whatever is buffered (often one chunk);
+                    # keep reading until max_bytes or EOF so late <meta> tags are seen
+                    chunks, size = [], 0
+                    async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= self.max_bytes:
+                            break
+                    body = b"".join(chunks)[:self.max_bytes]
+                    charset = response.charset or "utf-8"
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats["failed"] += 1
+            logger.debug(f"Metadata fetch failed for {url}: {e}")
+            return None
+
+        parser = MetadataHTMLParser()
+        try:
+            parser.feed(body.decode(charset, errors="replace"))
+            parser.close()
+        except Exception as e:
+            logger.debug(f"Could not parse {url}: {e}")
+        metadata = self._extractor_for(host)(url, parser)
+
+        self.stats["fetched"] += 1
+        entry = {"etag": etag, "last_modified": last_modified, "fetched_at": time.time(), "metadata": metadata}
+        await loop.run_in_executor(None, self._write_cache, url, entry)
+        return metadata
+
+    async def extract_many(self, urls: List[str], budget_seconds: float = None) -> Dict[str, Dict[str, Any]]:
+        """Extract metadata for many pages; anything unfinished when the budget runs out is dropped"""
+        budget = self.latency_budget if budget_seconds is None else budget_seconds
+        tasks = {asyncio.ensure_future(self.extract(url)): url for url in dict.fromkeys(urls) if url}
+        if not tasks:
+            return {}
+
+        done, pending = await asyncio.wait(tasks.keys(), timeout=budget)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.stats["over_budget"] += len(pending)
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        results = {}
+        for task in done:
+            if not task.cancelled() and task.exception() is None and task.result():
+                results[tasks[task]] = task.result()
+        return results
+
+    async def enrich_results(self, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach page_metadata to the search results that could be extracted within the budget"""
+        if not self.enabled or not search_results:
+            return search_results
+
+        started = time.monotonic()
+        urls = [result.get('link', result.get('url', '')) for result in search_results]
+        extracted = await self.extract_many(urls)
+
+        enriched = []
+        for result, url in zip(search_results, urls):
+            metadata = extracted.get(url)
+            if metadata:
+                compact = {key: value for key, value in metadata.items() if value not in (None, "", 0)}
+                result = {**result, 'page_metadata': compact}
+            enriched.append(result)
+
+        logger.info(
+            f"📄 Extracted page metadata for {len(extracted)}/{len(search_results)} resources "
+            f"in {(time.monotonic() - started) * 1000:.0f}ms"
+        )
+        return enriched
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Extractor counters for monitoring"""
+        return {
+            "enabled": self.enabled,
+            "latency_budget_ms": int(self.latency_budget * 1000),
+            "registered_extractors": sorted(self.extractors),
+            **self.stats
+        }
+
+
+# Shared extractor instance (one session and cache directory per worker process)
+_extractor_manager: Optional[ExtractorManager] = None
+
+
+def get_extractor_manager() -> ExtractorManager:
+    """Get the process-wide extractor manager"""
+    global _extractor_manager
+    if _extractor_manager is None:
+        _extractor_manager = ExtractorManager()
+    return _extractor_manager
@@ -9,9 +9,15 @@ import os
 from app.routers import learning_path, auth, saved_courses, ai_tools
 from app.database import init_db
 
-# Google Custom Search API imports
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+# Google Custom Search API client (shared async connection pool)
+import asyncio
+from utils.custom_search_client import get_custom_search_client, CustomSearchError
+from utils.rate_scheduler import get_rate_scheduler, RateLimitExceeded
+from extractors.extractor_manager import get_extractor_manager
+from utils.vertex_ai import get_llm_gateway, get_categorization_metrics
+from utils.prompt_builder import get_prompt_builder
+from utils.llm_response_cache import get_llm_response_cache
+from utils.resource_feature_store import get_resource_feature_store
 
 # Configuration
 class Settings(BaseSettings):
@@ -99,30 +105,26 @@ async def search_for_resources(search_query: SearchQuery):
     Returns a structured list of search results that can be used for learning path generation.
     """
     try:
-        # Build the service object for the Custom Search API
-        service = build("customsearch", "v1", developerKey=settings.search_api_key)
+        # Use the shared async client (keep-alive pool, discovery document loaded at startup)
+        search_client = get_custom_search_client()
 
         # Execute the search query
         # Google Custom Search API has a maximum of 10 results per request
         num_results = min(settings.search_results_per_query, 10)
         
-        result = service.cse().list(
-            q=search_query.query,
-            cx=settings.search_engine_id,
-            num=num_results
-        ).execute()
+        result = await search_client.search(search_query.query, num=num_results)
 
         # Parse and format the results
-        items = result.get('items', [])
+        items = search_client.format_items(result)
         formatted_resources = []
         
         for item in items:
             formatted_resources.append(
                 SearchResource(
-                    title=item.get('title', ''),
-                    link=item.get('link', ''),
-                    snippet=item.get('snippet', ''),
-                    displayLink=item.get('displayLink', '')
+                    title=item['title'],
+                    link=item['link'],
+                    snippet=item['snippet'],
+                    displayLink=item['displayLink']
                 )
             )
 
@@ -138,12 +140,24 @@ async def search_for_resources(search_query: SearchQuery):
             searchInformation=result.get('searchInformation', {})
         )
 
-    except HttpError as e:
+    except CustomSearchError as e:
         # Handle API-specific errors (e.g., quota exceeded)
-        print(f"Google Custom Search API HttpError: {e}")
+        print(f"Google Custom Search API error: {e}")
         raise HTTPException(
-            status_code=e.resp.status,
-            detail=f"Search API error: {e._get_reason()}"
+            status_code=e.status,
+            detail=f"Search API error: {e.reason}"
+        )
+    except RateLimitExceeded as e:
+        print(f"Google Custom Search quota exhausted: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="Search quota exhausted, please retry shortly"
+        )
+    except asyncio.TimeoutError:
+        print(f"Google Custom Search API timed out for query: {search_query.query}")
+        raise HTTPException(
+            status_code=504,
+            detail="Search API timed out"
         )
     except Exception as e:
         print(f"Unexpected error in search: {e}")
@@ -158,8 +172,17 @@ async def startup_db_client():
     await init_db()
     from app.database import ensure_real_data_collections
     await ensure_real_data_collections()
+    await get_custom_search_client().start()
+    learning_path.cache_warmer.start()
     print("✅ AetherLearn startup complete - Ready for Google search + AI processing")
 
+@app.on_event("shutdown")
+async def shutdown_clients():
+    await learning_path.cache_warmer.stop()
+    await get_custom_search_client().close()
+    await get_extractor_manager().close()
+    print("👋 Closed Google Custom Search and page extractor connection pools")
+
 @app.get("/", tags=["Root"])
 async def read_root():
     return {
@@ -180,5 +203,24 @@ async def health_check():
         "timestamp": "2025-01-06T00:07:02Z"
     }
 
+@app.get("/health/metrics", tags=["Health"])
+async def performance_metrics():
+    """Upstream quota and pipeline metrics for monitoring dashboards"""
+    return {
+        "rate_limits": get_rate_scheduler().snapshot(),
+        "llm_gateway": get_llm_gateway().snapshot(),
+        "prompt_builder": get_prompt_builder().snapshot(),
+        "llm_cache": get_llm_response_cache().snapshot(),
+        "resource_features": get_resource_feature_store().snapshot(),
+        "categorization": get_categorization_metrics().snapshot(),
+        "domain_credibility": learning_path.search_manager.vertex_ai.credibility_index.snapshot(),
+        "near_duplicates": learning_path.search_manager.near_duplicate_detector.snapshot(),
+        "active_searches": len(learning_path.search_manager.search_tasks),
+        "customization": learning_path.search_manager.customization_engine.snapshot(),
+        "cache_warmer": learning_path.cache_warmer.snapshot(),
+        "page_extractor": get_extractor_manager().snapshot(),
+        "flashcard_batcher": ai_tools.flashcard_generator.batch_snapshot() if ai_tools.flashcard_generator else None
+    }
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
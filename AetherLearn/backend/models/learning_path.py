@@ -66,6 +66,8 @@ class LearningPathCreate(BaseModel):
     
     query: str
     preferences: Dict[str, Any] = {}
+    generation_mode: Optional[str] = None  # "one_shot" or "two_call" (defaults to COURSE_GENERATION_MODE)
+    fresh: bool = False  # Skip cached learning paths and LLM responses
 
 
 class LearningPathCustomize(BaseModel):
@@ -99,7 +101,7 @@ class SearchStatus(BaseModel):
     search_id: str
     user_id: Optional[str] = None
     query: str
-    status: str  # INITIATED, DISCOVERING, EXTRACTING, PROCESSING, COMPLETED, FAILED
+    status: str  # INITIATED, DISCOVERING, EXTRACTING, PROCESSING, COMPLETED, FAILED, CANCELLED
     progress: int  # 0-100
     message: str
     created_at: datetime
@@ -121,6 +123,8 @@ class SearchStatusUpdate(BaseModel):
     sources_scanned: Optional[int] = None
     avg_quality: Optional[float] = None
     latest_resources: Optional[List[Dict[str, Any]]] = None
+    # Modules generated so far while the course is still streaming from Gemini
+    partial_learning_path: Optional[Dict[str, Any]] = None
     
     class Config:
         populate_by_name = True
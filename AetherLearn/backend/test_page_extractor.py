@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+AetherLearn Page Extractor Test
+Serves pages from a local aiohttp server and checks that ExtractorManager
+reads the whole body (up to EXTRACTOR_MAX_PAGE_KB), not just the first chunk
+"""
+
+import sys
+import asyncio
+import tempfile
+
+from aiohttp import web
+
+from extractors.extractor_manager import ExtractorManager
+
+# ~100KB of <head> before the metadata, streamed in small writes
+PADDING = "<style>" + ("/* padding */ .x { color: red; }\n" * 3200) + "</style>\n"
+LATE_META = (
+    '<meta property="og:type" content="video.other">\n'
+    '<meta itemprop="duration" content="PT1H25M">\n'
+)
+PAGE = (
+    "<!DOCTYPE html><html lang=\"en\"><head><title>Late Metadata Lesson</title>\n"
+    + PADDING + LATE_META
+    + "</head><body><p>Lesson body</p></body></html>"
+).encode("utf-8")
+WRITE_BYTES = 8 * 1024
+
+
+async def _serve_page(request):
+    """Stream PAGE in small writes so the client sees it arrive in many chunks"""
+    response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+    await response.prepare(request)
+    try:
+        for start in range(0, len(PAGE), WRITE_BYTES):
+            await response.write(PAGE[start:start + WRITE_BYTES])
+            await asyncio.sleep(0.001)
+        await response.write_eof()
+    except ConnectionResetError:
+        # The extractor hangs up once it has EXTRACTOR_MAX_PAGE_KB
+        pass
+    return response
+
+
+async def _extract_from_local_server(path: str, max_page_kb: int = None):
+    app = web.Application()
+    app.router.add_get("/lesson", _serve_page)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        manager = ExtractorManager(cache_dir=cache_dir)
+        if max_page_kb is not None:
+            manager.max_bytes = max_page_kb * 1024
+        try:
+            return await manager.extract(f"http://127.0.0.1:{port}{path}")
+        finally:
+            await manager.close()
+            await runner.cleanup()
+
+
+def test_late_metadata_in_large_page():
+    """Meta tags after ~100KB of <head> are still extracted"""
+    print("\nTesting metadata after a large <head>...")
+    assert len(PAGE) > 100 * 1024
+
+    metadata = asyncio.run(_extract_from_local_server("/lesson"))
+    print(f"📄 Extracted: {metadata}")
+    assert metadata is not None
+    assert metadata["resource_type"] == "video"
+    assert metadata["duration_minutes"] == 85
+    print("✅ Late metadata extracted")
+
+
+def test_body_limited_to_max_page_kb():
+    """Reading stops at EXTRACTOR_MAX_PAGE_KB, so metadata past the limit is not seen"""
+    print("\nTesting EXTRACTOR_MAX_PAGE_KB limit...")
+    metadata = asyncio.run(_extract_from_local_server("/lesson", max_page_kb=32))
+    print(f"📄 Extracted: {metadata}")
+    assert metadata is not None
+    assert metadata["title"] == "Late Metadata Lesson"
+    assert metadata["resource_type"] is None
+    assert metadata["duration_minutes"] is None
+    print("✅ Body limited to EXTRACTOR_MAX_PAGE_KB")
+
+
+if __name__ == "__main__":
+    try:
+        test_late_metadata_in_large_page()
+        test_body_limited_to_max_page_kb()
+    except AssertionError as e:
+        print(f"❌ Page extractor test failed: {e!r}")
+        sys.exit(1)
+    print("\n🎉 Page extractor tests passed")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+AetherLearn Learning Path Cache Test
+Checks that near-duplicate lookups in SearchManager's query cache never hand
+one topic's learning path to a different topic that merely looks alike
+"""
+
+import os
+import sys
+from unittest import mock
+
+from utils.search_manager import SearchManager
+
+# Placeholder keys so the clients initialize; nothing here calls the APIs
+PLACEHOLDER_KEYS = {"SEARCH_API_KEY": "test", "SEARCH_ENGINE_ID": "test", "GEMINI_API_KEY": "test"}
+
+# (cached query, different topic that must not reuse its path)
+DIFFERENT_TOPICS = [
+    ("calculus 1", "calculus 2"),
+    ("calculus 1", "calculus 3"),
+    ("introduction to organic chemistry", "introduction to inorganic chemistry"),
+    ("data structures and algorithms in java", "data structures and algorithms in python"),
+    ("learn rust", "learn rest"),
+]
+
+# (cached query, rephrasing or misspelling that should reuse its path)
+SAME_TOPICS = [
+    ("javascript tutorial", "javascrpt tutorial"),
+    ("python for data science", "data science with python"),
+]
+
+
+def _manager_with(queries):
+    keys = {name: value for name, value in PLACEHOLDER_KEYS.items() if not os.getenv(name)}
+    with mock.patch.dict(os.environ, keys):
+        manager = SearchManager()
+    for query in queries:
+        manager._cache_results(query, {"title": query})
+    return manager
+
+
+def test_different_topics_do_not_share_paths():
+    """Numbers, sub-words and real-word neighbours are different topics"""
+    print("\nTesting near-duplicate cache misses...")
+    manager = _manager_with({cached for cached, _ in DIFFERENT_TOPICS})
+    for cached, query in DIFFERENT_TOPICS:
+        hit = manager._check_cache(query)
+        print(f"{'❌' if hit else '✅'} '{query}' -> {hit}")
+        assert hit is None, f"'{query}' reused the path of '{hit['title']}'"
+
+
+def test_rephrased_queries_share_paths():
+    """Reordered words and single typos still find the cached path"""
+    print("\nTesting near-duplicate cache hits...")
+    manager = _manager_with({cached for cached, _ in SAME_TOPICS})
+    for cached, query in SAME_TOPICS:
+        hit = manager._check_cache(query)
+        print(f"{'✅' if hit else '❌'} '{query}' -> {hit}")
+        assert hit == {"title": cached}
+
+
+if __name__ == "__main__":
+    try:
+        test_different_topics_do_not_share_paths()
+        test_rephrased_queries_share_paths()
+    except AssertionError as e:
+        print(f"❌ Query cache test failed: {e!r}")
+        sys.exit(1)
+    print("\n🎉 Query cache tests passed")
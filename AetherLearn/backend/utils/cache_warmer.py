@@ -0,0 +1,194 @@
+"""
+AetherLearn Cache Warmer
+Tracks learning path query popularity with exponentially decayed counters and
+regenerates the most popular paths off-peak through the normal pipeline, so the
+search endpoint can answer them immediately with a COMPLETED status. Warmed paths
+are saved to learning_paths (when MongoDB is available), where every worker's
+cache lookup finds them.
+"""
+
+import os
+import math
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from utils.rate_scheduler import request_priority, PRIORITY_WARMER
+from utils.llm_response_cache import bypass_llm_cache
+
+logger = logging.getLogger(__name__)
+
+# Search IDs of warm runs (their status records are deleted once the run ends)
+WARM_SEARCH_PREFIX = "warm_"
+
+
+class QueryPopularityTracker:
+    """Exponentially decayed query counters (half-life in hours)"""
+
+    def __init__(self, half_life_hours: float = 6.0, max_entries: int = 5000):
+        self.decay_rate = math.log(2) / (half_life_hours * 3600)
+        self.max_entries = max_entries
+        # key -> {"score", "updated_at", "query", "preferences"}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    def _decayed(self, entry: Dict[str, Any], now: float) -> float:
+        return entry["score"] * math.exp(-self.decay_rate * (now - entry["updated_at"]))
+
+    def record(self, key: str, query: str, preferences: Dict[str, Any] = None):
+        """Count one occurrence of a query"""
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) >= self.max_entries:
+                self._prune(now)
+            self.entries[key] = {"score": 1.0, "updated_at": now, "query": query, "preferences": preferences or {}}
+            return
+
+        entry["score"] = self._decayed(entry, now) + 1.0
+        entry["updated_at"] = now
+
+    def _prune(self, now: float):
+        """Drop the coldest half of the tracked queries"""
+        ranked = sorted(self.entries, key=lambda key: self._decayed(self.entries[key], now))
+        for key in ranked[:len(ranked) // 2 or 1]:
+            del self.entries[key]
+
+    def top(self, n: int, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """The n most popular queries right now"""
+        now = time.time()
+        scored = [
+            {"key": key, "score": self._decayed(entry, now), "query": entry["query"], "preferences": entry["preferences"]}
+            for key, entry in self.entries.items()
+        ]
+        scored = [item for item in scored if item["score"] >= min_score]
+        scored.sort(key=lambda item: item["score"], reverse=True)
+        return scored[:n]
+
+
+class CacheWarmer:
+    """Regenerates popular learning paths off-peak at the scheduler's warmer priority"""
+
+    def __init__(self, search_manager):
+        self.search_manager = search_manager
+        self.enabled = os.getenv("WARMER_ENABLED", "true").lower() == "true"
+        self.top_n = int(os.getenv("WARMER_TOP_N", "20"))
+        self.min_score = float(os.getenv("WARMER_MIN_SCORE", "3"))
+        self.interval_seconds = int(os.getenv("WARMER_INTERVAL_MINUTES", "30")) * 60
+        self.refresh_after_seconds = int(os.getenv("WARMER_REFRESH_HOURS", "12")) * 3600
+        self.offpeak_hours = self._parse_hours(os.getenv("WARMER_OFFPEAK_HOURS", "1-6"))
+
+        self.tracker = QueryPopularityTracker(float(os.getenv("WARMER_HALF_LIFE_HOURS", "6")))
+        self.last_warmed: Dict[str, float] = {}
+        self.stats = {"runs": 0, "warmed": 0, "failed": 0, "last_run": None}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _parse_hours(spec: str) -> set:
+        """'1-6' -> {1..6}, '22-2' wraps past midnight (UTC hours)"""
+        start, _, end = spec.partition("-")
+        start_hour = int(start)
+        end_hour = int(end or start)
+        if start_hour <= end_hour:
+            return set(range(start_hour, end_hour + 1))
+        return set(range(start_hour, 24)) | set(range(0, end_hour + 1))
+
+    def record_query(self, query: str, preferences: Dict[str, Any] = None):
+        """Count a search request towards popularity"""
+        key = self.search_manager.coalescing_key(query, preferences)
+        self.tracker.record(key, query, preferences)
+
+    def is_off_peak(self, now: datetime = None) -> bool:
+        return (now or datetime.utcnow()).hour in self.offpeak_hours
+
+    def start(self):
+        """Start the periodic warmer loop"""
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run_forever())
+        logger.info(f"🔥 Cache warmer started (top {self.top_n}, off-peak UTC hours {sorted(self.offpeak_hours)})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            if not self.is_off_peak():
+                continue
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Cache warmer run failed: {e}")
+
+    async def run_once(self) -> int:
+        """Regenerate the current top-N learning paths; returns how many were warmed"""
+        # Everything awaited below is scheduled in the warmer priority class
+        priority_token = request_priority.set(PRIORITY_WARMER)
+        try:
+            # Warming exists to refresh paths, so it always asks the model again
+            with bypass_llm_cache():
+                warmed = await self._warm_top_queries()
+        finally:
+            request_priority.reset(priority_token)
+
+        self.stats["runs"] += 1
+        self.stats["warmed"] += warmed
+        self.stats["last_run"] = datetime.utcnow().isoformat()
+        return warmed
+
+    async def _warm_top_queries(self) -> int:
+        # Status records left behind by interrupted runs (e.g. a restart mid-warm)
+        await self.search_manager.discard_search_status(prefix=WARM_SEARCH_PREFIX)
+        
+        warmed = 0
+        now = time.time()
+        for candidate in self.tracker.top(self.top_n, self.min_score):
+            key = candidate["key"]
+            if now - self.last_warmed.get(key, 0) < self.refresh_after_seconds:
+                continue
+            if key in self.search_manager.inflight_searches:
+                # A user search is already generating this path
+                continue
+
+            search_id = f"{WARM_SEARCH_PREFIX}{uuid.uuid4()}"
+            try:
+                await self.search_manager.process_search(
+                    search_id=search_id,
+                    query=candidate["query"],
+                    user_id=None,
+                    preferences=candidate["preferences"],
+                    use_cache=False,
+                    # User searches must not wait on a pipeline running at warmer priority
+                    lead_flight=False
+                )
+                self.last_warmed[key] = time.time()
+                warmed += 1
+                logger.info(f"🔥 Warmed learning path for '{candidate['query']}' (score {candidate['score']:.1f})")
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"Failed to warm '{candidate['query']}': {e}")
+            finally:
+                # Warm runs only need the saved learning path, not a status record
+                await self.search_manager.discard_search_status(search_id)
+        return warmed
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Warmer state for monitoring"""
+        return {
+            "enabled": self.enabled,
+            "tracked_queries": len(self.tracker.entries),
+            "top_queries": [
+                {"query": item["query"], "score": round(item["score"], 2)}
+                for item in self.tracker.top(min(self.top_n, 10))
+            ],
+            **self.stats
+        }
@@ -0,0 +1,177 @@
+"""
+AetherLearn Custom Search Client
+Shared async Google Custom Search API client with a keep-alive connection pool
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, List, Any, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from utils.rate_scheduler import get_rate_scheduler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Discovery document for the Custom Search JSON API (loaded once per process)
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/customsearch/v1/rest"
+
+# Used when the discovery document cannot be fetched at startup
+DEFAULT_ROOT_URL = "https://customsearch.googleapis.com/"
+DEFAULT_LIST_PATH = "customsearch/v1"
+
+
+class CustomSearchError(Exception):
+    """Raised when the Custom Search API returns a non-200 response"""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"Custom Search API error {status}: {reason}")
+        self.status = status
+        self.reason = reason
+
+
+class CustomSearchClient:
+    """
+    Async-native Google Custom Search client.
+    - One aiohttp session with a keep-alive connection pool per process
+    - Discovery document resolved once at startup instead of per request
+    - Per-call timeouts so a slow search never stalls the event loop
+    """
+
+    def __init__(self, api_key: str = None, engine_id: str = None,
+                 timeout_seconds: float = None, pool_size: int = None):
+        self.api_key = api_key or os.getenv("SEARCH_API_KEY")
+        self.engine_id = engine_id or os.getenv("SEARCH_ENGINE_ID")
+        self.timeout_seconds = timeout_seconds or float(os.getenv("SEARCH_TIMEOUT_SECONDS", "8"))
+        self.pool_size = pool_size or int(os.getenv("SEARCH_POOL_SIZE", "20"))
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.list_url: Optional[str] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    async def start(self):
+        """Open the connection pool and resolve the search endpoint from the discovery document"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.session is not None and not self.session.closed:
+                return
+
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+            self.list_url = await self._load_discovery_document()
+            logger.info(f"🔎 Custom Search client ready (pool={self.pool_size}, timeout={self.timeout_seconds}s)")
+
+    async def close(self):
+        """Close the connection pool"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def _load_discovery_document(self) -> str:
+        """Resolve the cse.list endpoint URL, falling back to the well-known default"""
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
+            async with self.session.get(DISCOVERY_URL, timeout=timeout) as response:
+                if response.status == 200:
+                    document = await response.json()
+                    root_url = document.get("rootUrl", DEFAULT_ROOT_URL)
+                    service_path = document.get("servicePath", "")
+                    method_path = (
+                        document.get("resources", {})
+                        .get("cse", {})
+                        .get("methods", {})
+                        .get("list", {})
+                        .get("path", DEFAULT_LIST_PATH)
+                    )
+                    return f"{root_url}{service_path}{method_path}"
+                logger.warning(f"Discovery document request returned {response.status}, using default endpoint")
+        except Exception as e:
+            logger.warning(f"Failed to load Custom Search discovery document, using default endpoint: {e}")
+
+        return f"{DEFAULT_ROOT_URL}{DEFAULT_LIST_PATH}"
+
+    async def search(self, query: str, num: int = 10, start: int = 1, timeout: float = None) -> Dict[str, Any]:
+        """
+        Execute a single cse.list call.
+
+        Args:
+            query: Search query
+            num: Number of results (the API allows at most 10 per request)
+            start: 1-based index of the first result
+            timeout: Per-call timeout in seconds (defaults to SEARCH_TIMEOUT_SECONDS)
+
+        Returns:
+            Raw Custom Search API response
+
+        Raises:
+            CustomSearchError: the API returned an error status
+            RateLimitExceeded: the quota scheduler had no token within the queueing budget
+        """
+        if self.session is None or self.session.closed:
+            await self.start()
+
+        # Respect the daily / per-minute quota before spending a request
+        await get_rate_scheduler().acquire("customsearch", self.api_key)
+
+        params = {
+            "key": self.api_key,
+            "cx": self.engine_id,
+            "q": query,
+            "num": min(num, 10),
+            "start": start
+        }
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout_seconds)
+
+        async with self.session.get(self.list_url, params=params, timeout=client_timeout) as response:
+            if response.status != 200:
+                raise CustomSearchError(response.status, await self._extract_reason(response))
+            return await response.json()
+
+    async def search_items(self, query: str, num: int = 10, start: int = 1, timeout: float = None) -> List[Dict[str, Any]]:
+        """Execute a search and format the items the way the learning path pipeline expects"""
+        result = await self.search(query, num=num, start=start, timeout=timeout)
+        return self.format_items(result)
+
+    @staticmethod
+    def format_items(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Reduce raw Custom Search items to title/link/snippet/displayLink"""
+        formatted_resources = []
+        for item in result.get('items', []):
+            formatted_resources.append({
+                'title': item.get('title', ''),
+                'link': item.get('link', ''),
+                'snippet': item.get('snippet', ''),
+                'displayLink': item.get('displayLink', '')
+            })
+        return formatted_resources
+
+    @staticmethod
+    async def _extract_reason(response: aiohttp.ClientResponse) -> str:
+        """Pull the error message out of a Google API error body"""
+        try:
+            body = await response.json(content_type=None)
+            return body.get("error", {}).get("message") or response.reason or "Unknown error"
+        except Exception:
+            return response.reason or "Unknown error"
+
+
+# Shared client instance (one connection pool per worker process)
+_custom_search_client: Optional[CustomSearchClient] = None
+
+
+def get_custom_search_client() -> CustomSearchClient:
+    """Get the process-wide Custom Search client"""
+    global _custom_search_client
+    if _custom_search_client is None:
+        _custom_search_client = CustomSearchClient()
+    return _custom_search_client
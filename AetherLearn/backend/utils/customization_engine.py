@@ -0,0 +1,170 @@
+"""
+AetherLearn Customization Engine
+Classifies a preference change against the preferences a learning path was
+built with. Filter and rerank changes (formats, time limits, learning style)
+are applied locally with the VertexAIClient ranking helpers in milliseconds;
+only structural changes (difficulty progression, goals, focus) are sent back
+to Gemini to regenerate the path.
+"""
+
+import copy
+import time
+import logging
+from collections import deque
+from typing import Dict, List, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Preferences that only change which resources are shown and in what order
+LOCAL_PREFERENCE_KEYS = {"formats", "max_time_minutes", "learning_style", "preferred_time_range", "time_preference"}
+
+# Keys sent by the web UI (js/learning_path.js collectUserPreferences) -> local preference keys.
+# Its time_commitment ("10-20 hours") budgets the whole path rather than single resources,
+# so it stays a structural preference and is handled by Gemini.
+PREFERENCE_ALIASES = {"content_formats": "formats", "learning_styles": "learning_style"}
+
+# Preferences holding a list of values; a bare string ("visual") means a one-item list
+LIST_PREFERENCE_KEYS = ("formats", "learning_style")
+
+# Request options that are not preferences of the path itself
+IGNORED_PREFERENCE_KEYS = {"create_copy"}
+
+CUSTOMIZATION_NOOP = "noop"
+CUSTOMIZATION_LOCAL = "local"
+CUSTOMIZATION_LLM = "llm"
+
+# Number of recent local customizations used for latency percentiles
+LATENCY_WINDOW = 500
+
+
+def normalize_preferences(preferences: Dict[str, Any]) -> Dict[str, Any]:
+    """Rename UI preference keys to the local ones and wrap single list values in a list"""
+    normalized = dict(preferences or {})
+    for alias, key in PREFERENCE_ALIASES.items():
+        if alias in normalized:
+            value = normalized.pop(alias)
+            normalized.setdefault(key, value)
+    for key in LIST_PREFERENCE_KEYS:
+        if isinstance(normalized.get(key), str):
+            normalized[key] = [normalized[key]]
+    return normalized
+
+
+class CustomizationEngine:
+    """
+    Applies preference deltas to stored learning paths.
+
+    Preferences are merged over the path's previous preferences, so a request
+    carrying only {"max_time_minutes": 30} is a local change. Resources removed
+    by a filter are kept in each module's "filtered_resources", so relaxing the
+    filter later restores them without a model call.
+    """
+
+    def __init__(self, vertex_ai):
+        self.vertex_ai = vertex_ai
+        self.stats = {CUSTOMIZATION_NOOP: 0, CUSTOMIZATION_LOCAL: 0, CUSTOMIZATION_LLM: 0}
+        self.local_latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def classify(self, previous: Dict[str, Any], preferences: Dict[str, Any]) -> Tuple[str, List[str]]:
+        """
+        Returns:
+            (CUSTOMIZATION_NOOP | CUSTOMIZATION_LOCAL | CUSTOMIZATION_LLM, changed preference keys)
+        """
+        changed = sorted(
+            key for key, value in preferences.items()
+            if key not in IGNORED_PREFERENCE_KEYS and previous.get(key) != value
+        )
+        if not changed:
+            return CUSTOMIZATION_NOOP, changed
+        # Unknown keys are treated as structural so they still reach the model
+        if all(key in LOCAL_PREFERENCE_KEYS for key in changed):
+            return CUSTOMIZATION_LOCAL, changed
+        return CUSTOMIZATION_LLM, changed
+
+    async def customize(self, learning_path: Dict[str, Any], preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """Customize a learning path, locally when the preference delta allows it"""
+        previous = normalize_preferences(
+            learning_path.get("customization_preferences") or learning_path.get("preferences") or {}
+        )
+        preferences = normalize_preferences(preferences)
+        merged = {**previous, **{key: value for key, value in preferences.items() if key not in IGNORED_PREFERENCE_KEYS}}
+        mode, changed = self.classify(previous, preferences)
+        self.stats[mode] += 1
+
+        if mode == CUSTOMIZATION_LLM:
+            logger.info(f"🧠 Structural preference change {changed}, regenerating learning path with Gemini")
+            customized = await self.vertex_ai.customize_learning_path(self._with_all_resources(learning_path), merged)
+        else:
+            started = time.perf_counter()
+            customized = self.apply_local(learning_path, merged)
+            elapsed = time.perf_counter() - started
+            self.local_latencies.append(elapsed)
+            logger.info(f"⚡ Applied preference change {changed or '(none)'} locally in {elapsed * 1000:.1f}ms")
+
+        customized["customization_mode"] = mode
+        customized["customization_preferences"] = merged
+        return customized
+
+    def apply_local(self, learning_path: Dict[str, Any], preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter and rerank every module's resources for the preferences, keeping the module structure"""
+        customized = copy.deepcopy(learning_path)
+        preferences = normalize_preferences(preferences)
+        total_minutes = 0
+        timed = False
+
+        for module in customized.get("modules", []):
+            candidates = [
+                self._rankable(resource)
+                for resource in module.get("resources", []) + module.get("filtered_resources", [])
+                if isinstance(resource, dict)
+            ]
+            if not candidates:
+                continue
+
+            matching = [resource for resource in candidates if self.vertex_ai._matches_user_preferences(resource, preferences)]
+            if matching:
+                _, kept = self.vertex_ai.ranking_engine.rank_and_diversify(
+                    matching, preferences, self.vertex_ai.content_filters["max_content_items"]
+                )
+            else:
+                # Never leave a module empty: keep its best resource if nothing matches
+                kept = self.vertex_ai._apply_final_ranking(candidates, preferences)[:1]
+            kept_ids = {id(resource) for resource in kept}
+
+            module["resources"] = kept
+            module["filtered_resources"] = [resource for resource in candidates if id(resource) not in kept_ids]
+
+            minutes = [resource["estimated_time_minutes"] for resource in kept
+                       if isinstance(resource.get("estimated_time_minutes"), (int, float))]
+            if minutes:
+                timed = True
+                module["estimated_hours"] = round(sum(minutes) / 60, 1)
+                total_minutes += sum(minutes)
+
+        if timed:
+            customized["estimated_hours"] = round(total_minutes / 60, 1)
+        customized["customized"] = True
+        return customized
+
+    def _rankable(self, resource: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill the fields the ranking helpers read from generated module resources ("type" -> resource_type)"""
+        resource_type = resource.get("resource_type") or resource.get("type") or "article"
+        resource.setdefault("resource_type", resource_type)
+        resource.setdefault("learning_styles", self.vertex_ai._determine_learning_styles_enhanced(resource_type))
+        return resource
+
+    @staticmethod
+    def _with_all_resources(learning_path: Dict[str, Any]) -> Dict[str, Any]:
+        """Give the model every resource back, including ones hidden by earlier local filters"""
+        restored = copy.deepcopy(learning_path)
+        for module in restored.get("modules", []):
+            module["resources"] = module.get("resources", []) + module.pop("filtered_resources", [])
+        return restored
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Customization counts per mode and local latency for monitoring"""
+        latencies = sorted(self.local_latencies)
+        return {
+            **self.stats,
+            "local_latency_ms_p95": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2) if latencies else None
+        }
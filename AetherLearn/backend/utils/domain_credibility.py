@@ -0,0 +1,234 @@
+"""
+AetherLearn Domain Credibility Index
+Compiled replacement for substring scans over source_credibility_scores:
+- Curated rules live in a reversed-label suffix trie ("edu" matches mit.edu but
+  not education.com; the most specific rule wins regardless of dict order)
+- Path-prefix rules (e.g. "youtube.com/c/") hang off their host's trie node
+- The long tail comes from an external reputation file: a sorted array of
+  (64-bit domain hash, score) records memory-mapped with NumPy, so millions
+  of registrable domains cost no startup time and little resident memory
+- Host lookups are O(label count) and memoized
+"""
+
+import os
+import sys
+import hashlib
+import logging
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Record layout of the reputation file (numpy .npy, sorted by domain_hash)
+REPUTATION_DTYPE = np.dtype([("domain_hash", "<u8"), ("score", "<f4")])
+
+# Common public suffixes; extend with PUBLIC_SUFFIX_LIST_PATH (publicsuffix.org format)
+DEFAULT_PUBLIC_SUFFIXES = {
+    "com", "org", "net", "edu", "gov", "mil", "int", "io", "dev", "ai", "app", "co", "info", "biz",
+    "us", "uk", "ca", "au", "de", "fr", "in", "jp", "cn", "br", "es", "it", "nl", "eu", "ch", "se",
+    "co.uk", "ac.uk", "org.uk", "gov.uk", "com.au", "edu.au", "org.au", "co.jp", "ac.jp", "co.in",
+    "ac.in", "edu.in", "com.br", "edu.br", "co.nz", "ac.nz", "edu.cn", "com.cn", "github.io", "gitlab.io"
+}
+
+# Keys of source_credibility_scores that are fallbacks, not domains
+NON_DOMAIN_KEYS = {"unknown", "default"}
+
+
+def domain_hash(domain: str) -> int:
+    """Stable 64-bit hash of a lower-case registrable domain (reputation file key)"""
+    return int.from_bytes(hashlib.blake2b(domain.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def load_public_suffixes(path: str) -> set:
+    """Plain rules from a public suffix list file (wildcard and exception rules are skipped)"""
+    suffixes = set()
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            rule = line.strip().lower()
+            if rule and not rule.startswith(("//", "*", "!")):
+                suffixes.add(rule)
+    return suffixes
+
+
+def build_reputation_file(csv_path: str, output_path: str) -> int:
+    """
+    Convert a "domain,score" CSV (one registrable domain per line) into the
+    sorted, memory-mappable reputation file. Returns the number of records.
+    """
+    hashes, scores = [], []
+    with open(csv_path, encoding="utf-8") as handle:
+        for line in handle:
+            domain, _, score = line.strip().partition(",")
+            if not domain or domain.startswith("#"):
+                continue
+            try:
+                scores.append(float(score))
+            except ValueError:
+                continue
+            hashes.append(domain_hash(domain.lower().strip(".")))
+
+    records = np.empty(len(hashes), dtype=REPUTATION_DTYPE)
+    records["domain_hash"] = np.array(hashes, dtype="<u8")
+    records["score"] = np.array(scores, dtype="<f4")
+    records.sort(order="domain_hash")
+    np.save(output_path, records)
+    return len(records)
+
+
+class _TrieNode:
+    __slots__ = ("children", "score", "path_rules")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.score: Optional[float] = None
+        # (path prefix, score), longest prefix first
+        self.path_rules: List[Tuple[str, float]] = []
+
+
+class DomainCredibilityIndex:
+    """
+    Credibility lookups for URLs.
+
+    Args:
+        rules: Pattern -> score, e.g. {"edu": 0.95, "mit.edu": 0.98, "youtube.com/c/": 0.75}
+        default_score: Score when nothing matches
+        reputation_path: Optional .npy file written by build_reputation_file
+        public_suffixes: Suffixes used to find the registrable domain for reputation lookups
+    """
+
+    def __init__(self, rules: Dict[str, float], default_score: float = 0.6, reputation_path: str = None,
+                 public_suffixes: set = None, memo_size: int = 65536):
+        self.default_score = default_score
+        self.public_suffixes = public_suffixes or get_public_suffixes()
+        self.root = _TrieNode()
+        self.rule_count = 0
+        for pattern, score in rules.items():
+            if pattern not in NON_DOMAIN_KEYS:
+                self.add_rule(pattern, score)
+
+        self.reputation = None
+        self.reputation_hashes = None
+        if reputation_path:
+            try:
+                self.reputation = np.load(reputation_path, mmap_mode="r")
+                self.reputation_hashes = self.reputation["domain_hash"]
+                logger.info(f"📇 Memory-mapped {len(self.reputation):,} domain reputation records from {reputation_path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Domain reputation file {reputation_path} not loaded: {e}")
+
+        self._lookup_host = lru_cache(maxsize=memo_size)(self._lookup_host_uncached)
+
+    def add_rule(self, pattern: str, score: float):
+        """Add a domain suffix rule ("mit.edu") or host path-prefix rule ("youtube.com/c/")"""
+        host, slash, path = pattern.strip().partition("/")
+        node = self.root
+        for label in reversed(host.lower().strip(".").split(".")):
+            node = node.children.setdefault(label, _TrieNode())
+        if slash:
+            node.path_rules.append(("/" + path, score))
+            node.path_rules.sort(key=lambda rule: len(rule[0]), reverse=True)
+        else:
+            node.score = score
+        self.rule_count += 1
+
+    def registrable_domain(self, host: str) -> str:
+        """Public suffix plus one label (e.g. cs.ox.ac.uk -> ox.ac.uk)"""
+        labels = host.split(".")
+        for index in range(1, len(labels)):
+            if ".".join(labels[index:]) in self.public_suffixes:
+                return ".".join(labels[index - 1:])
+        return ".".join(labels[-2:])
+
+    def _reputation_score(self, domain: str) -> Optional[float]:
+        if self.reputation_hashes is None or len(self.reputation_hashes) == 0:
+            return None
+        # bisect touches ~log2(n) records; np.searchsorted would copy the strided field view
+        key = domain_hash(domain)
+        position = bisect_left(self.reputation_hashes, key)
+        if position < len(self.reputation_hashes) and int(self.reputation_hashes[position]) == key:
+            return round(float(self.reputation[position]["score"]), 4)
+        return None
+
+    def _lookup_host_uncached(self, host: str) -> Tuple[float, Tuple[_TrieNode, ...]]:
+        """(host score, trie nodes on the host's path that carry path rules, deepest first)"""
+        labels = host.split(".")
+        node = self.root
+        best_score, best_depth = None, 0
+        path_nodes = []
+        for depth, label in enumerate(reversed(labels), start=1):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.score is not None:
+                best_score, best_depth = node.score, depth
+            if node.path_rules:
+                path_nodes.append(node)
+
+        # A reputation entry for the registrable domain beats broader curated suffix rules
+        registrable = self.registrable_domain(host)
+        if registrable.count(".") + 1 > best_depth:
+            reputation_score = self._reputation_score(registrable)
+            if reputation_score is not None:
+                best_score = reputation_score
+
+        return (best_score if best_score is not None else self.default_score), tuple(reversed(path_nodes))
+
+    def score(self, url: str) -> float:
+        """Credibility score for a URL (or bare host)"""
+        if not url:
+            return self.default_score
+        parsed = urlparse(url if "//" in url else f"//{url}")
+        host = (parsed.hostname or "").strip(".")
+        if not host:
+            return self.default_score
+
+        host_score, path_nodes = self._lookup_host(host)
+        if path_nodes:
+            path = parsed.path or "/"
+            for node in path_nodes:
+                for prefix, rule_score in node.path_rules:
+                    if path.startswith(prefix):
+                        return rule_score
+        return host_score
+
+    def snapshot(self) -> Dict[str, object]:
+        """Index size and memo effectiveness for monitoring"""
+        memo = self._lookup_host.cache_info()
+        return {
+            "rules": self.rule_count,
+            "reputation_records": len(self.reputation) if self.reputation is not None else 0,
+            "memo_hits": memo.hits,
+            "memo_misses": memo.misses,
+            "memo_size": memo.currsize
+        }
+
+
+# Public suffix set shared by every index (the optional file is read once per process)
+_public_suffixes: Optional[set] = None
+
+
+def get_public_suffixes() -> set:
+    """Built-in public suffixes plus PUBLIC_SUFFIX_LIST_PATH when configured"""
+    global _public_suffixes
+    if _public_suffixes is None:
+        _public_suffixes = set(DEFAULT_PUBLIC_SUFFIXES)
+        path = os.getenv("PUBLIC_SUFFIX_LIST_PATH")
+        if path:
+            try:
+                _public_suffixes |= load_public_suffixes(path)
+            except OSError as e:
+                logger.warning(f"Public suffix list {path} not loaded: {e}")
+    return _public_suffixes
+
+
+if __name__ == "__main__":
+    # python -m utils.domain_credibility domains.csv domain_reputation.npy
+    if len(sys.argv) != 3:
+        print("Usage: python -m utils.domain_credibility <domains.csv> <output.npy>")
+        sys.exit(1)
+    count = build_reputation_file(sys.argv[1], sys.argv[2])
+    print(f"✅ Wrote {count:,} reputation records to {sys.argv[2]}")
@@ -5,16 +5,27 @@ and generates high-quality flashcards using Gemini API
 """
 
 import os
-import json
 import logging
 import asyncio
 import re
+import contextvars
 import aiohttp
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
+from google.api_core import exceptions as google_exceptions
+
+from utils.vertex_ai import get_llm_gateway
+from utils.rate_scheduler import request_priority
+from utils.llm_response_cache import get_llm_response_cache
+from utils.json_stream_parser import parse_json_response, is_complete_json
+from utils.keyword_engine import keyword_engine, detect_subjects
+
 logger = logging.getLogger(__name__)
 
+# One answer per task in a micro-batched prompt
+BATCH_RESULT_PATTERN = re.compile(r"<<<RESULT (\d+)>>>(.*?)<<<END RESULT \1>>>", re.DOTALL)
+
 class IntelligentFlashcardGenerator:
     """
     Advanced AI-powered flashcard generator that:
@@ -31,6 +42,19 @@ class IntelligentFlashcardGenerator:
         self.base_url = "https://generativelanguage.googleapis.com/v1beta/models"
         self.gemini_available = False
         
+        # Optional cross-request micro-batching: requests arriving within the window share one Gemini call
+        self.batch_enabled = os.getenv("FLASHCARD_BATCH_ENABLED", "false").lower() == "true"
+        self.batch_window_seconds = int(os.getenv("FLASHCARD_BATCH_WINDOW_MS", "25")) / 1000
+        # A batch answers every item in one response, so it is flushed before the items'
+        # summed output budgets (_calculate_max_tokens) would exceed the model's output limit
+        self.batch_max_output_tokens = int(os.getenv("FLASHCARD_BATCH_MAX_OUTPUT_TOKENS", "8192"))
+        # (prompt, future, submitter's context): the batch itself runs in a fresh context
+        self._batch_queue: List[Tuple[str, asyncio.Future, contextvars.Context]] = []
+        self._batch_tokens = 0
+        self._batch_timer: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: set = set()
+        self.batch_stats = {"batches": 0, "batched_items": 0, "single_calls": 0, "batch_failures": 0, "item_retries": 0}
+        
         self._initialize_gemini_api()
     
     def _initialize_gemini_api(self):
@@ -111,7 +135,6 @@ class IntelligentFlashcardGenerator:
         """
         Analyze input to determine if it's a topic or content and its characteristics
         """
-        input_lower = input_data.lower().strip()
         word_count = len(input_data.split())
         sentence_count = len([s for s in input_data.split('.') if s.strip()])
         
@@ -132,20 +155,8 @@ class IntelligentFlashcardGenerator:
             description = f"Content provided with {word_count} words, {sentence_count} sentences"
             approach = "extract_and_generate"
         
-        # Detect subject areas
-        subject_keywords = {
-            "programming": ["code", "programming", "javascript", "python", "html", "css", "function", "variable", "algorithm"],
-            "science": ["biology", "chemistry", "physics", "atom", "molecule", "cell", "experiment"],
-            "mathematics": ["equation", "formula", "calculate", "algebra", "geometry", "statistics"],
-            "history": ["history", "ancient", "war", "civilization", "century", "historical"],
-            "literature": ["literature", "novel", "poetry", "author", "character", "theme"],
-            "business": ["business", "marketing", "finance", "management", "strategy", "economics"]
-        }
-        
-        detected_subjects = []
-        for subject, keywords in subject_keywords.items():
-            if any(keyword in input_lower for keyword in keywords):
-                detected_subjects.append(subject)
+        # Detect subject areas in one keyword scan
+        detected_subjects = detect_subjects(keyword_engine.keywords_in(input_data.lower().strip()))
         
         return {
             "type": input_type,
@@ -290,109 +301,241 @@ IMPORTANT: Complete all {num_cards} flashcards. Do not truncate the response.
     async def _generate_content_gemini_api(self, prompt: str):
         """Generate content using Gemini API with optimal settings"""
         try:
-            payload = {
-                "contents": [{
-                    "parts": [{
-                        "text": prompt
-                    }]
-                }],
-                "generationConfig": {
-                    "temperature": 0.4,
-                    "topK": 40,
-                    "topP": 0.9,
-                    "maxOutputTokens": self._calculate_max_tokens(prompt)
-                }
-            }
+            payload = self._build_payload(prompt, self._calculate_max_tokens(prompt))
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.endpoint_url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Extract text from Gemini API response
-                        if 'candidates' in data and len(data['candidates']) > 0:
-                            content = data['candidates'][0]['content']['parts'][0]['text']
-                            return content
-                        else:
-                            logger.error("No candidates in Gemini API response")
-                            return None
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Gemini API error {response.status}: {error_text}")
-                        return None
+            response_cache = get_llm_response_cache()
+            cache_key = response_cache.cache_key(self.model_name, prompt, payload["generationConfig"])
+            cached_text = await response_cache.get(cache_key)
+            if cached_text is not None:
+                return cached_text
+            
+            if self.batch_enabled:
+                served_model, content = await self._submit_to_batch(prompt)
+            else:
+                served_model, content = await self._generate_single(prompt, payload)
+            # Responses from a fallback model are cached under that model, not the primary one
+            if served_model != self.model_name:
+                cache_key = response_cache.cache_key(served_model, prompt, payload["generationConfig"])
+            # Malformed or truncated answers fall back now and must not be replayed to retries
+            if self._is_complete_flashcard_response(content):
+                await response_cache.set(cache_key, content, served_model, "flashcards_intelligent")
+            return content
                         
         except Exception as e:
             logger.error(f"Error in Gemini API generation: {e}")
             return None
     
-    def _parse_ai_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse the AI response with robust error handling"""
-        try:
-            # Clean up the response
-            cleaned_response = response_text.strip()
-            
-            # Remove markdown code blocks if present
-            if "```json" in cleaned_response:
-                # Extract content between ```json and ```
-                start_marker = "```json"
-                end_marker = "```"
-                start_idx = cleaned_response.find(start_marker) + len(start_marker)
-                end_idx = cleaned_response.find(end_marker, start_idx)
-                if end_idx > start_idx:
-                    cleaned_response = cleaned_response[start_idx:end_idx].strip()
+    @staticmethod
+    def _is_complete_flashcard_response(content: Optional[str]) -> bool:
+        """True if the response is a whole (untruncated) JSON object with a flashcards list"""
+        return is_complete_json(content, dict) and isinstance(parse_json_response(content).get("flashcards"), list)
+    
+    def _build_payload(self, prompt: str, max_output_tokens: int) -> Dict[str, Any]:
+        return {
+            "contents": [{
+                "parts": [{
+                    "text": prompt
+                }]
+            }],
+            "generationConfig": {
+                "temperature": 0.4,
+                "topK": 40,
+                "topP": 0.9,
+                "maxOutputTokens": max_output_tokens
+            }
+        }
+    
+    async def _post_generate(self, payload: Dict[str, Any], model_name: str = None) -> Optional[str]:
+        """
+        POST one generateContent request and return the response text (None without candidates).
+        API errors raise the matching google.api_core exception (as the SDK would), so the LLM
+        gateway counts 5xx and 429 against the model's circuit breaker but not other 4xx.
+        """
+        endpoint_url = self.endpoint_url
+        if model_name and model_name != self.model_name:
+            endpoint_url = f"{self.base_url}/{model_name}:generateContent?key={self.api_key}"
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                endpoint_url,
+                json=payload,
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    # Extract text from Gemini API response
+                    if 'candidates' in data and len(data['candidates']) > 0:
+                        content = data['candidates'][0]['content']['parts'][0]['text']
+                        return content
+                    else:
+                        logger.error("No candidates in Gemini API response")
+                        return None
                 else:
-                    # If end marker not found, take everything after start marker
-                    cleaned_response = cleaned_response[start_idx:].strip()
-            elif "```" in cleaned_response:
-                # Try to extract JSON object using regex
-                json_match = re.search(r'\{.*\}', cleaned_response, re.DOTALL)
-                if json_match:
-                    cleaned_response = json_match.group(0)
-            
-            # Additional cleanup - remove any trailing non-JSON content
-            if cleaned_response.endswith('...'):
-                # Find the last complete JSON structure
-                brace_count = 0
-                last_valid_pos = 0
-                for i, char in enumerate(cleaned_response):
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            last_valid_pos = i + 1
-                
-                if last_valid_pos > 0:
-                    cleaned_response = cleaned_response[:last_valid_pos]
-            
-            # Parse JSON
-            data = json.loads(cleaned_response)
-            
-            # Validate flashcards
-            if "flashcards" not in data or not isinstance(data["flashcards"], list):
-                logger.error("Invalid flashcards structure")
-                return None
-            
-            # Check each flashcard
-            for i, card in enumerate(data["flashcards"]):
-                if not isinstance(card, dict) or "front" not in card or "back" not in card:
-                    logger.error(f"Invalid flashcard at index {i}")
-                    return None
-            
-            count = data.get("count", len(data["flashcards"]))
-            logger.info(f"✅ Parsed {count} flashcards from AI response")
-            return data
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {e}")
+                    error_text = await response.text()
+                    logger.error(f"Gemini API error {response.status}: {error_text}")
+                    raise google_exceptions.from_http_status(response.status, f"Gemini API error {response.status}")
+    
+    async def _generate_single(self, prompt: str, payload: Dict[str, Any] = None) -> Tuple[str, Optional[str]]:
+        """One Gemini call for one prompt; returns (model that answered, response text)"""
+        payload = payload or self._build_payload(prompt, self._calculate_max_tokens(prompt))
+        self.batch_stats["single_calls"] += 1
+        
+        async def call(model_name: str):
+            return model_name, await self._post_generate(payload, model_name)
+        
+        # Shared concurrency limit, quota token, deadline, cascade and metrics for every Gemini call
+        return await get_llm_gateway().run("flashcards_intelligent", call, api_key=self.api_key)
+    
+    async def _submit_to_batch(self, prompt: str) -> Tuple[str, Optional[str]]:
+        """Queue a prompt for the next micro-batch and wait for its demultiplexed (model, response)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        tokens = self._calculate_max_tokens(prompt)
+        if self._batch_queue and self._batch_tokens + tokens > self.batch_max_output_tokens:
+            self._flush_batch()
+        self._batch_queue.append((prompt, future, contextvars.copy_context()))
+        self._batch_tokens += tokens
+        
+        if self._batch_tokens >= self.batch_max_output_tokens:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            # call_later would otherwise run the flush in this submitter's context
+            self._batch_timer = loop.call_later(
+                self.batch_window_seconds, self._flush_batch, context=contextvars.Context()
+            )
+        return await future
+    
+    def _flush_batch(self):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        items, self._batch_queue = self._batch_queue, []
+        self._batch_tokens = 0
+        # Callers that gave up (disconnected) are dropped from the batch
+        items = [item for item in items if not item[1].done()]
+        if items:
+            # A fresh context, so the batch does not inherit whichever submitter triggered the
+            # flush (its request_priority, llm_cache_bypass, ...); _run_batch sets what it needs.
+            # Keep a reference until the batch finishes so the task is not garbage collected
+            task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run_batch(items))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+    
+    async def _run_batch(self, items: List[Tuple[str, asyncio.Future, contextvars.Context]]):
+        """Generate a batch in one call; items missing from the answer are retried individually"""
+        # The shared call is queued at its most urgent caller's priority
+        request_priority.set(min(context.run(request_priority.get) for _, _, context in items))
+        if len(items) == 1:
+            await self._resolve_individually(items)
+            return
+        
+        self.batch_stats["batches"] += 1
+        self.batch_stats["batched_items"] += len(items)
+        logger.info(f"📦 Generating {len(items)} flashcard requests in one Gemini call")
+        
+        prompt = self._create_batch_prompt([item_prompt for item_prompt, _, _ in items])
+        # Sum of the per-item estimates (within batch_max_output_tokens, see _submit_to_batch)
+        max_tokens = sum(self._calculate_max_tokens(item_prompt) for item_prompt, _, _ in items)
+        payload = self._build_payload(prompt, max_tokens)
+        
+        async def call(model_name: str):
+            return model_name, await self._post_generate(payload, model_name)
+        
+        served_model, response = self.model_name, None
+        try:
+            served_model, response = await get_llm_gateway().run("flashcards_batch", call, api_key=self.api_key)
+        except Exception as e:
+            logger.warning(f"⚠️ Flashcard batch call failed ({e}), retrying {len(items)} items individually")
+        
+        results = self._split_batch_response(response or "", len(items))
+        if response is None:
+            self.batch_stats["batch_failures"] += 1
+        
+        missing = []
+        for index, (_, future, _) in enumerate(items):
+            if results.get(index) is None:
+                missing.append(items[index])
+            elif not future.done():
+                future.set_result((served_model, results[index]))
+        if missing:
+            self.batch_stats["item_retries"] += len(missing)
+            await self._resolve_individually(missing)
+    
+    async def _resolve_individually(self, items: List[Tuple[str, asyncio.Future, contextvars.Context]]):
+        """One call per item, each in its own submitter's context (priority, cache bypass)"""
+        async def resolve(prompt: str, future: asyncio.Future):
+            try:
+                result = await self._generate_single(prompt)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(result)
+        
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            context.run(loop.create_task, resolve(prompt, future))
+            for prompt, future, context in items
+        ))
+    
+    def _create_batch_prompt(self, prompts: List[str]) -> str:
+        """Multi-document prompt: each task is answered between its own result delimiters"""
+        tasks = "\n\n".join(
+            f"<<<TASK {index + 1}>>>\n{prompt}\n<<<END TASK {index + 1}>>>"
+            for index, prompt in enumerate(prompts)
+        )
+        return f"""
+You will complete {len(prompts)} independent flashcard generation tasks. Treat every task on its own:
+follow its instructions exactly and never mix content between tasks.
+
+{tasks}
+
+For each task N, write its answer (ONLY the JSON that task asks for) between the lines
+<<<RESULT N>>> and <<<END RESULT N>>>. Answer every task, in order, with nothing outside the delimiters.
+        """.strip()
+    
+    def _split_batch_response(self, response: str, count: int) -> Dict[int, str]:
+        """Task index -> answer text for every task whose answer parses as flashcard JSON"""
+        results = {}
+        for match in BATCH_RESULT_PATTERN.finditer(response):
+            index = int(match.group(1)) - 1
+            if 0 <= index < count and index not in results:
+                answer = match.group(2).strip()
+                parsed = parse_json_response(answer)
+                if isinstance(parsed, dict) and isinstance(parsed.get("flashcards"), list):
+                    results[index] = answer
+        return results
+    
+    def batch_snapshot(self) -> Dict[str, Any]:
+        """Micro-batching counters for monitoring"""
+        return {
+            "enabled": self.batch_enabled,
+            "window_ms": round(self.batch_window_seconds * 1000),
+            "max_output_tokens": self.batch_max_output_tokens,
+            "queued": len(self._batch_queue),
+            "queued_tokens": self._batch_tokens,
+            **self.batch_stats
+        }
+    
+    def _parse_ai_response(self, response_text: str) -> Dict[str, Any]:
+        """Parse the AI response with robust error handling (fences, prose, truncated output)"""
+        data = parse_json_response(response_text)
+        if not isinstance(data, dict) or not isinstance(data.get("flashcards"), list):
+            logger.error("Invalid flashcards structure")
             logger.error(f"Raw response: {response_text[:200]}...")
             return None
-        except Exception as e:
-            logger.error(f"Error parsing AI response: {e}")
+        
+        # Keep every complete card; a truncated response loses only the card that was cut off
+        valid_cards = [card for card in data["flashcards"] if isinstance(card, dict) and "front" in card and "back" in card]
+        if len(valid_cards) < len(data["flashcards"]):
+            logger.warning(f"⚠️ Dropped {len(data['flashcards']) - len(valid_cards)} invalid flashcards")
+        if not valid_cards:
             return None
+        data["flashcards"] = valid_cards
+        
+        count = len(valid_cards)
+        logger.info(f"✅ Parsed {count} flashcards from AI response")
+        return data
     
     def _format_final_response(self, parsed_data: Dict[str, Any], input_data: str,
                              options: Dict[str, Any], analysis: Dict[str, Any],
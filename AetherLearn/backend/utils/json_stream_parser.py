@@ -0,0 +1,288 @@
+"""
+AetherLearn JSON Stream Parser
+Shared, fault-tolerant parsing for model output.
+- JSONArrayStreamParser yields each element of a JSON array (course modules,
+  flashcards) as soon as its closing bracket arrives in a streamed response
+- parse_json_response decodes a complete response, tolerating markdown fences
+  and surrounding prose, and recovers every complete element from a response
+  that was cut off (e.g. by max_output_tokens); decode_json_response also
+  reports whether the document was complete
+"""
+
+import re
+import json
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Next character that ends or escapes inside a string
+_STRING_SPECIAL = re.compile(r'["\\]')
+# Next character that matters outside strings
+_STRUCTURAL = re.compile(r'["{}\[\]:,]')
+# Inside the target array only brackets and strings matter
+_BRACKET_OR_QUOTE = re.compile(r'["{}\[\]]')
+# Rest of a string after its opening quote, up to and including the closing quote
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# Start of the JSON document in a response that may be wrapped in prose or ``` fences
+_DOCUMENT_START = re.compile(r"[\[{]")
+
+_CLOSER_FOR = {"{": "}", "[": "]"}
+
+_decoder = json.JSONDecoder()
+
+
+class JSONArrayStreamParser:
+    """
+    Feed response chunks in order; feed() returns the array elements completed by each chunk.
+    Every chunk is scanned once: regex jumps skip string contents and whitespace.
+
+    Args:
+        array_key: Key of the array in the root object (e.g. "modules"),
+                   or None when the response itself is the array
+    """
+
+    def __init__(self, array_key: Optional[str] = None):
+        self.array_key = array_key
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        # Characters of the string being read (only kept while looking for array_key)
+        self.string_parts: List[str] = []
+        self.last_string: Optional[str] = None
+        self.key_for_value: Optional[str] = None
+        # Depth just inside the target array, once it has been entered
+        self.array_depth: Optional[int] = None
+        self.array_closed = False
+        # Text of the element being collected, when it spans several chunks
+        self.collecting = False
+        self.element_parts: List[str] = []
+        self.elements_emitted = 0
+
+    @property
+    def truncated(self) -> bool:
+        """True if the input so far ends inside the target array (or before it)"""
+        return not self.array_closed
+
+    def _at_target_array(self) -> bool:
+        if self.array_key is None:
+            return self.depth == 0
+        return self.depth == 1 and self.key_for_value == self.array_key
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume the next chunk of response text and return newly completed elements"""
+        completed = []
+        if self.array_closed or not chunk:
+            return completed
+
+        tracking_keys = self.array_depth is None
+        element_start = 0 if self.collecting else None
+        index, length = 0, len(chunk)
+
+        while index < length:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                    index += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, index)
+                end = match.start() if match else length
+                if tracking_keys:
+                    self.string_parts.append(chunk[index:end])
+                if match is None:
+                    break
+                if chunk[end] == "\\":
+                    self.escaped = True
+                else:
+                    self.in_string = False
+                    if tracking_keys:
+                        self.last_string = "".join(self.string_parts)
+                index = end + 1
+                continue
+
+            match = (_STRUCTURAL if tracking_keys else _BRACKET_OR_QUOTE).search(chunk, index)
+            end = match.start() if match else length
+            # A bare scalar value (number, true, null) ends the pending key
+            if tracking_keys and not chunk[index:end].isspace() and end > index:
+                self.key_for_value = None
+            if match is None:
+                break
+            char = chunk[end]
+            index = end + 1
+
+            if char == '"':
+                # Skip the whole string when it closes within this chunk
+                string_match = _STRING_REST.match(chunk, index)
+                if string_match is None:
+                    self.in_string = True
+                    self.string_parts = []
+                else:
+                    if tracking_keys:
+                        self.last_string = chunk[index:string_match.end() - 1]
+                    index = string_match.end()
+            elif char == ":":
+                if tracking_keys:
+                    self.key_for_value = self.last_string
+            elif char == "{" or char == "[":
+                if tracking_keys:
+                    if char == "[" and self._at_target_array():
+                        self.array_depth = self.depth + 1
+                        tracking_keys = False
+                    self.key_for_value = None
+                elif self.depth == self.array_depth and not self.collecting:
+                    self.collecting = True
+                    element_start = end
+                self.depth += 1
+            elif char == "}" or char == "]":
+                self.depth -= 1
+                if tracking_keys:
+                    continue
+                if self.collecting and self.depth == self.array_depth:
+                    self.element_parts.append(chunk[element_start:index])
+                    element = self._decode("".join(self.element_parts))
+                    if element is not None:
+                        completed.append(element)
+                    self.element_parts = []
+                    self.collecting = False
+                    element_start = None
+                elif self.depth < self.array_depth:
+                    self.array_closed = True
+                    break
+
+        if self.collecting and element_start is not None:
+            self.element_parts.append(chunk[element_start:])
+
+        self.elements_emitted += len(completed)
+        return completed
+
+    @staticmethod
+    def _decode(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed streamed element: {e}")
+            return None
+
+
+def _close_truncated(text: str, start: int) -> Optional[str]:
+    """
+    Cut a truncated document back to its last complete array element and close the open
+    containers. Objects outside arrays (the root) may be cut between fields; array elements
+    are never kept partially. Returns None if there is no such cut point.
+    """
+    # Open containers as (closer, opened inside an array)
+    stack: List[tuple] = []
+    open_arrays = 0
+    partial_elements = 0
+    safe_end, safe_closers = None, ""
+    index, length = start, len(text)
+
+    while index < length:
+        match = _STRUCTURAL.search(text, index)
+        if match is None:
+            break
+        position, char = match.start(), match.group()
+        index = position + 1
+
+        if char == '"':
+            # Skip to the closing quote, honouring escapes
+            while True:
+                string_match = _STRING_SPECIAL.search(text, index)
+                if string_match is None:
+                    index = length
+                    break
+                index = string_match.start() + (2 if string_match.group() == "\\" else 1)
+                if string_match.group() == '"':
+                    break
+            continue
+
+        if char == "{" or char == "[":
+            inside_array = open_arrays > 0
+            stack.append((_CLOSER_FOR[char], inside_array))
+            if char == "[":
+                open_arrays += 1
+            elif inside_array:
+                partial_elements += 1
+            continue
+
+        if char == "}" or char == "]":
+            if not stack:
+                break
+            closer, inside_array = stack.pop()
+            if closer == "]":
+                open_arrays -= 1
+            elif inside_array:
+                partial_elements -= 1
+            if not stack:
+                return text[start:index]
+            cut = index
+        elif char == ",":
+            cut = position
+        else:
+            continue
+
+        if partial_elements == 0:
+            safe_end, safe_closers = cut, "".join(closer for closer, _ in reversed(stack))
+
+    if safe_end is None:
+        return None
+    return text[start:safe_end] + safe_closers
+
+
+def decode_json_response(response: str, default: Any = None) -> Tuple[Any, bool]:
+    """
+    Decode the JSON document in a model response and report whether it was complete.
+
+    Returns:
+        (value, complete): complete is False when the value had to be recovered from
+        truncated output, or no JSON value was found (value is then default)
+    """
+    if not response:
+        return default, False
+
+    match = _DOCUMENT_START.search(response)
+    if match is None:
+        return default, False
+    start = match.start()
+
+    try:
+        value, _ = _decoder.raw_decode(response, start)
+        return value, True
+    except json.JSONDecodeError:
+        pass
+
+    repaired = _close_truncated(response, start)
+    if repaired is not None:
+        try:
+            value = json.loads(repaired)
+            logger.warning(f"⚠️ Recovered truncated JSON response ({len(response) - start} chars)")
+            return value, False
+        except json.JSONDecodeError:
+            pass
+
+    logger.error(f"Could not recover JSON from response: {response[:200]}...")
+    return default, False
+
+
+def parse_json_response(response: str, default: Any = None) -> Any:
+    """
+    Decode the JSON document in a model response.
+
+    Handles ``` fences, prose before/after the document and output truncated
+    mid-document (every complete element is kept). Returns default when no
+    JSON value can be recovered.
+    """
+    value, _ = decode_json_response(response, default)
+    return value
+
+
+def is_complete_json(response: str, expected_type: type = None) -> bool:
+    """True if the response holds a whole (untruncated) JSON document, of expected_type if given"""
+    match = _DOCUMENT_START.search(response or "")
+    if match is None:
+        return False
+    try:
+        value, _ = _decoder.raw_decode(response, match.start())
+    except json.JSONDecodeError:
+        return False
+    return expected_type is None or isinstance(value, expected_type)
@@ -0,0 +1,234 @@
+"""
+AetherLearn Keyword Engine
+Single-pass multi-pattern keyword matching for resource typing, difficulty and
+subject detection. Every keyword list used by the heuristics is compiled into
+one Aho-Corasick automaton (with fully resolved transitions), so a resource's
+URL, title and description are lower-cased and scanned once, and all type,
+difficulty and subject signals are derived from that one scan. Per-token
+matches and per-resource signals are memoized.
+"""
+
+import logging
+from collections import deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+# Basic resource typing (categorization fallback)
+VIDEO_DOMAINS = ("youtube.com", "vimeo.com", "ted.com")
+COURSE_DOMAINS = ("coursera.org", "edx.org", "udacity.com", "khanacademy.org")
+ACADEMIC_DOMAINS = ("arxiv.org", "ieee.org", "acm.org", "researchgate.net")
+DOCUMENTATION_TITLE_TERMS = ("documentation", "api reference", "guide")
+INTERACTIVE_TITLE_TERMS = ("tutorial", "hands-on", "practice", "exercise", "lab")
+
+# Enhanced resource typing (Vertex AI Search results)
+VIDEO_INDICATORS = ("youtube.com", "vimeo.com", "video", "watch")
+COURSE_INDICATORS = ("course", "coursera.org/learn", "udemy.com/course", "edx.org/course", "class", "curriculum")
+INTERACTIVE_INDICATORS = ("github.com", "codepen.io", "repl.it", "interactive", "playground", "tutorial")
+DOCUMENTATION_INDICATORS = ("docs.", "/docs", "documentation", "reference", "api")
+ACADEMIC_INDICATORS = (".edu", "arxiv.org", "research", "paper", "journal", "academic")
+TUTORIAL_INDICATORS = ("tutorial", "how-to", "guide", "step-by-step")
+
+# Basic difficulty
+BEGINNER_TERMS = ("beginner", "introduction", "basics", "getting started", "fundamentals")
+ADVANCED_TERMS = ("advanced", "expert", "deep dive", "mastery", "professional")
+
+# Enhanced difficulty (weighted: a title match counts double)
+BEGINNER_INDICATORS = (
+    "beginner", "introduction", "intro", "basic", "basics", "start", "starting",
+    "fundamental", "fundamentals", "101", "starter", "novice", "first steps",
+    "getting started", "learn", "learning", "simple", "easy"
+)
+ADVANCED_INDICATORS = (
+    "advanced", "expert", "complex", "deep dive", "mastering", "master",
+    "professional", "comprehensive", "in-depth", "optimization", "architecture",
+    "enterprise", "production", "scaling", "performance"
+)
+INTERMEDIATE_INDICATORS = ("intermediate", "practical", "application", "implement")
+
+# Heuristic categorization
+CATEGORY_ACADEMIC_DOMAINS = ("arxiv.org", "ieee.org", "acm.org", "scholar.google.com")
+CATEGORY_INTERACTIVE_TERMS = ("tutorial", "hands-on", "practice", "exercise")
+# Title/URL terms of results that may not be educational (news, shopping, releases)
+NON_EDUCATIONAL_TERMS = ("news", "download", "pricing", "price", "review", " vs ", "buy", "deal", "release", "gossip")
+
+SUBJECT_KEYWORDS = {
+    "programming": ("code", "programming", "javascript", "python", "html", "css", "function", "variable", "algorithm"),
+    "science": ("biology", "chemistry", "physics", "atom", "molecule", "cell", "experiment"),
+    "mathematics": ("equation", "formula", "calculate", "algebra", "geometry", "statistics"),
+    "history": ("history", "ancient", "war", "civilization", "century", "historical"),
+    "literature": ("literature", "novel", "poetry", "author", "character", "theme"),
+    "business": ("business", "marketing", "finance", "management", "strategy", "economics")
+}
+
+# Resources whose signals are memoized (search results repeat across query variants and re-ranking)
+SIGNAL_CACHE_SIZE = 16384
+
+
+class KeywordEngine:
+    """
+    Aho-Corasick automaton over a fixed keyword set.
+
+    keywords_in() finds every keyword occurring in a text, the same set substring
+    tests would. Text is walked one space-separated token at a time and each
+    token's keywords are memoized: words repeat across titles and snippets, so
+    most tokens cost one cache lookup instead of a per-character walk. The few
+    keywords containing a space are checked against the whole text.
+    """
+
+    def __init__(self, keywords: Iterable[str], token_cache_size: int = 65536):
+        self.keywords = tuple(dict.fromkeys(keyword.lower() for keyword in keywords if keyword))
+        self.spaced_keywords = tuple(keyword for keyword in self.keywords if " " in keyword)
+
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Tuple[str, ...]] = [()]
+        for keyword in self.keywords:
+            if " " in keyword:
+                continue
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append(())
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state] += (keyword,)
+
+        # Failure links in BFS order, folded into full transition tables so scanning never backtracks
+        transitions: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque((child, 0) for child in goto[0].values())
+        while queue:
+            state, fail = queue.popleft()
+            transitions[state] = {**transitions[fail], **goto[state]}
+            outputs[state] += outputs[fail]
+            for char, child in goto[state].items():
+                queue.append((child, transitions[fail].get(char, 0)))
+
+        self._next = [table.get for table in transitions]
+        self._outputs = outputs
+        self._accepting = frozenset(state for state, found in enumerate(outputs) if found)
+        self.state_count = len(goto)
+        self._token_matches = lru_cache(maxsize=token_cache_size)(self._scan_token)
+
+    def _scan_token(self, token: str) -> FrozenSet[str]:
+        """Space-free keywords occurring in one token"""
+        next_state, accepting, outputs = self._next, self._accepting, self._outputs
+        state = 0
+        found = []
+        for char in token:
+            state = next_state[state](char, 0)
+            if state in accepting:
+                found.extend(outputs[state])
+        return frozenset(found)
+
+    def keywords_in(self, text: str) -> FrozenSet[str]:
+        """Keywords occurring anywhere in already lower-cased text"""
+        found = set().union(*map(self._token_matches, text.split(" ")))
+        found.update(keyword for keyword in self.spaced_keywords if keyword in text)
+        return frozenset(found)
+
+
+_VOCABULARY = (
+    VIDEO_DOMAINS + COURSE_DOMAINS + ACADEMIC_DOMAINS + DOCUMENTATION_TITLE_TERMS + INTERACTIVE_TITLE_TERMS
+    + VIDEO_INDICATORS + COURSE_INDICATORS + INTERACTIVE_INDICATORS + DOCUMENTATION_INDICATORS
+    + ACADEMIC_INDICATORS + TUTORIAL_INDICATORS + BEGINNER_TERMS + ADVANCED_TERMS + BEGINNER_INDICATORS
+    + ADVANCED_INDICATORS + INTERMEDIATE_INDICATORS + CATEGORY_ACADEMIC_DOMAINS + CATEGORY_INTERACTIVE_TERMS
+    + NON_EDUCATIONAL_TERMS + tuple(keyword for keywords in SUBJECT_KEYWORDS.values() for keyword in keywords)
+)
+
+# Compiled once per process
+keyword_engine = KeywordEngine(_VOCABULARY)
+
+
+def detect_subjects(found: FrozenSet[str]) -> List[str]:
+    """Subject areas (in SUBJECT_KEYWORDS order) with at least one keyword in found"""
+    return [subject for subject, keywords in SUBJECT_KEYWORDS.items() if not found.isdisjoint(keywords)]
+
+
+def _resource_type(url: FrozenSet[str], title: FrozenSet[str]) -> str:
+    if not url.isdisjoint(VIDEO_DOMAINS) or "video" in title:
+        return "video"
+    if not url.isdisjoint(COURSE_DOMAINS) or "course" in title:
+        return "course"
+    if "docs." in url or not title.isdisjoint(DOCUMENTATION_TITLE_TERMS):
+        return "documentation"
+    if not title.isdisjoint(INTERACTIVE_TITLE_TERMS):
+        return "interactive"
+    if not url.isdisjoint(ACADEMIC_DOMAINS):
+        return "academic"
+    return "article"
+
+
+def _resource_type_enhanced(has_url: bool, url: FrozenSet[str], title: FrozenSet[str], description: FrozenSet[str]) -> str:
+    if not has_url:
+        return "article"
+    if not url.isdisjoint(VIDEO_INDICATORS):
+        return "video"
+    if not url.isdisjoint(COURSE_INDICATORS) or not title.isdisjoint(COURSE_INDICATORS):
+        return "course"
+    if not url.isdisjoint(INTERACTIVE_INDICATORS):
+        return "interactive"
+    if not url.isdisjoint(DOCUMENTATION_INDICATORS):
+        return "documentation"
+    if not url.isdisjoint(ACADEMIC_INDICATORS):
+        return "academic"
+    if not title.isdisjoint(TUTORIAL_INDICATORS) or not description.isdisjoint(TUTORIAL_INDICATORS):
+        return "tutorial"
+    return "article"
+
+
+def _difficulty(text: FrozenSet[str]) -> str:
+    if not text.isdisjoint(BEGINNER_TERMS):
+        return "beginner"
+    if not text.isdisjoint(ADVANCED_TERMS):
+        return "advanced"
+    return "intermediate"
+
+
+def _difficulty_enhanced(text: FrozenSet[str], title: FrozenSet[str]) -> str:
+    # Every keyword found counts once, and once more if it is in the title (title keywords are a subset of text)
+    beginner_score = len(text.intersection(BEGINNER_INDICATORS)) + len(title.intersection(BEGINNER_INDICATORS))
+    advanced_score = len(text.intersection(ADVANCED_INDICATORS)) + len(title.intersection(ADVANCED_INDICATORS))
+    intermediate_score = len(text.intersection(INTERMEDIATE_INDICATORS))
+
+    if advanced_score > beginner_score and advanced_score > intermediate_score:
+        return "advanced"
+    if beginner_score > 0:
+        return "beginner"
+    return "intermediate"
+
+
+@lru_cache(maxsize=SIGNAL_CACHE_SIZE)
+def analyze_resource(url: str, title: str, description: str) -> Dict[str, Any]:
+    """
+    Scan a resource's URL, title and description once and derive every keyword signal.
+
+    Returns (memoized; treat as read-only):
+        resource_type / resource_type_enhanced, difficulty / difficulty_enhanced,
+        subjects, and "keywords": the keyword sets found per field ("url", "title",
+        "description", and "text" = title + " " + description)
+    """
+    url_lower, title_lower, description_lower = (url or "").lower(), (title or "").lower(), (description or "").lower()
+    title_found = keyword_engine.keywords_in(title_lower)
+    description_found = keyword_engine.keywords_in(description_lower)
+    # Space-free keywords cannot straddle the title/description boundary; spaced ones can
+    text = f"{title_lower} {description_lower}"
+    text_found = title_found | description_found | {
+        keyword for keyword in keyword_engine.spaced_keywords if keyword in text
+    }
+
+    keywords = {
+        "url": keyword_engine.keywords_in(url_lower),
+        "title": title_found,
+        "description": description_found,
+        "text": text_found
+    }
+    return {
+        "resource_type": _resource_type(keywords["url"], keywords["title"]),
+        "resource_type_enhanced": _resource_type_enhanced(bool(url), keywords["url"], keywords["title"], keywords["description"]),
+        "difficulty": _difficulty(keywords["text"]),
+        "difficulty_enhanced": _difficulty_enhanced(keywords["text"], keywords["title"]),
+        "subjects": detect_subjects(keywords["text"]),
+        "keywords": keywords
+    }
@@ -0,0 +1,183 @@
+"""
+AetherLearn LLM Response Cache
+Content-addressed cache for Gemini responses keyed on (model id, normalized
+prompt, generation config). An in-process LRU bounded by total response size
+sits in front of the llm_response_cache MongoDB collection.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app import database
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Set for work that needs fresh model output: lookups are skipped, new responses are still stored
+llm_cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_llm_cache(enabled: bool = True):
+    """Skip LLM cache lookups for everything awaited inside the block"""
+    token = llm_cache_bypass.set(enabled)
+    try:
+        yield
+    finally:
+        llm_cache_bypass.reset(token)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Strip each line and drop blank lines so indentation-only differences share a key"""
+    lines = (" ".join(line.split()) for line in prompt.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _config_payload(generation_config: Any) -> Any:
+    """Plain, JSON-serializable view of a generation config (GenerationConfig or dict)"""
+    if generation_config is None:
+        return {}
+    if isinstance(generation_config, dict):
+        return generation_config
+    return {key: value for key, value in vars(generation_config).items() if value is not None}
+
+
+class LLMResponseCache:
+    """
+    Two-tier response cache.
+    - Memory: LRU evicted by total response bytes (LLM_CACHE_MEMORY_MB)
+    - MongoDB: shared across workers, expired by a TTL index (LLM_CACHE_TTL_HOURS)
+    """
+
+    def __init__(self, max_memory_bytes: int = None):
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.max_memory_bytes = max_memory_bytes or int(float(os.getenv("LLM_CACHE_MEMORY_MB", "32")) * 1024 * 1024)
+        self.ttl_hours = int(os.getenv("LLM_CACHE_TTL_HOURS", "24"))
+        # Responses above this size are only kept in MongoDB so one entry cannot flush the LRU
+        self.max_entry_bytes = self.max_memory_bytes // 8
+
+        # cache key -> (response, size in bytes)
+        self.entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self.memory_bytes = 0
+        self.stats = {
+            "memory_hits": 0, "persistent_hits": 0, "misses": 0, "bypassed": 0,
+            "stores": 0, "evictions": 0
+        }
+
+    @staticmethod
+    def cache_key(model_id: str, prompt: str, generation_config: Any = None) -> str:
+        """sha256 over the model id, normalized prompt and generation config"""
+        payload = json.dumps(
+            {"model": model_id, "prompt": normalize_prompt(prompt), "config": _config_payload(generation_config)},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Cached response text, or None on a miss (or when bypassed)"""
+        if not self.enabled:
+            return None
+        if llm_cache_bypass.get():
+            self.stats["bypassed"] += 1
+            return None
+
+        cached = self.entries.get(key)
+        if cached is not None:
+            self.entries.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return cached[0]
+
+        if database.db is not None:
+            try:
+                entry = await database.db.llm_response_cache.find_one({"cache_key": key})
+            except Exception as e:
+                logger.warning(f"LLM cache lookup failed: {e}")
+                entry = None
+            # The TTL monitor only runs once a minute; treat expired entries as misses
+            if entry and entry.get("expires_at", datetime.max) > datetime.utcnow():
+                self.stats["persistent_hits"] += 1
+                self._remember(key, entry["response"])
+                return entry["response"]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, response: str, model_id: str = None, operation: str = None):
+        """Store a response in both tiers"""
+        if not self.enabled or not response:
+            return
+
+        self.stats["stores"] += 1
+        self._remember(key, response)
+
+        if database.db is None:
+            return
+        now = datetime.utcnow()
+        try:
+            await database.db.llm_response_cache.update_one(
+                {"cache_key": key},
+                {"$set": {
+                    "cache_key": key,
+                    "model": model_id,
+                    "operation": operation,
+                    "response": response,
+                    "size_bytes": len(response.encode("utf-8")),
+                    "created_at": now,
+                    "expires_at": now + timedelta(hours=self.ttl_hours)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {e}")
+
+    def _remember(self, key: str, response: str):
+        size = len(response.encode("utf-8"))
+        if size > self.max_entry_bytes:
+            return
+
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= previous[1]
+        self.entries[key] = (response, size)
+        self.memory_bytes += size
+
+        while self.memory_bytes > self.max_memory_bytes and self.entries:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.memory_bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory usage for monitoring"""
+        hits = self.stats["memory_hits"] + self.stats["persistent_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self.entries),
+            "memory_bytes": self.memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            **self.stats
+        }
+
+
+# Shared cache instance (one memory tier per worker process)
+_llm_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """Get the process-wide LLM response cache"""
+    global _llm_response_cache
+    if _llm_response_cache is None:
+        _llm_response_cache = LLMResponseCache()
+    return _llm_response_cache
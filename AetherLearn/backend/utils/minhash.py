@@ -0,0 +1,112 @@
+"""
+AetherLearn MinHash / LSH
+MinHash signatures and a banded locality-sensitive hashing index for
+near-duplicate lookups in constant time per query.
+"""
+
+import random
+import hashlib
+from typing import Dict, List, Iterable, Set, Tuple, Hashable
+
+# Mersenne prime used for the universal hash family
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def stable_hash(token: str) -> int:
+    """32-bit hash that is stable across processes (unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Exact Jaccard similarity of two shingle sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """Computes fixed-length MinHash signatures for shingle sets"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randint(1, MERSENNE_PRIME - 1), rng.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingles: Iterable[str]) -> Tuple[int, ...]:
+        """MinHash signature of a shingle set"""
+        hashes = [stable_hash(shingle) for shingle in set(shingles)]
+        if not hashes:
+            return tuple([MAX_HASH] * self.num_perm)
+
+        return tuple(
+            min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes)
+            for a, b in self.permutations
+        )
+
+    @staticmethod
+    def estimate_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity from two signatures"""
+        if not sig_a:
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class LSHIndex:
+    """
+    Banded LSH index over MinHash signatures.
+    Items whose signatures agree on every row of at least one band become candidates.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: List[Dict[Tuple[int, ...], Set[Hashable]]] = [{} for _ in range(bands)]
+        self.signatures: Dict[Hashable, Tuple[int, ...]] = {}
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: Hashable, signature: Tuple[int, ...]):
+        """Insert (or replace) an item"""
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self.buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        """Remove an item if present"""
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self.buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band][band_key]
+
+    def candidates(self, signature: Tuple[int, ...]) -> Set[Hashable]:
+        """All items sharing at least one band with the signature"""
+        found = set()
+        for band, band_key in self._band_keys(signature):
+            found.update(self.buckets[band].get(band_key, ()))
+        return found
+
+    def query(self, signature: Tuple[int, ...], threshold: float) -> List[Tuple[Hashable, float]]:
+        """Candidates whose estimated similarity meets the threshold, best first"""
+        scored = [
+            (key, MinHasher.estimate_similarity(signature, self.signatures[key]))
+            for key in self.candidates(signature)
+        ]
+        return sorted((item for item in scored if item[1] >= threshold), key=lambda item: item[1], reverse=True)
+
+    def __len__(self):
+        return len(self.signatures)
@@ -0,0 +1,171 @@
+"""
+AetherLearn Near-Duplicate Suppression
+Collapses search results that are the same resource under different URLs
+(blog mirrors, Medium reposts, scraped copies) before they reach
+categorization. Titles and snippets are shingled into character 5-grams with
+scikit-learn's HashingVectorizer, MinHash signatures for the whole batch are
+computed with NumPy, and banded LSH buckets pair up candidates, so the work is
+linear in the number of results. Of each cluster only the most credible copy
+is kept (ties go to the better search rank).
+
+This is the batch counterpart of utils.minhash, which indexes single queries.
+"""
+
+import os
+import re
+import logging
+from typing import Dict, List, Any, Callable
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+logger = logging.getLogger(__name__)
+
+# Hash permutations are (a * x + b) mod 2^32 with odd a (a bijection on 32-bit values),
+# computed with wrapping uint32 arithmetic so no division is needed
+MAX_HASH = np.iinfo(np.uint32).max
+SHINGLE_SIZE = 5
+SHINGLE_FEATURES = 1 << 20
+# Permutations hashed at a time (bounds the permutations x shingles scratch array)
+PERMUTATION_BLOCK = 32
+# Shorter texts (a bare "Python Tutorial" title) are too generic to call duplicates
+MIN_TEXT_CHARS = 40
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _normalize(text: str) -> str:
+    """Lower-case words separated by single spaces (punctuation and markup ignored)"""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _resource_text(result: Dict[str, Any]) -> str:
+    title = result.get('title', '')
+    snippet = result.get('snippet', result.get('description', ''))
+    return _normalize(f"{title} {snippet}")
+
+
+class NearDuplicateDetector:
+    """
+    MinHash/LSH near-duplicate clustering over search results.
+
+    Args:
+        num_perm: MinHash signature length
+        bands: LSH bands (num_perm / bands rows each); 128/16 makes pairs with
+            Jaccard similarity 0.8 candidates ~95% of the time
+        threshold: Minimum estimated Jaccard similarity of a duplicate pair
+            (defaults to NEAR_DUPLICATE_THRESHOLD)
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, threshold: float = None, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.enabled = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+        self.threshold = threshold if threshold is not None else float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = np.random.default_rng(seed)
+        self.coefficients = rng.integers(0, MAX_HASH, size=num_perm, dtype=np.uint32, endpoint=True) | np.uint32(1)
+        self.offsets = rng.integers(0, MAX_HASH, size=num_perm, dtype=np.uint32, endpoint=True)
+        # Stateless, so one vectorizer serves every batch
+        self.vectorizer = HashingVectorizer(
+            analyzer="char", ngram_range=(SHINGLE_SIZE, SHINGLE_SIZE), n_features=SHINGLE_FEATURES,
+            lowercase=False, alternate_sign=False, norm=None, binary=True
+        )
+        self.stats = {"batches": 0, "results_seen": 0, "duplicates_removed": 0}
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """
+        MinHash signatures (one row per text) of the texts' character shingles.
+        Texts with no shingles get an all-MAX_HASH row.
+        """
+        shingles = self.vectorizer.transform(texts)
+        signatures = np.full((len(texts), self.num_perm), MAX_HASH, dtype=np.uint32)
+        nonempty = np.diff(shingles.indptr) > 0
+        if not nonempty.any():
+            return signatures
+
+        # Shingle ids of all texts back to back; reduceat takes each text's minimum.
+        # Permutation-major rows keep both the hashing and the reduction contiguous.
+        shingle_ids = shingles.indices.astype(np.uint32)[None, :]
+        starts = shingles.indptr[:-1][nonempty]
+        for start in range(0, self.num_perm, PERMUTATION_BLOCK):
+            block = slice(start, start + PERMUTATION_BLOCK)
+            hashed = self.coefficients[block, None] * shingle_ids
+            hashed += self.offsets[block, None]
+            signatures[nonempty, block] = np.minimum.reduceat(hashed, starts, axis=1).T
+        return signatures
+
+    def clusters(self, texts: List[str]) -> List[int]:
+        """Cluster id per text (the index of one member); texts too short to judge are singletons"""
+        parent = list(range(len(texts)))
+
+        def find(index: int) -> int:
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        candidates = [index for index, text in enumerate(texts) if len(text) >= MIN_TEXT_CHARS]
+        if len(candidates) < 2:
+            return parent
+
+        signatures = self.signatures([texts[index] for index in candidates])
+        for band in range(self.bands):
+            band_keys = signatures[:, band * self.rows:(band + 1) * self.rows]
+            buckets: Dict[bytes, List[int]] = {}
+            for row, index in enumerate(candidates):
+                members = buckets.setdefault(band_keys[row].tobytes(), [])
+                # Band collisions are only candidates; confirm each against the full signature.
+                # Every earlier member is checked (not just the first), so no pair in a bucket is missed.
+                unconfirmed = [member for member in members if find(candidates[member]) != find(index)]
+                if unconfirmed:
+                    matches = np.count_nonzero(signatures[unconfirmed] == signatures[row], axis=1)
+                    for member, match_count in zip(unconfirmed, matches.tolist()):
+                        if match_count / self.num_perm >= self.threshold:
+                            root, other = find(index), find(candidates[member])
+                            if root != other:
+                                parent[max(root, other)] = min(root, other)
+                members.append(row)
+
+        return [find(index) for index in range(len(texts))]
+
+    def suppress(self, search_results: List[Dict[str, Any]], credibility: Callable[[str], float]) -> List[Dict[str, Any]]:
+        """
+        Keep the most credible copy of each near-duplicate cluster (earlier results
+        win ties, so rank order decides between equally credible sources).
+        Survivors keep their original order.
+        """
+        if not self.enabled or len(search_results) < 2:
+            return search_results
+
+        cluster_ids = self.clusters([_resource_text(result) for result in search_results])
+        best: Dict[int, int] = {}
+        best_score: Dict[int, float] = {}
+        for index, cluster in enumerate(cluster_ids):
+            score = credibility(search_results[index].get('link', search_results[index].get('url', '')))
+            if cluster not in best or score > best_score[cluster]:
+                best[cluster], best_score[cluster] = index, score
+
+        keep = set(best.values())
+        deduplicated = [result for index, result in enumerate(search_results) if index in keep]
+
+        removed = len(search_results) - len(deduplicated)
+        self.stats["batches"] += 1
+        self.stats["results_seen"] += len(search_results)
+        self.stats["duplicates_removed"] += removed
+        if removed:
+            logger.info(f"🪞 Near-duplicate suppression removed {removed} mirrored resources ({len(deduplicated)} left)")
+        return deduplicated
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Suppression counters for monitoring"""
+        seen = self.stats["results_seen"]
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "removed_ratio": round(self.stats["duplicates_removed"] / seen, 3) if seen else None,
+            **self.stats
+        }
@@ -0,0 +1,212 @@
+"""
+AetherLearn Prompt Builder
+Token-budgeted prompt assembly for Gemini calls: resources are serialized as a
+compact pipe-separated table with per-field truncation instead of indented JSON
+(links are sent verbatim, since Gemini echoes them back as resource keys), and rows are dropped from the bottom of the ranking when a prompt would exceed
+its input token budget.
+"""
+
+import os
+import json
+import math
+import logging
+import textwrap
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Marker replaced by the resource table once the rest of the prompt is known
+RESOURCES_PLACEHOLDER = "<<RESOURCES>>"
+
+# Rough characters-per-token ratio for Gemini tokenization of English text and URLs
+CHARS_PER_TOKEN = 4
+
+# Maximum characters kept per table cell
+FIELD_LIMITS = {
+    "title": 100,
+    "snippet": 220,
+    "description": 220,
+    "source": 40,
+    "learning_objective": 140
+}
+DEFAULT_FIELD_LIMIT = 80
+
+# Columns the model copies into its answer (URLs are matched back to the search results),
+# so they are never truncated or rewritten
+VERBATIM_COLUMNS = {"link"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer round trip)"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate(value: Any, limit: int) -> str:
+    """Single-line cell value cut to `limit` characters"""
+    text = " ".join(str(value).split()) if value is not None else ""
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rstrip() + "…"
+
+
+def _first(resource: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        value = resource.get(key)
+        if value not in (None, ""):
+            return value
+    return ""
+
+
+def _page_metadata_cell(resource: Dict[str, Any]) -> str:
+    metadata = resource.get("page_metadata") or {}
+    parts = [metadata.get("resource_type"), metadata.get("difficulty")]
+    minutes = metadata.get("duration_minutes") or metadata.get("reading_time_minutes")
+    if minutes:
+        parts.append(f"{minutes}min")
+    return ";".join(part for part in parts if part)
+
+
+# Column name -> value getter. link/url and snippet/description are merged into one column each.
+COLUMN_GETTERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "title": lambda r: _first(r, "title"),
+    "link": lambda r: _first(r, "link", "url"),
+    "snippet": lambda r: _first(r, "snippet", "description"),
+    "source": lambda r: _first(r, "displayLink", "source"),
+    "type": lambda r: _first(r, "resource_type", "type"),
+    "difficulty": lambda r: _first(r, "difficulty"),
+    "minutes": lambda r: _first(r, "estimated_time_minutes"),
+    "quality": lambda r: round(r["quality_score"], 2) if isinstance(r.get("quality_score"), (int, float)) else "",
+    "category": lambda r: _first(r, "category"),
+    "page_meta": _page_metadata_cell
+}
+
+
+def _cell_value(resource: Dict[str, Any], column: str) -> Any:
+    getter = COLUMN_GETTERS.get(column)
+    return getter(resource) if getter is not None else resource.get(column, "")
+
+
+def _cell(resource: Dict[str, Any], column: str) -> str:
+    """Table cell text: verbatim for VERBATIM_COLUMNS, otherwise truncated with "|" replaced"""
+    value = _cell_value(resource, column)
+    if column in VERBATIM_COLUMNS:
+        return str(value).strip() if value is not None else ""
+    return truncate(value, FIELD_LIMITS.get(column, DEFAULT_FIELD_LIMIT)).replace("|", "/")
+
+
+class PromptBuilder:
+    """
+    Builds prompts within PROMPT_INPUT_TOKEN_BUDGET and reports the tokens saved
+    against the previous indented-JSON serialization.
+    """
+
+    def __init__(self, input_token_budget: int = None):
+        self.input_token_budget = input_token_budget or int(os.getenv("PROMPT_INPUT_TOKEN_BUDGET", "6000"))
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def resource_table(self, resources: Sequence[Dict[str, Any]], columns: Sequence[str],
+                       token_budget: Optional[int] = None, ids: Sequence[Any] = None) -> Tuple[str, List[int]]:
+        """
+        Serialize resources as a header line plus one pipe-separated row each.
+        Rows are added in order until token_budget is reached.
+
+        Returns:
+            (table text, indexes of the resources that were included)
+        """
+        header = "|".join(["id"] + list(columns))
+        lines = [header]
+        used = estimate_tokens(header)
+        kept: List[int] = []
+
+        for index, resource in enumerate(resources):
+            row_id = ids[index] if ids is not None else index
+            cells = [str(row_id)] + [_cell(resource, column) for column in columns]
+            row = "|".join(cells)
+            row_tokens = estimate_tokens(row) + 1
+            if token_budget is not None and used + row_tokens > token_budget:
+                break
+            lines.append(row)
+            used += row_tokens
+            kept.append(index)
+
+        return "\n".join(lines), kept
+
+    def build(self, operation: str, template: str, resources: Sequence[Dict[str, Any]] = (),
+              columns: Sequence[str] = (), ids: Sequence[Any] = None,
+              baseline_payload: Any = None) -> Tuple[str, List[int]]:
+        """
+        Fill RESOURCES_PLACEHOLDER in `template` with a resource table that fits the budget.
+
+        Args:
+            operation: Name used for reporting (e.g. "categorize")
+            template: Full prompt text containing RESOURCES_PLACEHOLDER (or none)
+            resources: Resources in priority order; the tail is dropped first
+            columns: Table columns (COLUMN_GETTERS names or plain resource keys)
+            ids: Row ids to show instead of positional indexes
+            baseline_payload: What the prompt used to embed as indented JSON (defaults to resources)
+
+        Returns:
+            (prompt, indexes of the resources included in the prompt)
+        """
+        # The baseline is the prompt as it used to be sent: indented template + indented JSON
+        baseline_overhead = estimate_tokens(template.replace(RESOURCES_PLACEHOLDER, ""))
+        template = textwrap.dedent(template).strip()
+        overhead = estimate_tokens(template.replace(RESOURCES_PLACEHOLDER, ""))
+
+        kept: List[int] = []
+        prompt = template
+        if RESOURCES_PLACEHOLDER in template:
+            table_budget = max(0, self.input_token_budget - overhead)
+            table, kept = self.resource_table(resources, columns, table_budget, ids)
+            prompt = template.replace(RESOURCES_PLACEHOLDER, table)
+
+        baseline = baseline_payload if baseline_payload is not None else list(resources)
+        baseline_tokens = baseline_overhead + estimate_tokens(json.dumps(baseline, indent=2, default=str))
+        self._record(operation, estimate_tokens(prompt), baseline_tokens, len(resources) - len(kept) if resources else 0)
+        return prompt, kept
+
+    def fit_text(self, operation: str, template: str, placeholder: str, text: str) -> str:
+        """Fill `placeholder` with free text, truncated so the prompt stays within the budget"""
+        baseline_tokens = estimate_tokens(template.replace(placeholder, "")) + estimate_tokens(text)
+        template = textwrap.dedent(template).strip()
+        overhead = estimate_tokens(template.replace(placeholder, ""))
+        max_chars = max(0, (self.input_token_budget - overhead) * CHARS_PER_TOKEN)
+        fitted = text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + " …"
+        prompt = template.replace(placeholder, fitted)
+        self._record(operation, estimate_tokens(prompt), baseline_tokens, 0)
+        return prompt
+
+    def _record(self, operation: str, prompt_tokens: int, baseline_tokens: int, rows_dropped: int):
+        saved = max(0, baseline_tokens - prompt_tokens)
+        stats = self.stats.setdefault(operation, {"prompts": 0, "prompt_tokens": 0, "tokens_saved": 0, "rows_dropped": 0})
+        stats["prompts"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["tokens_saved"] += saved
+        stats["rows_dropped"] += rows_dropped
+
+        message = f"✂️ {operation} prompt ~{prompt_tokens} tokens (saved ~{saved}"
+        if rows_dropped:
+            message += f", dropped {rows_dropped} lowest-ranked resources to fit {self.input_token_budget}"
+        logger.info(message + ")")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Prompt sizes and savings per operation for monitoring"""
+        return {"input_token_budget": self.input_token_budget, "operations": self.stats}
+
+
+# Shared builder (budget and savings counters per worker process)
+_prompt_builder: Optional[PromptBuilder] = None
+
+
+def get_prompt_builder() -> PromptBuilder:
+    """Get the process-wide prompt builder"""
+    global _prompt_builder
+    if _prompt_builder is None:
+        _prompt_builder = PromptBuilder()
+    return _prompt_builder
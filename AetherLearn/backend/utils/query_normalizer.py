@@ -0,0 +1,265 @@
+"""
+AetherLearn Query Normalizer
+Canonicalizes learning path queries so equivalent phrasings share one cache key:
+Unicode folding, stopword removal, light stemming and token sorting. Typo
+correction through a symmetric-delete spelling index is only used as a lookup
+fallback: a corrected query can find an existing cached path, but never
+becomes a cache or coalescing key itself.
+"""
+
+import os
+import re
+import logging
+import unicodedata
+from typing import Dict, List, Set, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "best", "by", "can", "do", "for", "from",
+    "how", "i", "in", "into", "is", "it", "me", "my", "of", "on", "or", "some", "the",
+    "to", "want", "what", "with", "you", "your"
+}
+
+
+# Real words that look like typos of other words (rust/rest, swift/shift); never corrected.
+# Extend with QUERY_DICTIONARY_PATH (one word per line).
+KNOWN_WORDS = {
+    "python", "java", "javascript", "typescript", "rust", "ruby", "kotlin", "swift", "scala", "golang",
+    "perl", "haskell", "elixir", "erlang", "clojure", "julia", "matlab", "react", "redux", "angular",
+    "svelte", "flask", "django", "rails", "spring", "laravel", "docker", "kubernetes", "linux", "unix",
+    "excel", "sheets", "figma", "blender", "unity", "unreal", "pandas", "numpy", "spark", "kafka",
+    "redis", "mongo", "mysql", "postgres", "graphql", "rest", "async", "cloud", "azure", "network",
+    "security", "design", "drawing", "painting", "guitar", "piano", "violin", "drums", "singing",
+    "spanish", "french", "german", "italian", "japanese", "chinese", "korean", "english", "chess",
+    "cooking", "baking", "photography", "writing", "physics", "chemistry", "biology", "calculus",
+    "algebra", "geometry", "statistics", "economics", "finance", "marketing", "history", "philosophy",
+    "psychology", "grammar", "poetry", "music", "theory", "machine", "learning", "deep", "neural",
+    "model", "data", "science", "web", "mobile", "game", "games", "basics", "advanced", "beginner"
+}
+
+
+def fold_unicode(text: str) -> str:
+    """Strip accents and apply case folding (e.g. 'Café' -> 'cafe')"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def stem(token: str) -> str:
+    """Light suffix-stripping stemmer tuned for short search queries"""
+    if len(token) <= 3 or not token.isalpha():
+        return token
+
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith("ing") and len(token) > 5:
+        base = token[:-3]
+        # programming -> program, running -> run
+        if len(base) > 2 and base[-1] == base[-2] and base[-1] not in "lsz":
+            base = base[:-1]
+        return base
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def damerau_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance, short-circuiting past max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class SymmetricDeleteIndex:
+    """
+    Symmetric-delete spelling index (SymSpell).
+    Every vocabulary word is indexed under all of its deletions up to max_distance,
+    so a lookup only generates deletions of the input instead of scanning the vocabulary.
+
+    Corrections are gated for confidence: words in known_words or shorter than
+    min_length are left alone, targets must have been seen at least min_frequency
+    times, and a tie between equally close, equally frequent targets is no correction.
+    """
+
+    def __init__(self, max_distance: int = 2, min_length: int = 5, min_frequency: int = 3,
+                 known_words: Set[str] = None):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.min_frequency = min_frequency
+        self.known_words = known_words or set()
+        self.frequencies: Dict[str, int] = {}
+        self.deletes: Dict[str, Set[str]] = {}
+
+    def _deletions(self, word: str, distance: int) -> Set[str]:
+        results = {word}
+        frontier = {word}
+        for _ in range(distance):
+            next_frontier = set()
+            for candidate in frontier:
+                for i in range(len(candidate)):
+                    next_frontier.add(candidate[:i] + candidate[i + 1:])
+            results |= next_frontier
+            frontier = next_frontier
+        return results
+
+    def add(self, word: str):
+        """Add a word (or bump its frequency)"""
+        if word in self.frequencies:
+            self.frequencies[word] += 1
+            return
+        self.frequencies[word] = 1
+        for deletion in self._deletions(word, self.max_distance):
+            self.deletes.setdefault(deletion, set()).add(word)
+
+    def correct(self, word: str) -> str:
+        """Closest vocabulary word within the edit budget if the correction is confident, or the word itself"""
+        if (word in self.frequencies or word in self.known_words
+                or len(word) < self.min_length or not word.isalpha()):
+            return word
+
+        # Allow fewer edits on short words to avoid over-correcting
+        max_distance = 1 if len(word) <= 5 else self.max_distance
+        best: Optional[str] = None
+        best_key = None
+        ambiguous = False
+        for deletion in self._deletions(word, max_distance):
+            for candidate in self.deletes.get(deletion, ()):
+                if self.frequencies[candidate] < self.min_frequency:
+                    continue
+                distance = damerau_levenshtein(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                key = (distance, -self.frequencies[candidate])
+                if best_key is None or key < best_key:
+                    best, best_key, ambiguous = candidate, key, False
+                elif key == best_key and candidate != best:
+                    ambiguous = True
+        return word if best is None or ambiguous else best
+
+
+def load_dictionary(path: str) -> Set[str]:
+    """Stemmed words of a one-word-per-line dictionary file"""
+    words = set()
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            word = fold_unicode(line.strip())
+            if word and not word.startswith("#"):
+                words.add(stem(word))
+    return words
+
+
+class QueryNormalizer:
+    """
+    Produces canonical query keys and shingles for similarity lookups.
+
+    canonicalize() never applies typo correction unless asked to; corrected()
+    returns the typo-corrected key only when a confident correction changed it,
+    for use as a read-only cache lookup fallback.
+    """
+
+    def __init__(self):
+        known_words = {stem(word) for word in KNOWN_WORDS}
+        dictionary_path = os.getenv("QUERY_DICTIONARY_PATH")
+        if dictionary_path:
+            try:
+                known_words |= load_dictionary(dictionary_path)
+            except OSError as e:
+                logger.warning(f"Query dictionary {dictionary_path} not loaded: {e}")
+        self.spelling_index = SymmetricDeleteIndex(
+            min_frequency=int(os.getenv("QUERY_TYPO_MIN_FREQUENCY", "3")),
+            known_words=known_words
+        )
+
+    def tokens(self, query: str, correct_typos: bool = False) -> List[str]:
+        """Folded, stopword-free, stemmed and (optionally) spell-corrected tokens"""
+        folded = fold_unicode(query)
+        tokens = []
+        for raw in TOKEN_PATTERN.findall(folded):
+            raw = raw.rstrip(".")
+            if not raw or raw in STOPWORDS:
+                continue
+            token = stem(raw)
+            if correct_typos:
+                token = self.spelling_index.correct(token)
+            tokens.append(token)
+        return tokens
+
+    def canonicalize(self, query: str, correct_typos: bool = False) -> str:
+        """Order-insensitive canonical key, e.g. 'python basics learning' -> 'basic learn python'"""
+        tokens = self.tokens(query, correct_typos)
+        if not tokens:
+            return " ".join(fold_unicode(query).split())
+        return " ".join(sorted(set(tokens)))
+
+    def corrected(self, query: str) -> Optional[str]:
+        """Typo-corrected canonical key if a confident correction changed the query, else None"""
+        corrected_query = self.canonicalize(query, correct_typos=True)
+        return corrected_query if corrected_query != self.canonicalize(query) else None
+
+    def learn(self, canonical_query: str):
+        """Add the tokens of a cached canonical query to the spelling vocabulary"""
+        for token in canonical_query.split():
+            self.spelling_index.add(token)
+
+    def typo_variants(self, a: str, b: str) -> bool:
+        """
+        Whether two differing tokens are spellings of one word: a small edit distance,
+        no digits (calculus 1 / calculus 2), neither token inside the other
+        (organic / inorganic) and not two known real words (rust / rest)
+        """
+        index = self.spelling_index
+        if (not (a.isalpha() and b.isalpha()) or a in b or b in a
+                or (a in index.known_words and b in index.known_words)
+                or min(len(a), len(b)) < index.min_length):
+            return False
+        max_distance = 1 if min(len(a), len(b)) <= 5 else index.max_distance
+        return damerau_levenshtein(a, b, max_distance) <= max_distance
+
+    def token_similarity(self, canonical_a: str, canonical_b: str) -> float:
+        """
+        Jaccard similarity of two canonical queries' token sets. A differing token only
+        counts as shared when it pairs with a typo variant on the other side, so
+        "calculus 1" / "calculus 2", "organic" / "inorganic" or "java" / "python" never match.
+        """
+        tokens_a, tokens_b = set(canonical_a.split()), set(canonical_b.split())
+        union = tokens_a | tokens_b
+        if not union:
+            return 1.0
+        shared = len(tokens_a & tokens_b)
+        unpaired = sorted(tokens_b - tokens_a)
+        for token in sorted(tokens_a - tokens_b):
+            partner = next((other for other in unpaired if self.typo_variants(token, other)), None)
+            if partner is not None:
+                unpaired.remove(partner)
+                # The pair counts once in both the intersection and the union
+                shared += 1
+        return shared / (len(union) - (shared - len(tokens_a & tokens_b)))
+
+    @staticmethod
+    def shingles(canonical_query: str) -> Set[str]:
+        """Tokens plus character trigrams of each token"""
+        shingles = set()
+        for token in canonical_query.split():
+            shingles.add(token)
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                shingles.add(padded[i:i + 3])
+        return shingles
@@ -0,0 +1,201 @@
+"""
+AetherLearn Ranking Engine
+Batch ranking of candidate resources. Candidates are loaded once into columnar
+NumPy arrays (quality, credibility, type weight, learning style matches,
+difficulty match, time bucket); credibility blending, final scores, ordering
+and the per-type diversity quotas are computed over whole columns instead of
+one dict at a time. Scores, order and diversity picks are identical to the
+per-item scoring in VertexAIClient: the same float64 operations run in the
+same order, and ties keep their input order (stable sorts).
+"""
+
+import logging
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Base score weights: quality, credibility, content type
+QUALITY_WEIGHT = 0.4
+CREDIBILITY_WEIGHT = 0.3
+TYPE_WEIGHT = 0.3
+
+# Blend of a resource's own quality with its source credibility
+CREDIBILITY_BLEND_QUALITY = 0.7
+CREDIBILITY_BLEND_SOURCE = 0.3
+
+# Preference bonuses
+STYLE_MATCH_BONUS = 0.1
+DIFFICULTY_MATCH_BONUS = 0.15
+TIME_MATCH_BONUS = 0.1
+
+# Default share of each content type when diversifying results
+BASE_TYPE_TARGETS = {
+    "video": 0.3,       # 30% videos
+    "article": 0.25,    # 25% articles
+    "course": 0.2,      # 20% courses
+    "interactive": 0.15,# 15% interactive content
+    "documentation": 0.1 # 10% documentation
+}
+
+# Result sets at or below this size are returned as-is by diversify
+DIVERSITY_MIN_ITEMS = 10
+
+
+def _column(items: List[Dict[str, Any]], key: str, default: Any) -> np.ndarray:
+    return np.array([item.get(key, default) for item in items], dtype=np.float64)
+
+
+def _descending(scores: np.ndarray, indices: Optional[np.ndarray] = None) -> np.ndarray:
+    """Indices ordered by score, highest first; equal scores keep their order (like a stable reverse sort)"""
+    if indices is None:
+        return np.argsort(-scores, kind="stable")
+    return indices[np.argsort(-scores[indices], kind="stable")]
+
+
+class RankingEngine:
+    """
+    Vectorized scoring and ranking over candidate resource dicts.
+
+    Args:
+        content_type_weights: resource_type -> weight used in the base score
+    """
+
+    def __init__(self, content_type_weights: Dict[str, float]):
+        self.content_type_weights = content_type_weights
+
+    def base_scores(self, items: List[Dict[str, Any]]) -> np.ndarray:
+        """Quality, credibility and content type weight combined, one score per item"""
+        weights = self.content_type_weights
+        quality = _column(items, "quality_score", 0.5)
+        credibility = _column(items, "credibility_score", 0.5)
+        type_weight = np.array([weights.get(item.get("resource_type", "unknown"), 0.5) for item in items], dtype=np.float64)
+        return (quality * QUALITY_WEIGHT) + (credibility * CREDIBILITY_WEIGHT) + (type_weight * TYPE_WEIGHT)
+
+    def apply_credibility(self, items: List[Dict[str, Any]], credibility_scores: Iterable[float]) -> List[Dict[str, Any]]:
+        """Blend each item's quality_score with its source credibility (written to the items)"""
+        if not items:
+            return items
+        credibility = np.array(list(credibility_scores), dtype=np.float64)
+        quality = _column(items, "quality_score", 0.5)
+        adjusted = np.minimum(1.0, (quality * CREDIBILITY_BLEND_QUALITY) + (credibility * CREDIBILITY_BLEND_SOURCE))
+        for item, quality_score, credibility_score in zip(items, adjusted.tolist(), credibility.tolist()):
+            item["quality_score"] = quality_score
+            item["credibility_score"] = credibility_score
+        return items
+
+    def rank(self, items: List[Dict[str, Any]], preferences: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Set each item's final_score (base score plus preference bonuses) and return them best first"""
+        if not items:
+            return []
+        order = self._rank(items, preferences or {}, self.base_scores(items))
+        return [items[index] for index in order.tolist()]
+
+    def diversify(self, items: List[Dict[str, Any]], preferences: Dict[str, Any], max_content_items: int) -> List[Dict[str, Any]]:
+        """
+        Fill per-type quotas with each type's best items, then the remaining
+        slots with the best of everything left.
+        """
+        if len(items) <= DIVERSITY_MIN_ITEMS:
+            return items
+        return self._diversify(items, preferences or {}, max_content_items, self.base_scores(items))
+
+    def rank_and_diversify(self, items: List[Dict[str, Any]], preferences: Dict[str, Any],
+                           max_content_items: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """rank() then diversify() on the ranked items, loading the score columns once"""
+        if not items:
+            return [], []
+        preferences = preferences or {}
+        scores = self.base_scores(items)
+        order = self._rank(items, preferences, scores)
+        ranked = [items[index] for index in order.tolist()]
+        if len(ranked) <= DIVERSITY_MIN_ITEMS:
+            return ranked, ranked
+        return ranked, self._diversify(ranked, preferences, max_content_items, scores[order])
+
+    def _rank(self, items: List[Dict[str, Any]], preferences: Dict[str, Any], scores: np.ndarray) -> np.ndarray:
+        """Write final scores to the items and return their indices, best first"""
+        bonus = np.zeros(len(items))
+
+        if "learning_style" in preferences:
+            learning_style = preferences["learning_style"]
+            preferred_styles = {learning_style} if isinstance(learning_style, str) else set(learning_style)
+            style_matches = np.array(
+                [len(preferred_styles.intersection(item.get("learning_styles", []))) for item in items], dtype=np.float64
+            )
+            bonus += style_matches * STYLE_MATCH_BONUS
+
+        if "difficulty" in preferences:
+            difficulty = preferences["difficulty"]
+            difficulty_match = np.array([item.get("difficulty") == difficulty for item in items], dtype=bool)
+            bonus += np.where(difficulty_match, DIFFICULTY_MATCH_BONUS, 0.0)
+
+        if "preferred_time_range" in preferences:
+            time_range = preferences["preferred_time_range"]
+            minutes = _column(items, "estimated_time_minutes", 30)
+            if time_range == "short":
+                in_range = minutes <= 30
+            elif time_range == "medium":
+                in_range = (minutes > 30) & (minutes <= 90)
+            elif time_range == "long":
+                in_range = minutes > 90
+            else:
+                in_range = None
+            if in_range is not None:
+                bonus += np.where(in_range, TIME_MATCH_BONUS, 0.0)
+
+        final_scores = np.minimum(1.0, scores + bonus)
+        for item, final_score in zip(items, final_scores.tolist()):
+            item["final_score"] = final_score
+        return _descending(final_scores)
+
+    @staticmethod
+    def type_targets(preferences: Dict[str, Any]) -> Dict[str, float]:
+        """Share of the result set per content type, boosted for preferred formats"""
+        if not preferences.get("formats"):
+            return BASE_TYPE_TARGETS
+
+        adjusted_targets = {}
+        # Boost preferred formats
+        formats = preferences["formats"]
+        for fmt in ([formats] if isinstance(formats, str) else formats):
+            if fmt in BASE_TYPE_TARGETS:
+                adjusted_targets[fmt] = BASE_TYPE_TARGETS[fmt] * 1.5
+
+        # Normalize to ensure total doesn't exceed 1.0
+        total_weight = sum(adjusted_targets.values())
+        if total_weight > 1.0:
+            for fmt in adjusted_targets:
+                adjusted_targets[fmt] = adjusted_targets[fmt] / total_weight
+        return adjusted_targets
+
+    def _diversify(self, items: List[Dict[str, Any]], preferences: Dict[str, Any], max_content_items: int,
+                   scores: np.ndarray) -> List[Dict[str, Any]]:
+        # Type code per item, codes in order of each type's first appearance
+        type_codes: Dict[Any, int] = {}
+        codes = np.array(
+            [type_codes.setdefault(item.get("resource_type", "article"), len(type_codes)) for item in items]
+        )
+        members = {resource_type: np.flatnonzero(codes == code) for resource_type, code in type_codes.items()}
+
+        max_items = min(max_content_items, len(items))
+        selected = []
+        remaining = {resource_type: indices for resource_type, indices in members.items()}
+
+        # First pass: each targeted type's best items, up to its quota
+        for content_type, target_pct in self.type_targets(preferences).items():
+            if content_type in members:
+                target_count = max(1, int(max_items * target_pct))
+                ordered = _descending(scores, members[content_type])
+                selected.append(ordered[:target_count])
+                remaining[content_type] = ordered[target_count:]
+
+        # Second pass: best remaining items across all types
+        remaining_slots = max_items - sum(len(chosen) for chosen in selected)
+        if remaining_slots > 0:
+            pool = np.concatenate(list(remaining.values()))
+            selected.append(_descending(scores, pool)[:remaining_slots])
+
+        chosen = np.concatenate(selected)[:max_items] if selected else np.array([], dtype=int)
+        return [items[index] for index in chosen.tolist()]
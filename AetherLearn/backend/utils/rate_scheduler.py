@@ -0,0 +1,240 @@
+"""
+AetherLearn Rate Scheduler
+Central token-bucket scheduler for outbound Custom Search and Gemini calls.
+Buckets are kept per upstream and per API key; callers queue briefly in
+priority order instead of failing on the first quota error.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+import logging
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Priority classes (lower value is served first)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_WARMER = 1
+PRIORITY_BATCH = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_WARMER: "warmer",
+    PRIORITY_BATCH: "batch"
+}
+
+# Priority of the work running in the current context (warmers and batch jobs override it)
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call cannot get a token within its queueing budget"""
+
+    def __init__(self, upstream: str, waited: float):
+        super().__init__(f"Rate limit for {upstream} exceeded after queueing {waited:.2f}s")
+        self.upstream = upstream
+        self.waited = waited
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at refill_rate tokens per second"""
+
+    def __init__(self, name: str, capacity: float, refill_rate: float):
+        self.name = name
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def available(self, floor: float = 0.0) -> float:
+        """Tokens usable by a caller that must leave `floor` tokens in the bucket"""
+        self._refill()
+        return self.tokens - floor
+
+    def consume(self, amount: float = 1.0):
+        self._refill()
+        self.tokens -= amount
+
+    def time_until(self, amount: float = 1.0, floor: float = 0.0) -> float:
+        """Seconds until `amount` tokens are available above `floor`"""
+        missing = amount - self.available(floor)
+        if missing <= 0:
+            return 0.0
+        if self.refill_rate <= 0:
+            return float("inf")
+        return missing / self.refill_rate
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "name": self.name,
+            "tokens": round(self.tokens, 2),
+            "capacity": self.capacity,
+            "refill_per_second": round(self.refill_rate, 4),
+            "fill_ratio": round(self.tokens / self.capacity, 3) if self.capacity else 0.0
+        }
+
+
+class RateScheduler:
+    """
+    Token buckets per (upstream, API key) with priority-ordered short queueing.
+    - Interactive calls may drain a bucket; warmers and batch jobs must leave a reserve
+    - Only the highest-priority waiter may take the next token
+    - Each priority class has its own maximum queueing time
+    """
+
+    def __init__(self):
+        search_per_day = float(os.getenv("SEARCH_MAX_QUERIES_PER_DAY", "100"))
+        search_per_minute = float(os.getenv("SEARCH_MAX_QUERIES_PER_MINUTE", "100"))
+        gemini_per_minute = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+
+        # upstream -> [(bucket name, capacity, refill per second)]
+        self.bucket_specs: Dict[str, List[Tuple[str, float, float]]] = {
+            "customsearch": [
+                ("per_minute", search_per_minute, search_per_minute / 60),
+                ("per_day", search_per_day, search_per_day / 86400)
+            ],
+            "gemini": [
+                ("per_minute", gemini_per_minute, gemini_per_minute / 60)
+            ]
+        }
+
+        # Fraction of each bucket reserved for higher priority classes
+        self.reserve_fractions = {
+            PRIORITY_INTERACTIVE: 0.0,
+            PRIORITY_WARMER: float(os.getenv("RATE_WARMER_RESERVE", "0.2")),
+            PRIORITY_BATCH: float(os.getenv("RATE_BATCH_RESERVE", "0.4"))
+        }
+        # Maximum queueing time per priority class (seconds)
+        self.max_waits = {
+            PRIORITY_INTERACTIVE: float(os.getenv("RATE_INTERACTIVE_MAX_WAIT", "2")),
+            PRIORITY_WARMER: float(os.getenv("RATE_WARMER_MAX_WAIT", "30")),
+            PRIORITY_BATCH: float(os.getenv("RATE_BATCH_MAX_WAIT", "60"))
+        }
+
+        self.buckets: Dict[Tuple[str, str], List[TokenBucket]] = {}
+        self.waiters: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._sequence = itertools.count()
+
+    @staticmethod
+    def _key_id(api_key: Optional[str]) -> str:
+        """Never expose API keys in metrics; identify them by a short hash"""
+        if not api_key:
+            return "default"
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+    def _get_buckets(self, upstream: str, key_id: str) -> List[TokenBucket]:
+        bucket_key = (upstream, key_id)
+        if bucket_key not in self.buckets:
+            self.buckets[bucket_key] = [
+                TokenBucket(name, capacity, rate)
+                for name, capacity, rate in self.bucket_specs.get(upstream, [])
+            ]
+            self.waiters[bucket_key] = []
+        return self.buckets[bucket_key]
+
+    def _record(self, upstream: str, outcome: str):
+        upstream_stats = self.stats.setdefault(upstream, {"granted": 0, "queued": 0, "rejected": 0})
+        upstream_stats[outcome] += 1
+
+    async def acquire(self, upstream: str, api_key: Optional[str] = None,
+                      priority: Optional[int] = None, max_wait: Optional[float] = None):
+        """
+        Wait for a token on every bucket of (upstream, api_key).
+
+        Args:
+            upstream: "customsearch" or "gemini"
+            api_key: Key the call is billed to (buckets are per key)
+            priority: Priority class (defaults to the current context's priority)
+            max_wait: Queueing budget in seconds (defaults to the priority class budget)
+
+        Raises:
+            RateLimitExceeded: no token became available within the queueing budget
+        """
+        if priority is None:
+            priority = request_priority.get()
+        if max_wait is None:
+            max_wait = self.max_waits.get(priority, self.max_waits[PRIORITY_BATCH])
+
+        key_id = self._key_id(api_key)
+        buckets = self._get_buckets(upstream, key_id)
+        if not buckets:
+            return
+
+        queue = self.waiters[(upstream, key_id)]
+        entry = (priority, next(self._sequence))
+        heapq.heappush(queue, entry)
+
+        reserve = self.reserve_fractions.get(priority, 0.0)
+        started = time.monotonic()
+        queued = False
+        try:
+            while True:
+                is_head = queue[0] == entry
+                if is_head:
+                    wait = max(bucket.time_until(1.0, bucket.capacity * reserve) for bucket in buckets)
+                    if wait == 0.0:
+                        for bucket in buckets:
+                            bucket.consume(1.0)
+                        self._record(upstream, "granted")
+                        return
+                else:
+                    # Re-check soon; a higher priority waiter is ahead of us
+                    wait = 0.05
+
+                elapsed = time.monotonic() - started
+                remaining = max_wait - elapsed
+                if remaining <= 0 or wait > remaining:
+                    self._record(upstream, "rejected")
+                    logger.warning(f"⏳ {upstream} rate limit reached for {PRIORITY_NAMES.get(priority, priority)} call")
+                    raise RateLimitExceeded(upstream, elapsed)
+
+                if not queued:
+                    queued = True
+                    self._record(upstream, "queued")
+                await asyncio.sleep(min(wait, remaining))
+        finally:
+            queue.remove(entry)
+            heapq.heapify(queue)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current bucket levels, queue depths and counters for monitoring"""
+        upstreams: Dict[str, Any] = {}
+        for (upstream, key_id), buckets in self.buckets.items():
+            upstreams.setdefault(upstream, {"keys": {}, "stats": self.stats.get(upstream, {})})
+            upstreams[upstream]["keys"][key_id] = {
+                "buckets": [bucket.snapshot() for bucket in buckets],
+                "queued": len(self.waiters[(upstream, key_id)])
+            }
+        return {
+            "upstreams": upstreams,
+            "reserve_fractions": {PRIORITY_NAMES[p]: f for p, f in self.reserve_fractions.items()},
+            "max_wait_seconds": {PRIORITY_NAMES[p]: w for p, w in self.max_waits.items()}
+        }
+
+
+# Shared scheduler instance (buckets are per worker process)
+_rate_scheduler: Optional[RateScheduler] = None
+
+
+def get_rate_scheduler() -> RateScheduler:
+    """Get the process-wide rate scheduler"""
+    global _rate_scheduler
+    if _rate_scheduler is None:
+        _rate_scheduler = RateScheduler()
+    return _rate_scheduler
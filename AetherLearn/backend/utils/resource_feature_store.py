@@ -0,0 +1,248 @@
+"""
+AetherLearn Resource Feature Store
+Per-URL memo of what the pipeline derives about a resource, shared across
+queries: heuristic features (type, difficulty, time estimate, learning styles,
+source credibility) and the last Gemini categorization label. Only the
+query-independent part of a label (category, type, difficulty, time) is shared;
+Gemini's relevance filtering is remembered per canonical query. Labels go stale
+after RESOURCE_LABEL_MAX_AGE_DAYS or when LABEL_VERSION changes. Entries are keyed
+on the canonical URL; an in-process LRU sits in front of the resource_features
+MongoDB collection. Stages prefetch a batch once (one $in query), then read
+entries synchronously before doing any heuristic or LLM work; new and updated
+entries are written back in one background bulk upsert.
+"""
+
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from app import database
+from utils.url_canonicalizer import canonicalize_url
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Bump when the heuristics change so features derived by older code are recomputed
+FEATURE_VERSION = 1
+# Bump when the categorization prompt changes so older Gemini labels are requested again
+LABEL_VERSION = 2
+
+# Resource fields of a Gemini label that do not depend on the query it was asked for
+# (learning_objective and relevance do, so they are never reused)
+LABEL_RESOURCE_FIELDS = ("resource_type", "type", "difficulty", "estimated_time_minutes")
+
+# Canonical queries remembered per URL for which Gemini filtered the resource out
+MAX_EXCLUDED_QUERIES = 20
+
+
+class ResourceFeatureStore:
+    """
+    Two-tier per-URL feature store.
+    - Memory: LRU bounded by entry count (RESOURCE_FEATURE_MEMORY_ENTRIES)
+    - MongoDB: shared across workers, expired by a TTL index (RESOURCE_FEATURE_TTL_DAYS)
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("RESOURCE_FEATURE_STORE_ENABLED", "true").lower() == "true"
+        self.max_entries = int(os.getenv("RESOURCE_FEATURE_MEMORY_ENTRIES", "20000"))
+        self.ttl_days = int(os.getenv("RESOURCE_FEATURE_TTL_DAYS", "30"))
+        self.label_max_age = timedelta(days=float(os.getenv("RESOURCE_LABEL_MAX_AGE_DAYS", "14")))
+
+        # canonical URL -> {"features", "features_version", "llm_label", "llm_label_version", "llm_labeled_at"}
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # canonical URL -> fields changed since the last write-back
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        # Strong references to write-back tasks so they are not garbage collected
+        self._flush_tasks = set()
+        self.stats = {
+            "feature_hits": 0, "feature_misses": 0, "label_hits": 0, "label_misses": 0, "label_stale": 0,
+            "persistent_loads": 0, "writes": 0, "evictions": 0
+        }
+
+    @staticmethod
+    def key_for(result: Dict[str, Any]) -> str:
+        """Canonical URL of a search result (attached by canonicalize_results when available)"""
+        return result.get("canonical_url") or canonicalize_url(result.get("link", result.get("url", "")))
+
+    async def prefetch(self, keys: Iterable[str]):
+        """Load the entries for keys missing from memory with one MongoDB query"""
+        if not self.enabled or database.db is None:
+            return
+        missing = list({key for key in keys if key and key not in self.entries})
+        if not missing:
+            return
+
+        try:
+            cursor = database.db.resource_features.find({"canonical_url": {"$in": missing}}, {"_id": 0})
+            documents = await cursor.to_list(length=len(missing))
+        except Exception as e:
+            logger.warning(f"Resource feature prefetch failed: {e}")
+            return
+
+        now = datetime.utcnow()
+        for document in documents:
+            # The TTL monitor only runs once a minute; skip expired entries
+            if document.get("expires_at", datetime.max) <= now:
+                continue
+            key = document.pop("canonical_url")
+            document.pop("expires_at", None)
+            self._remember(key, document)
+            self.stats["persistent_loads"] += 1
+
+    def features(self, key: str) -> Optional[Dict[str, Any]]:
+        """Derived features for a URL, or None when they must be computed"""
+        entry = self._lookup(key)
+        if entry and entry.get("features") is not None and entry.get("features_version") == FEATURE_VERSION:
+            self.stats["feature_hits"] += 1
+            return entry["features"]
+        self.stats["feature_misses"] += 1
+        return None
+
+    def llm_label(self, key: str, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Gemini's last categorization of a URL as it applies to `query` (a canonical query),
+        or None when Gemini has to be asked. Returns {"category": "articles", "resource":
+        {LABEL_RESOURCE_FIELDS}}, or {"category": None, "resource": None} when Gemini
+        filtered the URL out for this same query. A URL filtered out only for other
+        queries is a miss.
+        """
+        entry = self._lookup(key)
+        label = self._fresh_label(entry)
+        if label is None:
+            self.stats["label_stale" if entry and entry.get("llm_label") is not None else "label_misses"] += 1
+            return None
+        if query in label.get("excluded_queries", []):
+            self.stats["label_hits"] += 1
+            return {"category": None, "resource": None}
+        if not label.get("category"):
+            self.stats["label_misses"] += 1
+            return None
+        self.stats["label_hits"] += 1
+        return {"category": label["category"], "resource": label["resource"]}
+
+    def put_features(self, key: str, features: Dict[str, Any]):
+        """Remember derived features (written back on the next flush)"""
+        self._update(key, {"features": features, "features_version": FEATURE_VERSION})
+
+    def put_llm_label(self, key: str, category: str, resource: Dict[str, Any], query: str):
+        """Remember Gemini's category for a URL it kept for `query` (written back on the next flush)"""
+        previous = self._fresh_label(self._lookup(key)) or {}
+        self._put_label(key, {
+            "category": category,
+            "resource": {field: resource[field] for field in LABEL_RESOURCE_FIELDS if field in resource},
+            "excluded_queries": [excluded for excluded in previous.get("excluded_queries", []) if excluded != query]
+        })
+
+    def exclude_llm_label(self, key: str, query: str):
+        """Remember that Gemini filtered a URL out for `query`; other queries still ask again"""
+        entry = self._lookup(key)
+        previous = self._fresh_label(entry)
+        if previous is None:
+            self._put_label(key, {"category": None, "resource": None, "excluded_queries": [query]})
+            return
+        excluded = [other for other in previous.get("excluded_queries", []) if other != query] + [query]
+        # Keep the category's age: an exclusion does not make the category any fresher
+        self._put_label(key, {**previous, "excluded_queries": excluded[-MAX_EXCLUDED_QUERIES:]}, entry["llm_labeled_at"])
+
+    def _put_label(self, key: str, label: Dict[str, Any], labeled_at: datetime = None):
+        self._update(key, {
+            "llm_label": label, "llm_label_version": LABEL_VERSION, "llm_labeled_at": labeled_at or datetime.utcnow()
+        })
+
+    def _fresh_label(self, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not entry or entry.get("llm_label") is None:
+            return None
+        labeled_at = entry.get("llm_labeled_at")
+        if (entry.get("llm_label_version") != LABEL_VERSION or labeled_at is None
+                or datetime.utcnow() - labeled_at > self.label_max_age):
+            return None
+        return entry["llm_label"]
+
+    def schedule_flush(self):
+        """Write changed entries back to MongoDB in the background"""
+        if not self._dirty or database.db is None:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            return
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """Bulk upsert every entry changed since the last flush"""
+        if not self._dirty or database.db is None:
+            self._dirty.clear()
+            return
+
+        dirty, self._dirty = self._dirty, {}
+        expires_at = datetime.utcnow() + timedelta(days=self.ttl_days)
+        operations = [
+            UpdateOne(
+                {"canonical_url": key},
+                {"$set": {**fields, "canonical_url": key, "expires_at": expires_at}},
+                upsert=True
+            )
+            for key, fields in dirty.items()
+        ]
+        try:
+            await database.db.resource_features.bulk_write(operations, ordered=False)
+            self.stats["writes"] += len(operations)
+        except Exception as e:
+            logger.warning(f"Resource feature write-back failed: {e}")
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled or not key:
+            return None
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def _update(self, key: str, fields: Dict[str, Any]):
+        if not self.enabled or not key:
+            return
+        entry = self.entries.get(key) or {}
+        entry.update(fields)
+        self._remember(key, entry)
+        self._dirty.setdefault(key, {}).update(fields)
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory usage for monitoring"""
+        feature_lookups = self.stats["feature_hits"] + self.stats["feature_misses"]
+        label_lookups = self.stats["label_hits"] + self.stats["label_misses"] + self.stats["label_stale"]
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "pending_writes": len(self._dirty),
+            "feature_hit_ratio": round(self.stats["feature_hits"] / feature_lookups, 3) if feature_lookups else None,
+            "label_hit_ratio": round(self.stats["label_hits"] / label_lookups, 3) if label_lookups else None,
+            **self.stats
+        }
+
+
+# Shared store instance (one memory tier per worker process)
+_resource_feature_store: Optional[ResourceFeatureStore] = None
+
+
+def get_resource_feature_store() -> ResourceFeatureStore:
+    """Get the process-wide resource feature store"""
+    global _resource_feature_store
+    if _resource_feature_store is None:
+        _resource_feature_store = ResourceFeatureStore()
+    return _resource_feature_store
@@ -1,67 +1,176 @@
 import asyncio
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
 import os
+import re
+import time
+import json
+import hashlib
 import logging
-from app.database import db
+from app import database
 from models.learning_path import SearchStatusUpdate
-from utils.vertex_ai import VertexAIClient
+from utils.vertex_ai import VertexAIClient, GENERATION_MODES, GENERATION_MODE_TWO_CALL, GENERATION_MODE_ONE_SHOT
+from utils.custom_search_client import get_custom_search_client, CustomSearchError
+from utils.rate_scheduler import RateLimitExceeded
+from utils.search_result_cache import SearchResultCache
+from utils.query_normalizer import QueryNormalizer
+from utils.minhash import MinHasher, LSHIndex
+from utils.url_canonicalizer import canonicalize_url, canonicalize_results
+from utils.near_duplicates import NearDuplicateDetector
+from extractors.extractor_manager import get_extractor_manager
+from utils.llm_response_cache import llm_cache_bypass
+from utils.customization_engine import CustomizationEngine
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Estimated trigram similarity at which a cached query becomes a near-duplicate candidate.
+# Deliberately loose (typo variants score ~0.6); candidates are confirmed on token sets.
+QUERY_CANDIDATE_SIMILARITY = 0.5
+
 class SearchManager:
     def __init__(self):
         self.vertex_ai = VertexAIClient()
-        # Initialize cache for similar queries
-        self.query_cache = {}
+        # Filter/rerank preference changes are applied locally; structural ones go to Gemini
+        self.customization_engine = CustomizationEngine(self.vertex_ai)
+        # Initialize cache for similar queries (canonical query key -> cached learning path)
+        self.query_cache = OrderedDict()
+        self.query_cache_max_entries = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "500"))
         # Set cache expiry time (24 hours)
         self.cache_expiry_hours = 24
+        # Query canonicalization and near-duplicate lookup for the learning path cache
+        self.query_normalizer = QueryNormalizer()
+        self.query_minhasher = MinHasher(num_perm=64)
+        self.query_lsh = LSHIndex(num_perm=64, bands=16)
+        # Number of cached preference variants per canonical query (drives LSH removal)
+        self.query_variant_counts = {}
+        # Token-set similarity a near-duplicate candidate needs to share a cached learning path
+        self.query_similarity_threshold = float(os.getenv("QUERY_SIMILARITY_THRESHOLD", "0.9"))
+        # Mirrored copies of the same resource under different URLs (MinHash over titles/snippets)
+        self.near_duplicate_detector = NearDuplicateDetector()
         # Google Custom Search API configuration
         self.search_api_key = os.getenv("SEARCH_API_KEY")
         self.search_engine_id = os.getenv("SEARCH_ENGINE_ID")
+        self.search_client = get_custom_search_client()
+        # Fan-out mode: several result pages x query variants issued concurrently
+        self.enable_search_fanout = os.getenv("ENABLE_SEARCH_FANOUT", "true").lower() == "true"
+        self.search_fanout_pages = max(1, min(int(os.getenv("SEARCH_FANOUT_PAGES", "3")), 10))
+        # Persistent search result cache shared by all instances (vertex_ai_content collection)
+        self.search_result_cache = SearchResultCache()
         # In-memory search status cache (fallback when database unavailable)
         self.search_cache = {}
+        # Single-flight coalescing: coalescing key -> leader search_id, leader -> followers
+        self.inflight_searches = {}
+        self.flight_keys = {}
+        self.flight_followers = {}
+        self.latest_flight_status = {}
+        # Running pipelines (leader search_id -> task) and the last status poll of each client;
+        # a pipeline nobody has polled for SEARCH_ABANDON_SECONDS is cancelled (0 disables)
+        self.search_tasks = {}
+        self.last_polled = {}
+        self.abandon_after_seconds = float(os.getenv("SEARCH_ABANDON_SECONDS", "60"))
+        # Default course generation mode (requests may override it with generation_mode)
+        self.course_generation_mode = os.getenv("COURSE_GENERATION_MODE", GENERATION_MODE_TWO_CALL)
+        if self.course_generation_mode not in GENERATION_MODES:
+            logger.warning(f"Unknown COURSE_GENERATION_MODE '{self.course_generation_mode}', using {GENERATION_MODE_TWO_CALL}")
+            self.course_generation_mode = GENERATION_MODE_TWO_CALL
 
     async def _call_google_search(self, query: str, num_results: int = 10):
-        """Call Google Custom Search API directly to get web search results"""
+        """Call Google Custom Search API through the shared async client"""
         try:
-            from googleapiclient.discovery import build
-            from googleapiclient.errors import HttpError
-            
-            # Build the service object for the Custom Search API
-            service = build("customsearch", "v1", developerKey=self.search_api_key)
-            
-            # Execute the search query (Google Custom Search API has a maximum of 10 results per request)
-            num_results = min(num_results, 10)
-            
-            result = service.cse().list(
-                q=query,
-                cx=self.search_engine_id,
-                num=num_results
-            ).execute()
-            
-            # Parse and format the results
-            items = result.get('items', [])
-            formatted_resources = []
-            
-            for item in items:
-                formatted_resources.append({
-                    'title': item.get('title', ''),
-                    'link': item.get('link', ''),
-                    'snippet': item.get('snippet', ''),
-                    'displayLink': item.get('displayLink', '')
-                })
-            
-            return formatted_resources
+            # Google Custom Search API has a maximum of 10 results per request
+            return await self.search_client.search_items(query, num=min(num_results, 10))
                     
-        except HttpError as e:
-            logger.error(f"Google Custom Search API HttpError: {e}")
+        except CustomSearchError as e:
+            logger.error(f"Google Custom Search API error: {e}")
+            return []
+        except asyncio.TimeoutError:
+            logger.error(f"Google Custom Search API timed out for query: {query}")
+            return []
+        except RateLimitExceeded as e:
+            logger.error(f"Google Custom Search quota exhausted: {e}")
             return []
         except Exception as e:
             logger.error(f"Error calling Google Custom Search API: {e}")
             # Return empty list if search fails
             return []
 
+    async def _search_web(self, query: str, preferences: dict = None):
+        """Run the web search stage through the persistent search result cache"""
+        return await self.search_result_cache.get_or_fetch(
+            query, preferences, lambda: self._fetch_web_results(query, preferences)
+        )
+
+    async def _fetch_web_results(self, query: str, preferences: dict = None):
+        """Call the Custom Search API, fanning out when enabled"""
+        if self.enable_search_fanout:
+            return await self._fan_out_google_search(query, preferences)
+        return await self._call_google_search(query)
+
+    def _build_query_variants(self, query: str, preferences: dict = None):
+        """Original query plus the learning-focused variants from the Vertex AI query enhancer"""
+        variants = [query, self.vertex_ai._enhance_search_query(query, preferences)]
+        if preferences:
+            variants.append(self.vertex_ai._enhance_search_query(query))
+        
+        unique_variants = []
+        for variant in variants:
+            if variant and variant not in unique_variants:
+                unique_variants.append(variant)
+        return unique_variants
+
+    async def _fan_out_google_search(self, query: str, preferences: dict = None):
+        """
+        Issue every (query variant, result page) combination concurrently and merge the results.
+        Each call carries its own timeout, so one slow page only drops its own results.
+        """
+        variants = self._build_query_variants(query, preferences)
+        starts = [1 + 10 * page for page in range(self.search_fanout_pages)]
+        
+        async def fetch_page(variant: str, start: int):
+            try:
+                return await self.search_client.search_items(variant, num=10, start=start)
+            except CustomSearchError as e:
+                logger.warning(f"Fan-out page failed ({variant!r}, start={start}): {e}")
+            except asyncio.TimeoutError:
+                logger.warning(f"Fan-out page timed out ({variant!r}, start={start})")
+            except RateLimitExceeded as e:
+                logger.warning(f"Fan-out page skipped ({variant!r}, start={start}): {e}")
+            except Exception as e:
+                logger.warning(f"Fan-out page error ({variant!r}, start={start}): {e}")
+            return []
+        
+        combinations = [(variant_index, page_index) for page_index in range(len(starts)) for variant_index in range(len(variants))]
+        pages = await asyncio.gather(*(
+            fetch_page(variants[variant_index], starts[page_index])
+            for variant_index, page_index in combinations
+        ))
+        
+        merged = self._merge_search_pages(combinations, pages)
+        logger.info(
+            f"Fan-out search for '{query}': {len(variants)} variants x {len(starts)} pages -> "
+            f"{sum(len(page) for page in pages)} raw, {len(merged)} unique results"
+        )
+        return merged
+
+    def _merge_search_pages(self, combinations, pages):
+        """Merge fan-out pages by absolute rank (page, position, variant) and drop repeated canonical URLs"""
+        ranked = []
+        for (variant_index, page_index), items in zip(combinations, pages):
+            for position, item in enumerate(items):
+                ranked.append(((page_index * 10 + position, variant_index), item))
+        ranked.sort(key=lambda entry: entry[0])
+        
+        merged = []
+        seen_links = set()
+        for _, item in ranked:
+            link_key = canonicalize_url(item.get('link', ''))
+            if not link_key or link_key in seen_links:
+                continue
+            seen_links.add(link_key)
+            merged.append(item)
+        return merged
+
     async def update_search_status(self, search_id: str, update: SearchStatusUpdate):
         """Update the search status in the database or in-memory store"""
         update_dict = update.dict(exclude_none=True)
@@ -69,9 +178,9 @@ class SearchManager:
         update_dict["search_id"] = search_id
         
         # Try database first, fallback to in-memory storage
-        if db is not None:
+        if database.db is not None:
             try:
-                await db.search_status.update_one(
+                await database.db.search_status.update_one(
                     {"search_id": search_id},
                     {"$set": update_dict},
                     upsert=True
@@ -87,10 +196,14 @@ class SearchManager:
 
     async def get_search_status(self, search_id: str):
         """Get search status from database or in-memory store"""
+        # A status poll shows the client is still waiting for this search
+        if search_id in self.last_polled:
+            self.last_polled[search_id] = time.monotonic()
+        
         # Try database first
-        if db is not None:
+        if database.db is not None:
             try:
-                result = await db.search_status.find_one({"search_id": search_id})
+                result = await database.db.search_status.find_one({"search_id": search_id})
                 if result:
                     logger.info(f"✅ Search status retrieved from database for {search_id}")
                     return result
@@ -108,10 +221,10 @@ class SearchManager:
     async def get_learning_path(self, learning_path_id: str):
         """Get learning path from database or in-memory store"""
         # Try database first
-        if db is not None:
+        if database.db is not None:
             try:
                 from bson import ObjectId
-                result = await db.learning_paths.find_one({"_id": ObjectId(learning_path_id)})
+                result = await database.db.learning_paths.find_one({"_id": ObjectId(learning_path_id)})
                 if result:
                     logger.info(f"✅ Learning path retrieved from database for {learning_path_id}")
                     return result
@@ -127,11 +240,226 @@ class SearchManager:
         logger.warning(f"❌ Learning path not found for {learning_path_id}")
         return None
 
-    async def process_search(self, search_id: str, query: str, user_id: str = None, preferences: dict = None):
-        """Process a search query using Google Custom Search API + Vertex AI Gemini"""
+    def coalescing_key(self, query: str, preferences: dict = None) -> str:
+        """Identical searches share the canonical query and preferences"""
+        return f"{self.query_normalizer.canonicalize(query)}|{self._preferences_fingerprint(preferences)}"
+
+    def _begin_flight(self, search_id: str, query: str, preferences: dict = None):
+        """Register search_id as the leader of its flight if no other pipeline is running for it"""
+        if search_id in self.flight_followers:
+            return
+        key = self.coalescing_key(query, preferences)
+        if key not in self.inflight_searches:
+            self.inflight_searches[key] = search_id
+            self.flight_keys[search_id] = key
+            self.flight_followers[search_id] = []
+
+    def release_flight(self, leader_search_id: str):
+        """Detach a flight so later searches start (or hit the cache) on their own; returns its followers"""
+        key = self.flight_keys.pop(leader_search_id, None)
+        if key is not None and self.inflight_searches.get(key) == leader_search_id:
+            del self.inflight_searches[key]
+        self.latest_flight_status.pop(leader_search_id, None)
+        followers = self.flight_followers.pop(leader_search_id, [])
+        for follower_id in followers:
+            self.last_polled.pop(follower_id, None)
+        return followers
+
+    async def coalesce_search(self, search_id: str, query: str, preferences: dict = None):
+        """
+        Single-flight coalescing for learning path searches.
+        If an identical search is already running, attach search_id to it and return the
+        leader's search_id; otherwise register search_id as the leader and return None.
+        """
+        key = self.coalescing_key(query, preferences)
+        leader_search_id = self.inflight_searches.get(key)
+        
+        if leader_search_id is None:
+            self._begin_flight(search_id, query, preferences)
+            return None
+        
+        self.flight_followers[leader_search_id].append(search_id)
+        self.last_polled[search_id] = time.monotonic()
+        logger.info(f"🔗 Search {search_id} attached to in-flight search {leader_search_id} for '{query}'")
+        
+        # Bring the follower up to date with the pipeline's latest progress
+        latest_update = self.latest_flight_status.get(leader_search_id)
+        if latest_update is not None:
+            await self.update_search_status(search_id, latest_update)
+        return leader_search_id
+
+    async def _publish_status(self, search_id: str, update: SearchStatusUpdate, final: bool = False):
+        """Write a pipeline status update for the leader and every attached follower"""
+        if final:
+            # Detach first so no follower can attach after the last update is sent
+            followers = self.release_flight(search_id)
+        else:
+            followers = list(self.flight_followers.get(search_id, []))
+            if search_id in self.flight_followers:
+                self.latest_flight_status[search_id] = update
+        
+        await asyncio.gather(*(
+            self.update_search_status(target_id, update)
+            for target_id in [search_id] + followers
+        ))
+
+    def start_search(self, search_id: str, query: str, user_id: str = None, preferences: dict = None,
+                     generation_mode: str = None, fresh: bool = False) -> asyncio.Task:
+        """Run process_search as a tracked task that is cancelled once every waiting client has gone"""
+        self.last_polled[search_id] = time.monotonic()
+        task = asyncio.create_task(
+            self.process_search(
+                search_id=search_id,
+                query=query,
+                user_id=user_id,
+                preferences=preferences,
+                generation_mode=generation_mode,
+                fresh=fresh
+            )
+        )
+        self.search_tasks[search_id] = task
+        watchdog = asyncio.create_task(self._watch_abandonment(search_id, task)) if self.abandon_after_seconds > 0 else None
+        
+        def _finished(finished_task: asyncio.Task):
+            self.search_tasks.pop(search_id, None)
+            self.last_polled.pop(search_id, None)
+            if watchdog is not None:
+                watchdog.cancel()
+            # Failures are already logged and published by process_search
+            if not finished_task.cancelled():
+                finished_task.exception()
+        
+        task.add_done_callback(_finished)
+        return task
+
+    async def _watch_abandonment(self, search_id: str, task: asyncio.Task):
+        """Cancel the pipeline when neither the leader nor any follower has polled its status recently"""
+        interval = max(1.0, self.abandon_after_seconds / 4)
+        while not task.done():
+            await asyncio.sleep(interval)
+            watchers = [search_id] + self.flight_followers.get(search_id, [])
+            last_seen = max(self.last_polled.get(watcher_id, 0) for watcher_id in watchers)
+            if time.monotonic() - last_seen > self.abandon_after_seconds and not task.done():
+                logger.info(f"🛑 Search {search_id} abandoned by its clients, cancelling the pipeline")
+                task.cancel()
+                return
+
+    async def cancel_search(self, search_id: str) -> bool:
+        """
+        Client-initiated cancellation.
+        A follower just detaches; a pipeline is only cancelled when no other client is waiting for it.
+        Returns False if the search is not running.
+        """
+        for followers in self.flight_followers.values():
+            if search_id in followers:
+                followers.remove(search_id)
+                self.last_polled.pop(search_id, None)
+                await self.update_search_status(
+                    search_id,
+                    SearchStatusUpdate(status="CANCELLED", progress=0, message="Search cancelled")
+                )
+                return True
+        
+        task = self.search_tasks.get(search_id)
+        if task is None or task.done():
+            return False
+        
+        if self.flight_followers.get(search_id):
+            # Other clients still wait for this pipeline; it keeps running for them
+            self.last_polled[search_id] = 0
+            return True
+        
+        task.cancel()
+        return True
+
+    async def get_cached_learning_path_id(self, query: str, preferences: dict = None):
+        """
+        Return the ID of a cached (or pre-warmed) learning path for this query, if any.
+        Misses in this process's cache fall back to the newest unexpired learning path saved
+        under the same canonical key, so paths warmed or generated by other workers are reused.
+        """
+        cached = self._check_cache(query, preferences)
+        if cached is None:
+            cached = await self._find_saved_learning_path(query, preferences)
+        if cached is None:
+            return None
+        
+        learning_path_id = cached["learning_path_id"]
+        self.search_cache[f"learning_path_{learning_path_id}"] = cached["learning_path"]
+        return learning_path_id
+
+    async def _find_saved_learning_path(self, query: str, preferences: dict = None):
+        """Newest learning path in MongoDB for this exact canonical query and preferences"""
+        if database.db is None:
+            return None
+        
+        cache_key = self.coalescing_key(query, preferences)
+        oldest = datetime.utcnow() - timedelta(hours=self.cache_expiry_hours)
         try:
+            learning_path_data = await database.db.learning_paths.find_one(
+                {"cache_key": cache_key, "created_at": {"$gte": oldest}, "customized": {"$ne": True}},
+                sort=[("created_at", -1)]
+            )
+        except Exception as e:
+            logger.warning(f"Saved learning path lookup failed: {e}")
+            return None
+        if learning_path_data is None:
+            return None
+        
+        cached = {"learning_path_id": str(learning_path_data["_id"]), "learning_path": learning_path_data}
+        self._cache_results(query, cached, preferences, cached_at=learning_path_data["created_at"])
+        logger.info(f"Saved learning path hit for query: {query} ({cached['learning_path_id']})")
+        return cached
+
+    async def discard_search_status(self, search_id: str = None, prefix: str = None):
+        """Delete the status record of search_id, or of every search whose ID starts with prefix"""
+        if search_id is not None:
+            self.search_cache.pop(search_id, None)
+        if prefix is not None:
+            for key in [key for key in self.search_cache if key.startswith(prefix)]:
+                del self.search_cache[key]
+        if database.db is None:
+            return
+        
+        selector = {"search_id": search_id} if search_id is not None else {"search_id": {"$regex": f"^{re.escape(prefix)}"}}
+        try:
+            await database.db.search_status.delete_many(selector)
+        except Exception as e:
+            logger.warning(f"Search status cleanup failed: {e}")
+
+    async def process_search(self, search_id: str, query: str, user_id: str = None, preferences: dict = None,
+                             use_cache: bool = True, generation_mode: str = None, fresh: bool = False,
+                             lead_flight: bool = True):
+        """
+        Process a search query using Google Custom Search API + Vertex AI Gemini.
+        fresh=True skips the learning path and LLM response caches (new output is still cached).
+        lead_flight=False keeps identical user searches from attaching to this run (background
+        runs such as the cache warmer execute at a lower scheduler priority).
+        """
+        generation_mode = generation_mode or self.course_generation_mode
+        use_cache = use_cache and not fresh
+        bypass_token = llm_cache_bypass.set(fresh)
+        # Lead the flight for this query unless the caller already registered one
+        if lead_flight:
+            self._begin_flight(search_id, query, preferences)
+        try:
+            # Reuse a cached learning path for this or an equivalent query
+            learning_path_id = await self.get_cached_learning_path_id(query, preferences) if use_cache else None
+            if learning_path_id is not None:
+                await self._publish_status(
+                    search_id,
+                    SearchStatusUpdate(
+                        status="COMPLETED",
+                        progress=100,
+                        message="Learning path retrieved from cache",
+                        learning_path_id=learning_path_id
+                    ),
+                    final=True
+                )
+                return learning_path_id
+            
             # Step 1: Initialize search
-            await self.update_search_status(
+            await self._publish_status(
                 search_id,
                 SearchStatusUpdate(
                     status="INITIATED",
@@ -143,7 +471,7 @@ class SearchManager:
             )
             
             # Step 2: Google Custom Search API
-            await self.update_search_status(
+            await self._publish_status(
                 search_id,
                 SearchStatusUpdate(
                     status="SEARCHING",
@@ -158,11 +486,20 @@ class SearchManager:
             import asyncio
             await asyncio.sleep(0.5)
             
-            # Call Google Custom Search API
-            search_results = await self._call_google_search(query)
+            # Call Google Custom Search API (fan-out across pages and query variants)
+            search_results = await self._search_web(query, preferences)
+            
+            # Collapse tracking/mobile/AMP copies of the same resource before prompting the LLM
+            search_results = canonicalize_results(search_results)
+            
+            # Keep only the most credible of reposted/scraped copies before fetching pages or prompting
+            search_results = self.near_duplicate_detector.suppress(search_results, self.vertex_ai._get_source_credibility)
+            
+            # Real duration/difficulty/type from the pages themselves (bounded by a latency budget)
+            search_results = await get_extractor_manager().enrich_results(search_results)
             
             # Update with search results found - Start Stage 2
-            await self.update_search_status(
+            await self._publish_status(
                 search_id,
                 SearchStatusUpdate(
                     status="DISCOVERING",
@@ -177,50 +514,79 @@ class SearchManager:
             # Reduced delay for faster Stage 2 experience
             await asyncio.sleep(1)
             
-            # Step 3: Categorize search results using Vertex AI Gemini
-            await self.update_search_status(
-                search_id,
-                SearchStatusUpdate(
-                    status="CATEGORIZING",
-                    progress=60,
-                    message="Categorizing search results with Vertex AI",
-                    resources_found=len(search_results),
-                    sources_scanned=len(set(result.get('displayLink', '') for result in search_results))
+            if generation_mode == GENERATION_MODE_ONE_SHOT:
+                # Step 3+4: Categorize, filter and structure the course in a single Gemini call
+                await self._publish_status(
+                    search_id,
+                    SearchStatusUpdate(
+                        status="GENERATING",
+                        progress=70,
+                        message="Categorizing resources and structuring the learning path with Vertex AI",
+                        resources_found=len(search_results),
+                        sources_scanned=len(set(result.get('displayLink', '') for result in search_results))
+                    )
+                )
+                
+                learning_path_data, categorized_resources = await self.vertex_ai.generate_course_one_shot(
+                    query, search_results, preferences
+                )
+            else:
+                # Step 3: Categorize search results using Vertex AI Gemini
+                await self._publish_status(
+                    search_id,
+                    SearchStatusUpdate(
+                        status="CATEGORIZING",
+                        progress=60,
+                        message="Categorizing search results with Vertex AI",
+                        resources_found=len(search_results),
+                        sources_scanned=len(set(result.get('displayLink', '') for result in search_results))
+                    )
                 )
-            )
-            
-            # Minimal delay for categorization
-            await asyncio.sleep(0.5)
-            
-            categorized_resources = await self.vertex_ai.categorize_resources(search_results, query)
             
-            # Step 4: Generate course structure
-            await self.update_search_status(
-                search_id,
-                SearchStatusUpdate(
-                    status="GENERATING",
-                    progress=80,
-                    message="Generating personalized learning path structure",
-                    resources_found=len(search_results),
-                    sources_scanned=len(set(result.get('displayLink', '') for result in search_results))
+                # Minimal delay for categorization
+                await asyncio.sleep(0.5)
+            
+                categorized_resources = await self.vertex_ai.categorize_resources(search_results, query)
+            
+                # Step 4: Generate course structure
+                await self._publish_status(
+                    search_id,
+                    SearchStatusUpdate(
+                        status="GENERATING",
+                        progress=80,
+                        message="Generating personalized learning path structure",
+                        resources_found=len(search_results),
+                        sources_scanned=len(set(result.get('displayLink', '') for result in search_results))
+                    )
                 )
-            )
             
-            # Minimal delay for generation stage
-            await asyncio.sleep(0.5)
+                # Minimal delay for generation stage
+                await asyncio.sleep(0.5)
             
-            # Generate course structure using Vertex AI Gemini
-            learning_path_data = await self.vertex_ai.generate_course_from_search_results(
-                query, categorized_resources, preferences
-            )
+                # Generate course structure using Vertex AI Gemini, publishing each module
+                # as soon as it has streamed in so clients can show module 1 early
+                streamed_modules = []
+                
+                async def publish_module(module: dict):
+                    streamed_modules.append(module)
+                    await self._publish_status(
+                        search_id,
+                        SearchStatusUpdate(
+                            status="GENERATING",
+                            progress=min(95, 80 + 3 * len(streamed_modules)),
+                            message=f"Generated module {len(streamed_modules)}: {module.get('title', 'Untitled module')}",
+                            partial_learning_path={"query": query, "modules": list(streamed_modules)}
+                        )
+                    )
+                
+                learning_path_data = await self.vertex_ai.generate_course_from_search_results(
+                    query, categorized_resources, preferences, on_module=publish_module
+                )
             
             # Calculate quality metrics
             total_resources = sum(len(resources) for resources in categorized_resources.values())
             avg_quality = 0.85  # Default high quality for Google search results
             
-            # Cache this result for future similar queries
-            self._cache_results(query, learning_path_data)
-            
             # Enrich the learning path with metadata
             learning_path_data["user_id"] = user_id
             learning_path_data["query"] = query
@@ -230,76 +596,163 @@ class SearchManager:
             learning_path_data["search_version"] = "google-search-vertex-ai-1.0"
             learning_path_data["total_resources"] = total_resources
             learning_path_data["avg_quality"] = avg_quality
+            # Lets other workers find this path for the same canonical query and preferences
+            learning_path_data["cache_key"] = self.coalescing_key(query, preferences)
             
             # Store the learning path in the database or generate mock ID
-            if db is not None:
+            if database.db is not None:
                 try:
-                    result = await db.learning_paths.insert_one(learning_path_data)
+                    result = await database.db.learning_paths.insert_one(learning_path_data)
                     learning_path_id = str(result.inserted_id)
                     logger.info(f"✅ Learning path saved to database with ID: {learning_path_id}")
                 except Exception as e:
                     logger.warning(f"Database save failed, using mock ID: {e}")
-                    learning_path_id = f"mock_path_{search_id[:8]}"
+                    learning_path_id = f"mock_path_{search_id}"
             else:
-                learning_path_id = f"mock_path_{search_id[:8]}"
+                learning_path_id = f"mock_path_{search_id}"
                 logger.info(f"✅ Using mock learning path ID: {learning_path_id}")
             
             # Store the learning path data in memory for retrieval
             self.search_cache[f"learning_path_{learning_path_id}"] = learning_path_data
             
+            # Cache this result for future similar queries
+            self._cache_results(
+                query,
+                {"learning_path_id": learning_path_id, "learning_path": learning_path_data},
+                preferences
+            )
+            
             # Update status to COMPLETED
-            await self.update_search_status(
+            await self._publish_status(
                 search_id,
                 SearchStatusUpdate(
                     status="COMPLETED",
                     progress=100,
                     message="Learning path generation completed",
                     learning_path_id=learning_path_id
-                )
+                ),
+                final=True
             )
             
             logger.info(f"Learning path generated successfully with ID: {learning_path_id}")
             return learning_path_id
             
+        except asyncio.CancelledError:
+            logger.info(f"🛑 Search {search_id} cancelled")
+            await self._publish_status(
+                search_id,
+                SearchStatusUpdate(
+                    status="CANCELLED",
+                    progress=0,
+                    message="Search cancelled"
+                ),
+                final=True
+            )
+            raise
         except Exception as e:
             logger.error(f"Error processing search: {str(e)}")
             # Update status to FAILED
-            await self.update_search_status(
+            await self._publish_status(
                 search_id,
                 SearchStatusUpdate(
                     status="FAILED",
                     progress=0,
                     message=f"Error: {str(e)}"
-                )
+                ),
+                final=True
             )
             raise e
-            
-    def _check_cache(self, query: str):
-        """Check if we have cached results for similar queries"""
-        # Basic cache implementation - in production you'd use a more sophisticated approach
-        query_lower = query.lower().strip()
-        
-        # Check for exact match
-        now = datetime.utcnow()
-        for cached_query, (timestamp, content) in list(self.query_cache.items()):
-            # Remove expired items
-            if (now - timestamp).total_seconds() / 3600 > self.cache_expiry_hours:
-                del self.query_cache[cached_query]
+        finally:
+            self.release_flight(search_id)
+            llm_cache_bypass.reset(bypass_token)
+            
+    def _preferences_fingerprint(self, preferences: dict = None) -> str:
+        """Short stable hash of the preferences that shape a learning path"""
+        payload = json.dumps(preferences or {}, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+    def _check_cache(self, query: str, preferences: dict = None):
+        """
+        Check if we have a cached learning path for this or an equivalent query.
+        Exact canonical-key hits are O(1); near-duplicate phrasings go through the LSH index
+        and must then pass QueryNormalizer.token_similarity, so a different topic that merely
+        looks alike ("calculus 1" / "calculus 2") never gets another query's path.
+        """
+        canonical_query = self.query_normalizer.canonicalize(query)
+        preferences_key = self._preferences_fingerprint(preferences)
+        
+        content = self._get_cached_entry(f"{canonical_query}|{preferences_key}")
+        if content is not None:
+            logger.info(f"Cache hit for query: {query} (canonical: '{canonical_query}')")
+            return content
+        
+        # Confident typo corrections may find an existing path; they are never used as keys
+        corrected_query = self.query_normalizer.corrected(query)
+        if corrected_query is not None:
+            content = self._get_cached_entry(f"{corrected_query}|{preferences_key}")
+            if content is not None:
+                logger.info(f"Typo-corrected cache hit for query: {query} -> '{corrected_query}'")
+                return content
+        
+        signature = self.query_minhasher.signature(self.query_normalizer.shingles(canonical_query))
+        for similar_query, _ in self.query_lsh.query(signature, QUERY_CANDIDATE_SIMILARITY):
+            similarity = self.query_normalizer.token_similarity(canonical_query, similar_query)
+            if similarity < self.query_similarity_threshold:
                 continue
-                
-            # Check for similarity (exact match for now, could be improved)
-            if cached_query == query_lower:
-                logger.info(f"Cache hit for query: {query}")
+            content = self._get_cached_entry(f"{similar_query}|{preferences_key}")
+            if content is not None:
+                logger.info(f"Near-duplicate cache hit for query: {query} -> '{similar_query}' ({similarity:.2f})")
                 return content
         
         return None
+
+    def _get_cached_entry(self, cache_key: str):
+        """Return a live cache entry, expiring it lazily on access"""
+        entry = self.query_cache.get(cache_key)
+        if entry is None:
+            return None
         
-    def _cache_results(self, query: str, content_items):
-        """Cache search results for future use"""
-        query_lower = query.lower().strip()
-        timestamp = datetime.utcnow()
-        self.query_cache[query_lower] = (timestamp, content_items)
-        logger.info(f"Cached results for query: {query}")
+        timestamp, content = entry
+        if (datetime.utcnow() - timestamp).total_seconds() / 3600 > self.cache_expiry_hours:
+            self._evict_cache_entry(cache_key)
+            return None
+        
+        self.query_cache.move_to_end(cache_key)
+        return content
+        
+    def _cache_results(self, query: str, content_items, preferences: dict = None, cached_at: datetime = None):
+        """Cache a learning path under the canonical query key for future use"""
+        canonical_query = self.query_normalizer.canonicalize(query)
+        cache_key = f"{canonical_query}|{self._preferences_fingerprint(preferences)}"
+        
+        if cache_key not in self.query_cache:
+            self.query_variant_counts[canonical_query] = self.query_variant_counts.get(canonical_query, 0) + 1
+        self.query_cache[cache_key] = (cached_at or datetime.utcnow(), content_items)
+        self.query_cache.move_to_end(cache_key)
+        self.query_normalizer.learn(canonical_query)
+        self.query_lsh.add(
+            canonical_query,
+            self.query_minhasher.signature(self.query_normalizer.shingles(canonical_query))
+        )
+        
+        # Evict least recently used entries beyond the size bound
+        while len(self.query_cache) > self.query_cache_max_entries:
+            oldest_key = next(iter(self.query_cache))
+            self._evict_cache_entry(oldest_key)
+        
+        logger.info(f"Cached results for query: {query} (canonical: '{canonical_query}')")
+
+    def _evict_cache_entry(self, cache_key: str):
+        """Drop a cache entry and its LSH entry once no preference variant still uses it"""
+        if self.query_cache.pop(cache_key, None) is None:
+            return
+        canonical_query = cache_key.rsplit("|", 1)[0]
+        remaining = self.query_variant_counts.get(canonical_query, 1) - 1
+        if remaining > 0:
+            self.query_variant_counts[canonical_query] = remaining
+        else:
+            self.query_variant_counts.pop(canonical_query, None)
+            self.query_lsh.remove(canonical_query)
         
     def _log_content_diversity(self, content_items):
         """Log statistics about the discovered content types"""
@@ -353,7 +806,7 @@ class SearchManager:
         """Customize an existing learning path based on user preferences"""
         try:
             # Retrieve the existing learning path
-            learning_path_doc = await db.learning_paths.find_one({"_id": learning_path_id})
+            learning_path_doc = await database.db.learning_paths.find_one({"_id": learning_path_id})
             
             if not learning_path_doc:
                 raise ValueError(f"Learning path with ID {learning_path_id} not found")
@@ -361,13 +814,12 @@ class SearchManager:
             # Convert MongoDB document to dict
             learning_path = dict(learning_path_doc)
             
-            # Customize the learning path using Vertex AI
-            customized_path = await self.vertex_ai.customize_learning_path(learning_path, preferences)
+            # Customize the learning path (locally, or with Vertex AI for structural changes)
+            customized_path = await self.customization_engine.customize(learning_path, preferences)
             
             # Update metadata
             customized_path["updated_at"] = datetime.utcnow()
             customized_path["customized"] = True
-            customized_path["customization_preferences"] = preferences
             
             if user_id:
                 customized_path["user_id"] = user_id
@@ -379,11 +831,11 @@ class SearchManager:
                     del customized_path["_id"]
                 
                 # Insert as a new learning path
-                result = await db.learning_paths.insert_one(customized_path)
+                result = await database.db.learning_paths.insert_one(customized_path)
                 return str(result.inserted_id)
             else:
                 # Update existing learning path
-                await db.learning_paths.replace_one(
+                await database.db.learning_paths.replace_one(
                     {"_id": learning_path_id},
                     customized_path
                 )
@@ -0,0 +1,135 @@
+"""
+AetherLearn Search Result Cache
+Persistent Custom Search result cache stored in the vertex_ai_content collection.
+Entries are fresh for CACHE_EXPIRY_HOURS, then served stale while a background
+refresh runs, and finally removed by the MongoDB TTL index.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+
+from app import database
+
+logger = logging.getLogger(__name__)
+
+
+class SearchResultCache:
+    """Mongo-backed search result cache shared by every instance of the backend"""
+
+    def __init__(self):
+        self.enabled = os.getenv("ENABLE_CONTENT_CACHING", "true").lower() == "true"
+        self.fresh_hours = int(os.getenv("CACHE_EXPIRY_HOURS", "24"))
+        self.stale_hours = int(os.getenv("SEARCH_CACHE_STALE_HOURS", "72"))
+        # Keys with a background refresh in flight (avoids duplicate refreshes)
+        self._refreshing = set()
+        # Strong references to refresh tasks so they are not garbage collected
+        self._refresh_tasks = set()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Lower-case and collapse whitespace"""
+        return " ".join(query.lower().split())
+
+    def cache_key(self, query: str, preferences: Dict[str, Any] = None) -> str:
+        """Key on the normalized query and the preferences that shape the search variants"""
+        payload = json.dumps(
+            {"query": self.normalize_query(query), "preferences": preferences or {}},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """Return (results, is_stale) or None on a miss"""
+        if not self.enabled or database.db is None:
+            return None
+
+        try:
+            entry = await database.db.vertex_ai_content.find_one({"cache_key": key})
+        except Exception as e:
+            logger.warning(f"Search cache lookup failed: {e}")
+            return None
+
+        if not entry:
+            return None
+
+        now = datetime.utcnow()
+        if entry.get("expires_at") and entry["expires_at"] <= now:
+            # The TTL monitor only runs once a minute; treat expired entries as misses
+            return None
+
+        is_stale = entry.get("fresh_until") is None or entry["fresh_until"] <= now
+        return entry.get("results", []), is_stale
+
+    async def set(self, key: str, query: str, results: List[Dict[str, Any]]):
+        """Store results with fresh and hard-expiry timestamps"""
+        if not self.enabled or database.db is None or not results:
+            return
+
+        now = datetime.utcnow()
+        fresh_until = now + timedelta(hours=self.fresh_hours)
+        try:
+            await database.db.vertex_ai_content.update_one(
+                {"cache_key": key},
+                {"$set": {
+                    "cache_key": key,
+                    "query": self.normalize_query(query),
+                    "results": results,
+                    "result_count": len(results),
+                    "created_at": now,
+                    "fresh_until": fresh_until,
+                    "expires_at": fresh_until + timedelta(hours=self.stale_hours)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Search cache write failed: {e}")
+
+    async def get_or_fetch(self, query: str, preferences: Dict[str, Any],
+                           fetch: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """
+        Serve from cache when possible.
+        - Fresh hit: return cached results
+        - Stale hit: return cached results immediately and refresh in the background
+        - Miss: fetch, store and return
+        """
+        key = self.cache_key(query, preferences)
+        cached = await self.get(key)
+
+        if cached is not None:
+            results, is_stale = cached
+            if is_stale:
+                logger.info(f"♻️ Serving stale search results for '{query}', refreshing in background")
+                self._schedule_refresh(key, query, fetch)
+            else:
+                logger.info(f"✅ Search cache hit for '{query}'")
+            return results
+
+        results = await fetch()
+        await self.set(key, query, results)
+        return results
+
+    def _schedule_refresh(self, key: str, query: str, fetch: Callable[[], Awaitable[List[Dict[str, Any]]]]):
+        """Start a single background refresh per key"""
+        if key in self._refreshing:
+            return
+
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, query, fetch))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, key: str, query: str, fetch: Callable[[], Awaitable[List[Dict[str, Any]]]]):
+        try:
+            results = await fetch()
+            await self.set(key, query, results)
+            logger.info(f"🔄 Refreshed cached search results for '{query}' ({len(results)} results)")
+        except Exception as e:
+            logger.warning(f"Background search refresh failed for '{query}': {e}")
+        finally:
+            self._refreshing.discard(key)
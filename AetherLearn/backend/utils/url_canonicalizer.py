@@ -0,0 +1,141 @@
+"""
+AetherLearn URL Canonicalizer
+Reduces search result URLs to a canonical form (tracking parameters, www/mobile
+hosts, AMP pages, trailing slashes) and removes duplicate resources before they
+reach categorization and the LLM prompts.
+"""
+
+import logging
+from typing import Dict, List, Any
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only track where a click came from, on any site
+# (ad click ids and analytics campaign tags; nothing a page could use for content)
+TRACKING_PARAMS = {
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "_hsenc", "_hsmi", "s_kwcid"
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "hsa_")
+
+# Generic parameter names that are tracking only on these hosts (and their subdomains).
+# Elsewhere they can select content, e.g. GitHub's ?ref=<branch> picks a different tree.
+HOST_TRACKING_PARAMS = {
+    "youtube.com": {"feature", "si", "pp"},
+    "youtu.be": {"feature", "si"},
+    "medium.com": {"source", "sk"},
+    "twitter.com": {"ref_src", "ref_url", "s"},
+    "x.com": {"ref_src", "ref_url", "s"},
+    "linkedin.com": {"trk", "trackingid", "refid"},
+    "instagram.com": {"igshid", "igsh"},
+    "spotify.com": {"si"},
+    "amazon.com": {"ref", "ref_"},
+    "producthunt.com": {"ref"},
+    "aliexpress.com": {"spm"},
+    "alibaba.com": {"spm"}
+}
+
+# Host labels that select a mobile/AMP/www mirror of the same site
+MIRROR_LABELS = {"www", "m", "mobile", "amp"}
+
+# Trailing path segments that serve the same document
+INDEX_DOCUMENTS = {"index.html", "index.htm", "index.php", "default.aspx"}
+
+
+def _canonical_host(netloc: str) -> str:
+    host = netloc.lower().rsplit("@", 1)[-1]
+    if host.endswith(":80") or host.endswith(":443"):
+        host = host.rsplit(":", 1)[0]
+
+    labels = host.split(".")
+    # Drop mirror labels (www., m., en.m., amp.) while keeping at least a registrable name
+    kept = [label for label in labels[:-2] if label not in MIRROR_LABELS] + labels[-2:]
+    return ".".join(kept)
+
+
+def _canonical_path(path: str) -> str:
+    segments = [segment for segment in path.split("/") if segment]
+
+    # AMP variants: /article/amp, /amp/article, /article.amp.html
+    if segments and segments[-1].lower() == "amp":
+        segments.pop()
+    if segments and segments[0].lower() == "amp":
+        segments.pop(0)
+    if segments and segments[-1].lower().endswith(".amp.html"):
+        segments[-1] = segments[-1][:-len(".amp.html")] + ".html"
+
+    if segments and segments[-1].lower() in INDEX_DOCUMENTS:
+        segments.pop()
+
+    return "/" + "/".join(segments) if segments else ""
+
+
+def _host_tracking_params(host: str) -> set:
+    """HOST_TRACKING_PARAMS entries for the host and each of its parent domains"""
+    labels = host.split(".")
+    params = set()
+    for i in range(len(labels) - 1):
+        params |= HOST_TRACKING_PARAMS.get(".".join(labels[i:]), set())
+    return params
+
+
+def _is_tracking_param(name: str, host_params: set) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name in host_params or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of a URL used as a dedupe key.
+    The original link is still what gets shown to learners.
+    """
+    if not url:
+        return ""
+
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url.lower()
+
+    host = _canonical_host(parts.netloc)
+    path = _canonical_path(parts.path)
+    host_params = _host_tracking_params(host)
+    params = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+              if not _is_tracking_param(name, host_params)]
+
+    # YouTube: short links and watch pages identify the video by its id only
+    if host == "youtu.be" and path:
+        params = [("v", path.lstrip("/"))]
+        host, path = "youtube.com", "/watch"
+    elif host == "youtube.com" and path == "/watch":
+        params = [(name, value) for name, value in params if name == "v"]
+
+    query = urlencode(sorted(params))
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def canonicalize_results(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Attach canonical_url to each result and keep only the best-ranked copy of each URL.
+    Results are expected in rank order, so the first occurrence wins.
+    """
+    deduplicated = []
+    seen = set()
+
+    for result in search_results:
+        link = result.get('link', result.get('url', ''))
+        canonical = canonicalize_url(link)
+        if not canonical or canonical in seen:
+            continue
+        seen.add(canonical)
+        deduplicated.append({**result, 'canonical_url': canonical})
+
+    removed = len(search_results) - len(deduplicated)
+    if removed:
+        logger.info(f"🔗 URL canonicalization removed {removed} duplicate resources ({len(deduplicated)} left)")
+    return deduplicated
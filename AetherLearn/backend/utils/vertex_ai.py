@@ -1,15 +1,31 @@
 import os
+import time
 import asyncio
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Awaitable, Callable, Optional
 from dotenv import load_dotenv
 import json
 import logging
 import re
 from urllib.parse import urlparse
 
+import aiohttp
 # Direct Gemini API imports (more reliable than Vertex AI)
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from utils.rate_scheduler import get_rate_scheduler, RateLimitExceeded
+from utils.prompt_builder import get_prompt_builder, estimate_tokens, RESOURCES_PLACEHOLDER
+from utils.llm_response_cache import get_llm_response_cache
+from utils.resource_feature_store import get_resource_feature_store
+from utils.query_normalizer import QueryNormalizer
+from utils.json_stream_parser import JSONArrayStreamParser, parse_json_response, decode_json_response, is_complete_json
+from utils.domain_credibility import DomainCredibilityIndex
+from utils.ranking_engine import RankingEngine
+from utils.keyword_engine import (
+    analyze_resource, NON_EDUCATIONAL_TERMS, COURSE_DOMAINS, CATEGORY_ACADEMIC_DOMAINS, CATEGORY_INTERACTIVE_TERMS
+)
 
 load_dotenv()
 
@@ -17,6 +33,500 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of recent calls per operation used for latency percentiles
+LATENCY_WINDOW = 500
+
+# Course generation modes: categorize then structure (two Gemini calls) or both in one call
+GENERATION_MODE_TWO_CALL = "two_call"
+GENERATION_MODE_ONE_SHOT = "one_shot"
+GENERATION_MODES = (GENERATION_MODE_TWO_CALL, GENERATION_MODE_ONE_SHOT)
+
+RESOURCE_CATEGORIES = ["videos", "articles", "courses", "documentation", "interactive", "academic"]
+
+# Resource table columns of the categorization prompt
+CATEGORIZE_COLUMNS = ["title", "link", "snippet", "source", "page_meta"]
+
+# Category -> resource "type" used in generated modules
+CATEGORY_RESOURCE_TYPES = {
+    "videos": "video",
+    "articles": "article",
+    "courses": "course",
+    "documentation": "documentation",
+    "interactive": "interactive",
+    "academic": "academic"
+}
+
+# Hosts whose category is known without reading the result (matched on the host and its parents)
+DOMAIN_CATEGORIES = {
+    "youtube.com": "videos", "youtu.be": "videos", "vimeo.com": "videos", "ted.com": "videos",
+    "coursera.org": "courses", "edx.org": "courses", "udacity.com": "courses", "khanacademy.org": "courses",
+    "arxiv.org": "academic", "ieee.org": "academic", "acm.org": "academic", "researchgate.net": "academic",
+    "docs.python.org": "documentation", "developer.mozilla.org": "documentation"
+}
+
+# Title/URL terms that suggest a result may not be educational; Gemini decides those
+
+# Heuristic confidence by evidence: page metadata > known domain > title keyword > default
+CONFIDENCE_PAGE_METADATA = 0.95
+CONFIDENCE_DOMAIN = 0.9
+CONFIDENCE_KEYWORD = 0.6
+CONFIDENCE_DEFAULT = 0.3
+
+# Response schema for one-shot generation. Resources are referenced by their input id
+# so the model never has to echo titles, links and snippets back.
+ONE_SHOT_COURSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"},
+        "difficulty": {"type": "string", "enum": ["beginner", "intermediate", "advanced"]},
+        "estimated_hours": {"type": "number"},
+        "resources": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "category": {"type": "string", "enum": RESOURCE_CATEGORIES},
+                    "difficulty": {"type": "string", "enum": ["beginner", "intermediate", "advanced"]},
+                    "estimated_time_minutes": {"type": "integer"},
+                    "quality_score": {"type": "number"},
+                    "learning_objective": {"type": "string"}
+                },
+                "required": ["id", "category", "difficulty", "estimated_time_minutes"]
+            }
+        },
+        "modules": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "description": {"type": "string"},
+                    "estimated_hours": {"type": "number"},
+                    "learning_objectives": {"type": "array", "items": {"type": "string"}},
+                    "resource_ids": {"type": "array", "items": {"type": "integer"}}
+                },
+                "required": ["title", "description", "estimated_hours", "resource_ids"]
+            }
+        }
+    },
+    "required": ["title", "description", "difficulty", "estimated_hours", "resources", "modules"]
+}
+
+
+def _is_json_object(response_text: str) -> bool:
+    """Cache validator for operations that must answer with one complete JSON object"""
+    return is_complete_json(response_text, dict)
+
+
+def _has_modules(course_structure: Any) -> bool:
+    """Whether a parsed course has a non-empty modules list (a recovered truncated answer may not)"""
+    return (isinstance(course_structure, dict) and isinstance(course_structure.get("modules"), list)
+            and len(course_structure["modules"]) > 0)
+
+
+def _is_course(response_text: str) -> bool:
+    """Cache validator for course generation: one complete JSON object with modules"""
+    return _is_json_object(response_text) and _has_modules(parse_json_response(response_text))
+
+
+def _percentile(samples, fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling Gemini while every model in the cascade has an open circuit breaker"""
+
+
+def counts_against_breaker(error: BaseException) -> bool:
+    """
+    Whether a failed call says the model is unhealthy: 5xx, 429 / ResourceExhausted,
+    connection errors and timeouts. Other 4xx (InvalidArgument, PermissionDenied, ...)
+    are faults of the request and leave the breaker alone.
+    """
+    if isinstance(error, google_exceptions.GoogleAPICallError):
+        return isinstance(error, (google_exceptions.ServerError, google_exceptions.TooManyRequests))
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, aiohttp.ClientConnectionError))
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker: opens after `failure_threshold` consecutive failures, lets one
+    trial call through after `cooldown_seconds` and closes again once a call succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now (reserves the trial call when half-open)"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """A cancelled call says nothing about health; free the trial slot"""
+        self.trial_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened
+        }
+
+
+class LLMGateway:
+    """
+    Process-wide gateway for every Gemini call.
+    - Dedicated concurrency limit, independent of the default thread pool
+    - Quota scheduler token and a per-call deadline for each call
+    - Cancelling the awaiting task cancels the in-flight request
+    - Model cascade (GEMINI_MODEL, then GEMINI_MODEL_CASCADE) with a circuit breaker per model
+    - Hedged duplicate request once a call has run longer than the operation's p95 latency
+    - Latency, timeout and error counters per operation
+    """
+
+    def __init__(self):
+        self.max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+        self.default_timeout = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "45"))
+        primary_model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-001")
+        fallback_models = [model.strip() for model in os.getenv("GEMINI_MODEL_CASCADE", "").split(",") if model.strip()]
+        self.models = list(dict.fromkeys([primary_model] + fallback_models))
+        self.hedge_enabled = os.getenv("GEMINI_HEDGE_ENABLED", "true").lower() == "true"
+        self.hedge_min_samples = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+        self.hedge_min_delay = int(os.getenv("GEMINI_HEDGE_MIN_DELAY_MS", "500")) / 1000
+        self.breakers = {
+            model: CircuitBreaker(
+                int(os.getenv("GEMINI_BREAKER_FAILURES", "5")),
+                float(os.getenv("GEMINI_BREAKER_COOLDOWN_SECONDS", "30"))
+            )
+            for model in self.models
+        }
+        self.in_flight = 0
+        self.operations: Dict[str, Dict[str, Any]] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _operation_stats(self, operation: str) -> Dict[str, Any]:
+        if operation not in self.operations:
+            self.operations[operation] = {
+                "calls": 0, "succeeded": 0, "errors": 0, "timeouts": 0, "cancelled": 0, "rate_limited": 0,
+                "short_circuited": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0,
+                "prompt_tokens": 0, "output_tokens": 0,
+                "latencies": deque(maxlen=LATENCY_WINDOW),
+                "queue_waits": deque(maxlen=LATENCY_WINDOW)
+            }
+        return self.operations[operation]
+
+    def _hedge_delay(self, stats: Dict[str, Any]) -> Optional[float]:
+        """p95 call latency of the operation, once there are enough samples to trust it"""
+        if not self.hedge_enabled or len(stats["latencies"]) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, _percentile(list(stats["latencies"]), 0.95))
+
+    async def run(self, operation: str, call: Callable[[str], Awaitable[Any]],
+                  api_key: str = None, timeout: float = None, hedge: bool = True, cascade: bool = True) -> Any:
+        """
+        Run one model call under the gateway limits.
+
+        Args:
+            operation: Name used for metrics (e.g. "categorize", "course_generation")
+            call: Coroutine factory taking the model id and performing the actual request
+            api_key: Key the call is billed to (for the quota scheduler)
+            timeout: Deadline in seconds covering queueing, hedging and fallbacks (defaults to GEMINI_TIMEOUT_SECONDS)
+            hedge: Allow a duplicate request after the p95 delay (disable for streaming calls)
+            cascade: Fall back to the next model in the cascade when a model fails or is unhealthy
+
+        Raises:
+            asyncio.TimeoutError: the deadline passed
+            RateLimitExceeded: no quota token within the queueing budget
+            CircuitOpenError: every usable model has an open circuit breaker
+        """
+        stats = self._operation_stats(operation)
+        stats["calls"] += 1
+        deadline = timeout or self.default_timeout
+        models = self.models if cascade else self.models[:1]
+        # Models with an attempt still running, charged with a failure if the deadline passes
+        running: List[str] = []
+        try:
+            return await asyncio.wait_for(
+                self._run_cascade(operation, call, api_key, stats, models, hedge, running), deadline
+            )
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            for model in running:
+                self.breakers[model].record_failure()
+            logger.warning(f"⏱️ Gemini {operation} call exceeded its {deadline:.0f}s deadline")
+            raise
+        except asyncio.CancelledError:
+            stats["cancelled"] += 1
+            raise
+        except RateLimitExceeded:
+            stats["rate_limited"] += 1
+            raise
+        except CircuitOpenError:
+            stats["short_circuited"] += 1
+            raise
+        except Exception:
+            stats["errors"] += 1
+            raise
+
+    async def _run_cascade(self, operation: str, call: Callable[[str], Awaitable[Any]], api_key: Optional[str],
+                           stats: Dict[str, Any], models: List[str], hedge: bool, running: List[str]) -> Any:
+        remaining = iter(models)
+
+        def next_model() -> Optional[str]:
+            for model in remaining:
+                if self.breakers[model].allow():
+                    return model
+            return None
+
+        model = next_model()
+        if model is None:
+            raise CircuitOpenError(f"Circuit open for every Gemini model ({', '.join(models)})")
+
+        attempts: Dict[asyncio.Task, str] = {}
+
+        def launch(attempt_model: str) -> asyncio.Task:
+            task = asyncio.create_task(self._attempt(attempt_model, call, api_key, stats))
+            attempts[task] = attempt_model
+            running.append(attempt_model)
+            return task
+
+        launch(model)
+        hedge_task = None
+        hedge_delay = self._hedge_delay(stats) if hedge else None
+        last_error: Optional[BaseException] = None
+        try:
+            while attempts:
+                done, _ = await asyncio.wait(attempts, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than p95: race a duplicate on the next healthy model (or the same one)
+                    hedge_delay = None
+                    hedge_model = next_model() or model
+                    stats["hedged"] += 1
+                    logger.info(f"🏁 Hedging slow Gemini {operation} call on {hedge_model}")
+                    hedge_task = launch(hedge_model)
+                    continue
+
+                for task in done:
+                    attempt_model = attempts.pop(task)
+                    running.remove(attempt_model)
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            stats["hedge_wins"] += 1
+                        return task.result()
+                    last_error = task.exception()
+
+                if attempts:
+                    continue
+                # Quota exhaustion is shared by every model on the key; do not cascade
+                if isinstance(last_error, RateLimitExceeded):
+                    raise last_error
+                model = next_model()
+                if model is None:
+                    raise last_error
+                stats["fallbacks"] += 1
+                logger.warning(f"↪️ Gemini {operation} falling back to {model} after {type(last_error).__name__}: {last_error}")
+                launch(model)
+        finally:
+            # Cancel the losing (or abandoned) attempts
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    async def _attempt(self, model: str, call: Callable[[str], Awaitable[Any]], api_key: Optional[str],
+                       stats: Dict[str, Any]) -> Any:
+        breaker = self.breakers[model]
+        try:
+            result = await self._run_limited(lambda: call(model), api_key, stats)
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except RateLimitExceeded:
+            breaker.record_cancelled()
+            raise
+        except Exception as e:
+            if counts_against_breaker(e):
+                breaker.record_failure()
+            else:
+                breaker.record_cancelled()
+            raise
+        breaker.record_success()
+        return result
+
+    async def _run_limited(self, call: Callable[[], Awaitable[Any]], api_key: Optional[str],
+                           stats: Dict[str, Any]) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        queued_at = time.monotonic()
+        async with self._semaphore:
+            await get_rate_scheduler().acquire("gemini", api_key)
+            stats["queue_waits"].append(time.monotonic() - queued_at)
+
+            self.in_flight += 1
+            started = time.monotonic()
+            try:
+                result = await call()
+            finally:
+                self.in_flight -= 1
+            stats["latencies"].append(time.monotonic() - started)
+            stats["succeeded"] += 1
+            return result
+
+    def record_usage(self, operation: str, usage_metadata: Any):
+        """Add a response's token counts (usage_metadata) to the operation totals"""
+        if usage_metadata is None:
+            return
+        stats = self._operation_stats(operation)
+        stats["prompt_tokens"] += getattr(usage_metadata, "prompt_token_count", 0) or 0
+        stats["output_tokens"] += getattr(usage_metadata, "candidates_token_count", 0) or 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Gateway state and per-operation latency/error metrics for monitoring"""
+        operations = {}
+        for operation, stats in self.operations.items():
+            latencies = list(stats["latencies"])
+            queue_waits = list(stats["queue_waits"])
+            operations[operation] = {
+                **{key: value for key, value in stats.items() if key not in ("latencies", "queue_waits")},
+                "latency_ms": {
+                    "p50": round(_percentile(latencies, 0.5) * 1000) if latencies else None,
+                    "p95": round(_percentile(latencies, 0.95) * 1000) if latencies else None,
+                    "max": round(max(latencies) * 1000) if latencies else None
+                },
+                "queue_wait_ms_p95": round(_percentile(queue_waits, 0.95) * 1000) if queue_waits else None
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.default_timeout,
+            "in_flight": self.in_flight,
+            "hedge_enabled": self.hedge_enabled,
+            "models": {model: breaker.snapshot() for model, breaker in self.breakers.items()},
+            "operations": operations
+        }
+
+
+class CategorizationMetrics:
+    """
+    Split between heuristic (local) and Gemini categorization, used to tune
+    CATEGORIZATION_CONFIDENCE_THRESHOLD against categorization latency.
+    """
+
+    def __init__(self):
+        self.confidence_threshold: Optional[float] = None
+        self.searches = 0
+        self.llm_skipped = 0
+        self.local_resources = 0
+        self.llm_resources = 0
+        self.label_cache_hits = 0
+        self.label_cache_misses = 0
+        self.tokens_saved = 0
+        self.last_search: Optional[Dict[str, Any]] = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, threshold: float, local_count: int, llm_count: int, seconds: float,
+               label_hits: int = 0, tokens_saved: int = 0):
+        """
+        Record one search. llm_count is the number of ambiguous results; label_hits of
+        them were answered from cached Gemini labels and the rest were sent to Gemini.
+        """
+        self.confidence_threshold = threshold
+        self.searches += 1
+        self.local_resources += local_count
+        self.llm_resources += llm_count
+        self.label_cache_hits += label_hits
+        self.label_cache_misses += llm_count - label_hits
+        self.tokens_saved += tokens_saved
+        if llm_count == label_hits:
+            self.llm_skipped += 1
+        self.latencies.append(seconds)
+        self.last_search = {
+            "label_hit_ratio": round(label_hits / llm_count, 3) if llm_count else None,
+            "tokens_saved": tokens_saved
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-tier counts and categorization latency for monitoring"""
+        total = self.local_resources + self.llm_resources
+        labels = self.label_cache_hits + self.label_cache_misses
+        latencies = list(self.latencies)
+        return {
+            "confidence_threshold": self.confidence_threshold,
+            "searches": self.searches,
+            "llm_skipped": self.llm_skipped,
+            "local_resources": self.local_resources,
+            "llm_resources": self.llm_resources,
+            "local_ratio": round(self.local_resources / total, 3) if total else None,
+            "label_cache": {
+                "hits": self.label_cache_hits,
+                "misses": self.label_cache_misses,
+                "hit_ratio": round(self.label_cache_hits / labels, 3) if labels else None,
+                "tokens_saved": self.tokens_saved,
+                "last_search": self.last_search
+            },
+            "latency_ms": {
+                "p50": round(_percentile(latencies, 0.5) * 1000) if latencies else None,
+                "p95": round(_percentile(latencies, 0.95) * 1000) if latencies else None
+            }
+        }
+
+
+_categorization_metrics: Optional[CategorizationMetrics] = None
+
+
+def get_categorization_metrics() -> CategorizationMetrics:
+    """Get the process-wide categorization tier metrics"""
+    global _categorization_metrics
+    if _categorization_metrics is None:
+        _categorization_metrics = CategorizationMetrics()
+    return _categorization_metrics
+
+
+# Shared gateway (one concurrency limit per worker process, shared by every client instance)
+_llm_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Get the process-wide LLM gateway"""
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway()
+    return _llm_gateway
+
+
 class VertexAIClient:
     """
     Vertex AI Client for learning path generation using Gemini AI.
@@ -66,6 +576,12 @@ class VertexAIClient:
             # Default scores
             "unknown": 0.50, "default": 0.60
         }
+        # Suffix trie over the scores above plus the optional memory-mapped reputation file
+        self.credibility_index = DomainCredibilityIndex(
+            self.source_credibility_scores,
+            default_score=self.source_credibility_scores["default"],
+            reputation_path=os.getenv("DOMAIN_REPUTATION_PATH")
+        )
         
         # Content Type Priority Weights
         self.content_type_weights = {
@@ -81,6 +597,8 @@ class VertexAIClient:
             "forum": 0.50,      # Forum discussions
             "unknown": 0.40     # Unknown content types
         }
+        # Columnar scoring, ranking and diversity quotas over candidate batches
+        self.ranking_engine = RankingEngine(self.content_type_weights)
         
         # Learning Style Preferences
         self.learning_style_mappings = {
@@ -119,10 +637,112 @@ class VertexAIClient:
         # Initialize usage tracking and caching
         self.usage_tracking = []
         self.content_cache = {}
+        # Every model call goes through the shared async gateway
+        self.llm_gateway = get_llm_gateway()
+        # Fallback models from GEMINI_MODEL_CASCADE, created on first use
+        self.cascade_models: Dict[str, genai.GenerativeModel] = {}
+        # Compact, token-budgeted prompt serialization
+        self.prompt_builder = get_prompt_builder()
+        # Identical (model, prompt, config) calls are answered from the response cache
+        self.response_cache = get_llm_response_cache()
+        # Per-URL features and Gemini labels shared across queries
+        self.feature_store = get_resource_feature_store()
+        # Relevance exclusions in those labels are scoped to the canonical query
+        self.query_normalizer = QueryNormalizer()
+        # Results classified at least this confidently by heuristics skip Gemini categorization
+        self.categorization_threshold = float(os.getenv("CATEGORIZATION_CONFIDENCE_THRESHOLD", "0.85"))
+        self.categorization_metrics = get_categorization_metrics()
+
+    async def _generate(self, prompt: str, generation_config: genai.GenerationConfig, operation: str,
+                        timeout: float = None, validate: Callable[[str], bool] = is_complete_json) -> str:
+        """
+        Run one Gemini call through the LLM gateway and return the response text.
+        Only responses accepted by validate (by default: a complete JSON document) are cached,
+        so a malformed or truncated answer is not replayed to every retry of the prompt.
+        """
+        cache_key = self.response_cache.cache_key(self.model_id, prompt, generation_config)
+        cached_text = await self.response_cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text
+        
+        async def call(model_id: str):
+            response = await self._model_for(model_id).generate_content_async(prompt, generation_config=generation_config)
+            return model_id, response
+        
+        served_model, response = await self.llm_gateway.run(operation, call, api_key=self.api_key, timeout=timeout)
+        self.llm_gateway.record_usage(operation, getattr(response, "usage_metadata", None))
+        # Responses from a fallback model are cached under that model, not the primary one
+        if served_model != self.model_id:
+            cache_key = self.response_cache.cache_key(served_model, prompt, generation_config)
+        if validate(response.text):
+            await self.response_cache.set(cache_key, response.text, served_model, operation)
+        return response.text
+
+    def _model_for(self, model_id: str) -> genai.GenerativeModel:
+        """GenerativeModel for a model in the gateway cascade"""
+        if model_id == self.model_id:
+            return self.model
+        if model_id not in self.cascade_models:
+            self.cascade_models[model_id] = genai.GenerativeModel(model_id)
+        return self.cascade_models[model_id]
+
+    async def _generate_stream(self, prompt: str, generation_config: genai.GenerationConfig, operation: str,
+                               on_text: Callable[[str], Awaitable[None]], timeout: float = None,
+                               validate: Callable[[str], bool] = is_complete_json) -> str:
+        """
+        Streaming variant of _generate: on_text receives each text chunk as it arrives.
+        A cached response is delivered as a single chunk. Returns the full response text.
+        """
+        cache_key = self.response_cache.cache_key(self.model_id, prompt, generation_config)
+        cached_text = await self.response_cache.get(cache_key)
+        if cached_text is not None:
+            await on_text(cached_text)
+            return cached_text
+
+        parts = []
+
+        async def stream_call(model_id: str):
+            response = await self._model_for(model_id).generate_content_async(
+                prompt, generation_config=generation_config, stream=True
+            )
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. the final finish_reason chunk)
+                    continue
+                parts.append(text)
+                await on_text(text)
+            return "".join(parts), getattr(response, "usage_metadata", None)
+
+        # The gateway deadline covers the whole stream, not just the first chunk.
+        # Chunks cannot be taken back, so streams are neither hedged nor cascaded mid-way.
+        try:
+            response_text, usage_metadata = await self.llm_gateway.run(
+                operation, stream_call, api_key=self.api_key, timeout=timeout, hedge=False, cascade=False
+            )
+        except (asyncio.CancelledError, RateLimitExceeded):
+            raise
+        except Exception as e:
+            if parts:
+                raise
+            # Nothing delivered yet: the non-streaming path can still hedge and use the cascade
+            logger.warning(f"⚠️ Streaming {operation} failed before the first chunk ({e}), retrying without streaming")
+            response_text = await self._generate(prompt, generation_config, operation, timeout, validate)
+            await on_text(response_text)
+            return response_text
+        self.llm_gateway.record_usage(operation, usage_metadata)
+        if validate(response_text):
+            await self.response_cache.set(cache_key, response_text, self.model_id, operation)
+        return response_text
 
     async def categorize_resources(self, search_results: List[Dict], query: str) -> Dict[str, List[Dict]]:
         """
-        Use Gemini to categorize Google Custom Search results by type and create course structure.
+        Categorize Google Custom Search results by type in three tiers: results the heuristics
+        classify with confidence >= CATEGORIZATION_CONFIDENCE_THRESHOLD are accepted locally,
+        ambiguous results with a fresh per-URL Gemini label reuse its query-independent
+        fields (or its exclusion, when it was filtered out for this same query), and only
+        the remainder is sent to Gemini.
         
         Args:
             search_results: List of search results from Google Custom Search API
@@ -131,6 +751,72 @@ class VertexAIClient:
         Returns:
             Dict with categorized resources by type
         """
+        started = time.monotonic()
+        # One lookup for every result's stored features and labels
+        await self.feature_store.prefetch(self.feature_store.key_for(result) for result in search_results)
+        
+        # Tier 1: accept confidently classified results locally
+        local_categorized = {category: [] for category in RESOURCE_CATEGORIES}
+        ambiguous_results = []
+        for result in search_results:
+            resource = self._standardize_resource(result)
+            category, confidence = self._heuristic_category(result, resource)
+            if confidence >= self.categorization_threshold:
+                local_categorized[category].append(resource)
+            else:
+                ambiguous_results.append(result)
+        
+        # Tier 2: reuse Gemini's earlier labels for ambiguous URLs it has already seen
+        cached_categorized = {category: [] for category in RESOURCE_CATEGORIES}
+        cached_results, uncached_results = [], []
+        answer_tokens = 0
+        canonical_query = self.query_normalizer.canonicalize(query)
+        for result in ambiguous_results:
+            label = self.feature_store.llm_label(self.feature_store.key_for(result), canonical_query)
+            if label is None:
+                uncached_results.append(result)
+                continue
+            cached_results.append(result)
+            if label.get("category"):  # None: Gemini filtered it out for this query
+                resource = {**self._standardize_resource(result), **label["resource"]}
+                cached_categorized.setdefault(label["category"], []).append(resource)
+                answer_tokens += estimate_tokens(json.dumps(resource, default=str))
+        
+        # Prompt rows and answers not generated for cached results
+        tokens_saved = 0
+        if cached_results:
+            table, _ = self.prompt_builder.resource_table(cached_results, CATEGORIZE_COLUMNS)
+            tokens_saved = estimate_tokens(table) + answer_tokens
+        
+        local_count = len(search_results) - len(ambiguous_results)
+        label_hit_ratio = f"{len(cached_results) / len(ambiguous_results):.0%}" if ambiguous_results else "n/a"
+        logger.info(f"🏷️ Categorized {local_count}/{len(search_results)} results locally, "
+                    f"{len(cached_results)} from cached labels (hit ratio {label_hit_ratio}, ~{tokens_saved} tokens saved), "
+                    f"{len(uncached_results)} go to Gemini")
+        
+        # Tier 3: Gemini categorizes (and filters) only the uncached remainder
+        categorized = self._merge_categorized(local_categorized, cached_categorized)
+        if uncached_results:
+            llm_categorized = await self._categorize_with_llm(uncached_results, query)
+            categorized = self._merge_categorized(categorized, llm_categorized)
+        
+        self.categorization_metrics.record(
+            self.categorization_threshold, local_count, len(ambiguous_results), time.monotonic() - started,
+            label_hits=len(cached_results), tokens_saved=tokens_saved
+        )
+        self.feature_store.schedule_flush()
+        return categorized
+
+    def _merge_categorized(self, local_categorized: Dict[str, List[Dict]], llm_categorized: Dict) -> Dict:
+        """Add locally categorized resources ahead of Gemini's for each category"""
+        merged = dict(llm_categorized)
+        for category, resources in local_categorized.items():
+            llm_resources = merged.get(category)
+            merged[category] = resources + (llm_resources if isinstance(llm_resources, list) else [])
+        return merged
+
+    async def _categorize_with_llm(self, search_results: List[Dict], query: str) -> Dict[str, List[Dict]]:
+        """Gemini categorization and educational filtering of search results"""
         try:
             # Create prompt for Gemini to categorize search results
             categorization_prompt = f"""
@@ -141,8 +827,8 @@ class VertexAIClient:
             - EXCLUDE: Oracle/vendor download pages, installation guides, pricing pages, product comparisons
             - INCLUDE ONLY: Tutorials, educational courses, learning guides, documentation, academic content, how-to guides, training materials
 
-            Search Results:
-            {json.dumps(search_results, indent=2)}
+            Search Results (one resource per row, "|"-separated):
+            {RESOURCES_PLACEHOLDER}
 
             **STRICT EDUCATIONAL FILTERING:**
             1. First, filter out NON-EDUCATIONAL content:
@@ -167,10 +853,19 @@ class VertexAIClient:
             - quality_score: 0.0 to 1.0 based on educational value and source credibility
             - learning_objective: What the learner will gain from this resource
 
+            When a resource has a page_meta value (type;difficulty;minutes extracted from the page itself),
+            use it instead of guessing from the snippet.
+
             **IMPORTANT:** If a resource is not clearly educational in nature, DO NOT include it. Only return resources that help someone learn the topic.
 
             Return only valid JSON format with filtered educational content.
             """
+            categorization_prompt, kept = self.prompt_builder.build(
+                "categorize",
+                categorization_prompt,
+                search_results,
+                CATEGORIZE_COLUMNS
+            )
 
             # Use optimized generation config for faster categorization
             generation_config = genai.GenerationConfig(
@@ -180,118 +875,167 @@ class VertexAIClient:
                 top_k=20
             )
             
-            response = self.model.generate_content(categorization_prompt, generation_config=generation_config)
+            response_text = await self._generate(
+                categorization_prompt, generation_config, "categorize", validate=_is_json_object
+            )
             
-            try:
-                categorized = json.loads(response.text)
+            categorized, complete = decode_json_response(response_text)
+            if isinstance(categorized, dict):
                 logger.info(f"Successfully categorized {len(search_results)} search results")
+                self._record_llm_labels([search_results[index] for index in kept], categorized, complete, query)
                 return categorized
-            except json.JSONDecodeError:
-                logger.warning("Failed to parse Gemini categorization response as JSON")
-                # Fallback: basic categorization
-                return self._basic_categorization(search_results)
+            
+            logger.warning("Failed to parse Gemini categorization response as JSON")
+            # Fallback: basic categorization
+            return self._basic_categorization(search_results)
                 
         except Exception as e:
             logger.error(f"Error categorizing search results: {e}")
             return self._basic_categorization(search_results)
 
+    def _record_llm_labels(self, sent_results: List[Dict], categorized: Dict, complete: bool, query: str):
+        """
+        Store Gemini's category and query-independent estimates for each returned resource under
+        its canonical URL. Sent results missing from the answer were filtered out for this query
+        and are stored as excluded for its canonical form only, and only when the answer was
+        complete (a response cut off by max_output_tokens and recovered by the parser simply
+        never reached them) and every returned resource matched a sent URL (otherwise links
+        were rewritten).
+        """
+        canonical_query = self.query_normalizer.canonicalize(query)
+        sent_keys = {self.feature_store.key_for(result) for result in sent_results}
+        returned_keys = set()
+        for category, resources in categorized.items():
+            if not isinstance(resources, list):
+                continue
+            for resource in resources:
+                if isinstance(resource, dict) and (resource.get("link") or resource.get("url")):
+                    key = self.feature_store.key_for(resource)
+                    self.feature_store.put_llm_label(key, category, resource, canonical_query)
+                    returned_keys.add(key)
+        
+        if complete and returned_keys <= sent_keys:
+            for key in sent_keys - returned_keys:
+                self.feature_store.exclude_llm_label(key, canonical_query)
+
     def _basic_categorization(self, search_results: List[Dict]) -> Dict[str, List[Dict]]:
         """
         Fallback method for basic categorization when Gemini fails.
         Enhanced for Google Custom Search API results.
         """
-        categorized = {
-            "videos": [],
-            "articles": [],
-            "courses": [],
-            "documentation": [],
-            "interactive": [],
-            "academic": []
-        }
+        categorized = {category: [] for category in RESOURCE_CATEGORIES}
         
         for result in search_results:
-            # Handle both Google Custom Search format and our internal format
-            link = result.get('link', result.get('url', '')).lower()
-            title = result.get('title', '').lower()
-            display_link = result.get('displayLink', '')
-            snippet = result.get('snippet', result.get('description', ''))
-            
-            # Create standardized resource format
-            standardized_resource = {
-                "title": result.get('title', 'Untitled Resource'),
-                "link": result.get('link', result.get('url', '')),
-                "url": result.get('link', result.get('url', '')),  # Ensure both link and url are set
-                "snippet": snippet,
-                "description": snippet,
-                "displayLink": display_link,
-                "source": display_link,
-                "resource_type": self._determine_resource_type(link, title, snippet),
-                "difficulty": self._estimate_difficulty(title, snippet),
-                "estimated_time_minutes": self._estimate_time(link, title, snippet),
-                "quality_score": self._get_source_credibility(link)
-            }
-            
-            # Categorize based on determined type
-            resource_type = standardized_resource["resource_type"]
-            
-            if resource_type == "video" or 'youtube.com' in link or 'video' in title:
-                categorized["videos"].append(standardized_resource)
-            elif resource_type == "course" or any(domain in link for domain in ['coursera.org', 'edx.org', 'udacity.com', 'khanacademy.org']) or 'course' in title:
-                categorized["courses"].append(standardized_resource)
-            elif resource_type == "documentation" or 'docs.' in link or 'documentation' in title:
-                categorized["documentation"].append(standardized_resource)
-            elif resource_type == "interactive" or any(term in title for term in ['tutorial', 'hands-on', 'practice', 'exercise']):
-                categorized["interactive"].append(standardized_resource)
-            elif resource_type == "academic" or any(domain in link for domain in ['arxiv.org', 'ieee.org', 'acm.org', 'scholar.google.com']):
-                categorized["academic"].append(standardized_resource)
-            else:
-                categorized["articles"].append(standardized_resource)
+            resource = self._standardize_resource(result)
+            category, _ = self._heuristic_category(result, resource)
+            categorized[category].append(resource)
         
         return categorized
 
-    def _determine_resource_type(self, url: str, title: str, description: str) -> str:
-        """Determine resource type based on URL, title, and description"""
-        url_lower = url.lower()
-        title_lower = title.lower()
-        desc_lower = description.lower()
+    def _standardize_resource(self, result: Dict) -> Dict:
+        """Resource in the categorized format, with heuristic type/difficulty/time/quality"""
+        # Handle both Google Custom Search format and our internal format
+        link = result.get('link', result.get('url', ''))
+        title = result.get('title', 'Untitled Resource')
+        display_link = result.get('displayLink', '')
+        snippet = result.get('snippet', result.get('description', ''))
+        # Metadata extracted from the page itself beats keyword guesses
+        page_metadata = result.get('page_metadata', {})
+        features = self._resource_features(result, link, title, snippet)
         
-        # Video detection
-        if any(domain in url_lower for domain in ['youtube.com', 'vimeo.com', 'ted.com']) or 'video' in title_lower:
-            return "video"
+        return {
+            "title": title,
+            "link": link,
+            "url": link,  # Ensure both link and url are set
+            "snippet": snippet,
+            "description": snippet,
+            "displayLink": display_link,
+            "source": display_link,
+            "resource_type": page_metadata.get('resource_type') or features["resource_type"],
+            "difficulty": page_metadata.get('difficulty') or features["difficulty"],
+            "estimated_time_minutes": (
+                page_metadata.get('duration_minutes')
+                or page_metadata.get('reading_time_minutes')
+                or features["estimated_time_minutes"]
+            ),
+            "quality_score": features["credibility"]
+        }
+
+    def _resource_features(self, result: Dict, link: str, title: str, snippet: str) -> Dict[str, Any]:
+        """Heuristic features of a result's URL, from the feature store when already derived"""
+        key = self.feature_store.key_for(result)
+        features = self.feature_store.features(key)
+        if features is None:
+            # One keyword scan for type and difficulty (memoized, reused by _heuristic_category)
+            signals = analyze_resource(link, title, snippet)
+            resource_type = signals["resource_type"]
+            features = {
+                "resource_type": resource_type,
+                "difficulty": signals["difficulty"],
+                "estimated_time_minutes": self._estimate_time(resource_type),
+                "learning_styles": self._determine_learning_styles_enhanced(resource_type),
+                "credibility": self._get_source_credibility(link)
+            }
+            self.feature_store.put_features(key, features)
+        return features
+
+    def _heuristic_category(self, result: Dict, resource: Dict):
+        """
+        Category for a standardized resource and how confident the heuristics are in it.
         
-        # Course detection
-        if any(domain in url_lower for domain in ['coursera.org', 'edx.org', 'udacity.com', 'khanacademy.org']) or 'course' in title_lower:
-            return "course"
+        Returns:
+            (category, confidence in [0, 1])
+        """
+        link = resource["link"].lower()
+        keywords = analyze_resource(resource["link"], resource["title"], resource["snippet"])["keywords"]
+        link_keywords, title_keywords = keywords["url"], keywords["title"]
+        resource_type = resource["resource_type"]
+        
+        # Categorize based on determined type
+        if resource_type == "video" or "youtube.com" in link_keywords or "video" in title_keywords:
+            category = "videos"
+        elif resource_type == "course" or not link_keywords.isdisjoint(COURSE_DOMAINS) or "course" in title_keywords:
+            category = "courses"
+        elif resource_type == "documentation" or "docs." in link_keywords or "documentation" in title_keywords:
+            category = "documentation"
+        elif resource_type == "interactive" or not title_keywords.isdisjoint(CATEGORY_INTERACTIVE_TERMS):
+            category = "interactive"
+        elif resource_type == "academic" or not link_keywords.isdisjoint(CATEGORY_ACADEMIC_DOMAINS):
+            category = "academic"
+        else:
+            category = "articles"
         
-        # Documentation detection
-        if 'docs.' in url_lower or any(term in title_lower for term in ['documentation', 'api reference', 'guide']):
-            return "documentation"
+        # Possibly non-educational results need Gemini's filtering
+        if not (title_keywords | link_keywords).isdisjoint(NON_EDUCATIONAL_TERMS):
+            return category, 0.0
         
-        # Interactive detection
-        if any(term in title_lower for term in ['tutorial', 'hands-on', 'practice', 'exercise', 'lab']):
-            return "interactive"
+        page_type = (result.get('page_metadata') or {}).get('resource_type')
+        if page_type and CATEGORY_RESOURCE_TYPES.get(category) == page_type:
+            return category, CONFIDENCE_PAGE_METADATA
         
-        # Academic detection
-        if any(domain in url_lower for domain in ['arxiv.org', 'ieee.org', 'acm.org', 'researchgate.net']):
-            return "academic"
+        host = self._extract_domain(link)
+        if host.startswith("docs.") and category == "documentation":
+            return category, CONFIDENCE_DOMAIN
+        labels = host.split(".")
+        for start in range(len(labels) - 1):
+            domain_category = DOMAIN_CATEGORIES.get(".".join(labels[start:]))
+            if domain_category is not None:
+                return category, CONFIDENCE_DOMAIN if domain_category == category else CONFIDENCE_DEFAULT
         
-        return "article"
+        if category == "articles":
+            return category, CONFIDENCE_DEFAULT
+        return category, CONFIDENCE_KEYWORD
+
+    def _determine_resource_type(self, url: str, title: str, description: str) -> str:
+        """Determine resource type based on URL, title, and description"""
+        return analyze_resource(url, title, description)["resource_type"]
 
     def _estimate_difficulty(self, title: str, description: str) -> str:
         """Estimate difficulty based on title and description"""
-        text = (title + " " + description).lower()
-        
-        if any(term in text for term in ['beginner', 'introduction', 'basics', 'getting started', 'fundamentals']):
-            return "beginner"
-        elif any(term in text for term in ['advanced', 'expert', 'deep dive', 'mastery', 'professional']):
-            return "advanced"
-        else:
-            return "intermediate"
+        return analyze_resource("", title, description)["difficulty"]
 
-    def _estimate_time(self, url: str, title: str, description: str) -> int:
-        """Estimate time to complete based on resource type and content"""
-        resource_type = self._determine_resource_type(url, title, description)
-        
+    def _estimate_time(self, resource_type: str) -> int:
+        """Estimate time to complete based on the detected resource type"""
         time_mapping = {
             "video": 20,       # Average video length
             "course": 120,     # Full course estimate
@@ -305,21 +1049,15 @@ class VertexAIClient:
 
     def _get_source_credibility(self, url: str) -> float:
         """
-        Get credibility score for a URL based on domain.
+        Get credibility score for a URL from the compiled domain credibility index.
         """
         try:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower()
-            
-            for source, score in self.source_credibility_scores.items():
-                if source in domain:
-                    return score
-            
-            return self.source_credibility_scores["default"]
-        except:
+            return self.credibility_index.score(url)
+        except Exception:
             return 0.5
 
-    async def generate_course_from_search_results(self, query: str, categorized_resources: Dict, preferences: Dict = None) -> Dict:
+    async def generate_course_from_search_results(self, query: str, categorized_resources: Dict, preferences: Dict = None,
+                                                  on_module: Callable[[Dict], Awaitable[None]] = None) -> Dict:
         """
         Use Gemini to create intelligent course structure from Google search results.
         
@@ -327,6 +1065,8 @@ class VertexAIClient:
             query: The original search query
             categorized_resources: Categorized search results
             preferences: User preferences for course structure
+            on_module: Optional callback; the response is then streamed and each module
+                       is passed to it as soon as Gemini has finished generating it
             
         Returns:
             Complete course structure with modules and resources
@@ -338,8 +1078,8 @@ class VertexAIClient:
             course_prompt = f"""
             You are an expert curriculum designer. Create a comprehensive learning path for "{query}" using these categorized resources from Google search results.
 
-            Available Resources:
-            {json.dumps(categorized_resources, indent=2)}
+            Available Resources (one resource per row, "|"-separated):
+            {RESOURCES_PLACEHOLDER}
 
             User Preferences:
             - Learning Style: {preferences.get('learning_style', 'balanced')}
@@ -381,6 +1121,18 @@ class VertexAIClient:
 
             Ensure the course follows a logical learning progression and uses the actual search results provided.
             """
+            resource_rows = [
+                {**resource, "category": category}
+                for category, resources in categorized_resources.items() if isinstance(resources, list)
+                for resource in resources if isinstance(resource, dict)
+            ]
+            course_prompt, _ = self.prompt_builder.build(
+                "course_generation",
+                course_prompt,
+                resource_rows,
+                ["category", "title", "link", "type", "difficulty", "minutes", "snippet"],
+                baseline_payload=categorized_resources
+            )
 
             # Use optimized generation config for faster response
             generation_config = genai.GenerationConfig(
@@ -390,30 +1142,170 @@ class VertexAIClient:
                 top_k=20   # Lower top_k for faster generation
             )
             
-            response = self.model.generate_content(course_prompt, generation_config=generation_config)
-            
-            try:
-                course_structure = json.loads(response.text)
-                
-                # Add metadata
-                course_structure.update({
-                    "query": query,
-                    "created_at": datetime.utcnow().isoformat(),
-                    "search_based": True,
-                    "total_resources": sum(len(resources) for resources in categorized_resources.values())
-                })
+            if on_module is None:
+                response_text = await self._generate(
+                    course_prompt, generation_config, "course_generation", validate=_is_course
+                )
+            else:
+                module_parser = JSONArrayStreamParser("modules")
                 
-                logger.info(f"Successfully generated course structure for '{query}'")
-                return course_structure
+                async def publish_modules(chunk: str):
+                    for module in module_parser.feed(chunk):
+                        if isinstance(module, dict):
+                            await on_module(module)
                 
-            except json.JSONDecodeError:
-                logger.warning("Failed to parse Gemini course generation response as JSON")
+                response_text = await self._generate_stream(
+                    course_prompt, generation_config, "course_generation", publish_modules, validate=_is_course
+                )
+            
+            course_structure = parse_json_response(response_text)
+            if not _has_modules(course_structure):
+                logger.warning("Gemini course generation response has no modules (unparseable or truncated)")
                 return self._create_fallback_course(query, categorized_resources)
+            
+            # Add metadata
+            course_structure.update({
+                "query": query,
+                "created_at": datetime.utcnow().isoformat(),
+                "search_based": True,
+                "generation_mode": GENERATION_MODE_TWO_CALL,
+                "total_resources": sum(len(resources) for resources in categorized_resources.values())
+            })
+            
+            logger.info(f"Successfully generated course structure for '{query}'")
+            return course_structure
                 
         except Exception as e:
             logger.error(f"Error generating course from search results: {e}")
             return self._create_fallback_course(query, categorized_resources)
 
+    async def generate_course_one_shot(self, query: str, search_results: List[Dict], preferences: Dict = None):
+        """
+        Categorize, filter and structure a course in a single schema-constrained Gemini call.
+        
+        Args:
+            query: The original search query
+            search_results: Search results (deduplicated, optionally with page_metadata)
+            preferences: User preferences for course structure
+            
+        Returns:
+            Tuple of (course structure, categorized resources) in the same shapes as the two-call path
+        """
+        preferences = preferences or {}
+        try:
+            course_prompt = f"""
+            You are an expert educational content curator and curriculum designer. Build a learning path for "{query}" from these search results.
+
+            Search Results (one resource per row, "|"-separated; refer to resources by id):
+            {RESOURCES_PLACEHOLDER}
+
+            User Preferences:
+            - Learning Style: {preferences.get('learning_style', 'balanced')}
+            - Difficulty Level: {preferences.get('difficulty', 'intermediate')}
+            - Time Preference: {preferences.get('time_preference', 'flexible')}
+
+            1. Keep ONLY educational resources (tutorials, courses, guides, documentation, academic content, exercises).
+               Drop news, entertainment, product download/installation, vendor sales, pricing and review pages.
+            2. In "resources", list every kept resource by its id with its category, difficulty,
+               estimated_time_minutes, quality_score (0.0-1.0) and learning_objective.
+               Prefer page_meta values (type;difficulty;minutes extracted from the page) over guesses.
+            3. In "modules", create 3-5 modules in a logical learning progression, each referencing
+               2-4 kept resources through resource_ids.
+            """
+            # Resources dropped to fit the token budget can never be referenced by id
+            course_prompt, _ = self.prompt_builder.build(
+                "course_one_shot",
+                course_prompt,
+                search_results,
+                ["title", "link", "snippet", "source", "page_meta"]
+            )
+            
+            generation_config = genai.GenerationConfig(
+                temperature=0.2,
+                max_output_tokens=4096,
+                top_p=0.8,
+                top_k=20,
+                response_mime_type="application/json",
+                response_schema=ONE_SHOT_COURSE_SCHEMA
+            )
+            
+            response_text = await self._generate(
+                course_prompt, generation_config, "course_one_shot", validate=_is_json_object
+            )
+            generated = parse_json_response(response_text)
+            if not isinstance(generated, dict):
+                raise ValueError("One-shot response is not a JSON object")
+            
+            course_structure, categorized = self._assemble_one_shot_course(generated, search_results)
+            course_structure.update({
+                "query": query,
+                "created_at": datetime.utcnow().isoformat(),
+                "search_based": True,
+                "generation_mode": GENERATION_MODE_ONE_SHOT,
+                "total_resources": sum(len(resources) for resources in categorized.values())
+            })
+            
+            logger.info(f"Generated course for '{query}' in one call ({len(course_structure['modules'])} modules)")
+            return course_structure, categorized
+            
+        except Exception as e:
+            logger.error(f"Error in one-shot course generation: {e}")
+            categorized = self._basic_categorization(search_results)
+            return self._create_fallback_course(query, categorized), categorized
+
+    def _assemble_one_shot_course(self, generated: Dict, search_results: List[Dict]):
+        """Hydrate id references from a one-shot response into full resources"""
+        categorized = {category: [] for category in RESOURCE_CATEGORIES}
+        resources_by_id = {}
+        
+        for labeled in generated.get("resources", []):
+            resource_id = labeled.get("id")
+            category = labeled.get("category")
+            if not isinstance(resource_id, int) or not 0 <= resource_id < len(search_results) or category not in categorized:
+                continue
+            result = search_results[resource_id]
+            link = result.get('link', result.get('url', ''))
+            resource = {
+                "title": result.get('title', 'Untitled Resource'),
+                "link": link,
+                "url": link,
+                "snippet": result.get('snippet', result.get('description', '')),
+                "displayLink": result.get('displayLink', ''),
+                "type": CATEGORY_RESOURCE_TYPES[category],
+                "difficulty": labeled.get("difficulty", "intermediate"),
+                "estimated_time_minutes": labeled.get("estimated_time_minutes", 15),
+                "quality_score": labeled.get("quality_score", self._get_source_credibility(link)),
+                "learning_objective": labeled.get("learning_objective", "")
+            }
+            categorized[category].append(resource)
+            resources_by_id[resource_id] = resource
+        
+        modules = []
+        for module in generated.get("modules", []):
+            module_resources = [resources_by_id[i] for i in module.get("resource_ids", []) if i in resources_by_id]
+            if not module_resources:
+                continue
+            modules.append({
+                "id": f"module_{len(modules) + 1}",
+                "title": module.get("title", f"Module {len(modules) + 1}"),
+                "description": module.get("description", ""),
+                "estimated_hours": module.get("estimated_hours", 1.0),
+                "learning_objectives": module.get("learning_objectives", []),
+                "resources": module_resources
+            })
+        
+        if not modules:
+            raise ValueError("One-shot response referenced no usable resources")
+        
+        course_structure = {
+            "title": generated.get("title", ""),
+            "description": generated.get("description", ""),
+            "estimated_hours": generated.get("estimated_hours", sum(m["estimated_hours"] for m in modules)),
+            "difficulty": generated.get("difficulty", "intermediate"),
+            "modules": modules
+        }
+        return course_structure, categorized
+
     def _create_fallback_course(self, query: str, categorized_resources: Dict) -> Dict:
         """
         Create a basic course structure when Gemini fails.
@@ -509,12 +1401,15 @@ class VertexAIClient:
         # Check content type preferences
         if "formats" in preferences and preferences["formats"]:
             item_type = item.get("resource_type", "unknown")
-            if item_type not in preferences["formats"]:
+            formats = preferences["formats"]
+            if item_type not in ([formats] if isinstance(formats, str) else formats):
                 return False
         
         # Check learning style preferences
         if "learning_style" in preferences:
             preferred_styles = preferences["learning_style"]
+            if isinstance(preferred_styles, str):
+                preferred_styles = [preferred_styles]
             item_styles = item.get("learning_styles", [])
             
             # Check if there's any overlap
@@ -532,30 +1427,19 @@ class VertexAIClient:
 
     def _apply_credibility_scoring(self, content_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Apply credibility scoring based on source reputation"""
-        for item in content_items:
-            source = item.get("source", "unknown").lower()
-            
-            # Check for exact matches first
-            credibility_score = self.source_credibility_scores.get(source)
-            
-            if credibility_score is None:
-                # Check for partial matches
-                for pattern, score in self.source_credibility_scores.items():
-                    if pattern in source or source in pattern:
-                        credibility_score = score
-                        break
-                
-                # Default score if no match
-                if credibility_score is None:
-                    credibility_score = self.source_credibility_scores["default"]
-            
-            # Apply credibility score to overall quality
-            original_quality = item.get("quality_score", 0.5)
-            adjusted_quality = (original_quality * 0.7) + (credibility_score * 0.3)
-            item["quality_score"] = min(1.0, adjusted_quality)
-            item["credibility_score"] = credibility_score
+        return self.ranking_engine.apply_credibility(
+            content_items, [self._item_credibility(item) for item in content_items]
+        )
+
+    def _item_credibility(self, item: Dict[str, Any]) -> float:
+        """Source credibility for a content item"""
+        source = item.get("source", "unknown").lower()
+        url = item.get("url") or item.get("link") or source
         
-        return content_items
+        if source == "unknown" and url == source:
+            return self.source_credibility_scores["unknown"]
+        # Most specific domain/path rule, then the reputation file, then default
+        return self.credibility_index.score(url)
 
     def _apply_preference_filtering(self, content_items: List[Dict[str, Any]], preferences: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Apply user preference filtering to cached content"""
@@ -571,130 +1455,15 @@ class VertexAIClient:
 
     def _ensure_content_diversity(self, content_items: List[Dict[str, Any]], preferences: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Enhanced diversity algorithm with preference consideration"""
-        if len(content_items) <= 10:
-            return content_items
-        
-        preferences = preferences or {}
-        
-        # Group resources by content type
-        resources_by_type = {}
-        for item in content_items:
-            resource_type = item.get("resource_type", "article")
-            if resource_type not in resources_by_type:
-                resources_by_type[resource_type] = []
-            resources_by_type[resource_type].append(item)
-        
-        # Adjust target percentages based on user preferences
-        base_targets = {
-            "video": 0.3,       # 30% videos
-            "article": 0.25,    # 25% articles
-            "course": 0.2,      # 20% courses
-            "interactive": 0.15,# 15% interactive content
-            "documentation": 0.1 # 10% documentation
-        }
-        
-        # Modify targets based on preferences
-        if "formats" in preferences and preferences["formats"]:
-            preferred_formats = preferences["formats"]
-            adjusted_targets = {}
-            
-            # Boost preferred formats
-            for fmt in preferred_formats:
-                if fmt in base_targets:
-                    adjusted_targets[fmt] = base_targets[fmt] * 1.5
-            
-            # Normalize to ensure total doesn't exceed 1.0
-            total_weight = sum(adjusted_targets.values())
-            if total_weight > 1.0:
-                for fmt in adjusted_targets:
-                    adjusted_targets[fmt] = adjusted_targets[fmt] / total_weight
-            
-            type_targets = adjusted_targets
-        else:
-            type_targets = base_targets
-        
-        max_items = min(self.content_filters["max_content_items"], len(content_items))
-        diverse_items = []
-        
-        # First pass: add items based on adjusted targets
-        for content_type, target_pct in type_targets.items():
-            if content_type in resources_by_type:
-                target_count = max(1, int(max_items * target_pct))
-                items = resources_by_type[content_type]
-                
-                # Sort items by combined score (quality + credibility + type weight)
-                items.sort(key=lambda x: self._calculate_item_score(x), reverse=True)
-                
-                # Add up to target count items
-                to_add = items[:target_count]
-                diverse_items.extend(to_add)
-                
-                # Remove added items from the resource pool
-                resources_by_type[content_type] = items[target_count:]
-        
-        # Second pass: fill remaining slots with highest scoring items
-        remaining_slots = max_items - len(diverse_items)
-        if remaining_slots > 0:
-            remaining_items = []
-            for items in resources_by_type.values():
-                remaining_items.extend(items)
-            
-            # Sort by combined score
-            remaining_items.sort(key=lambda x: self._calculate_item_score(x), reverse=True)
-            diverse_items.extend(remaining_items[:remaining_slots])
-        
-        return diverse_items[:max_items]
+        return self.ranking_engine.diversify(content_items, preferences, self.content_filters["max_content_items"])
 
     def _calculate_item_score(self, item: Dict[str, Any]) -> float:
         """Calculate a comprehensive score for ranking items"""
-        quality_score = item.get("quality_score", 0.5)
-        credibility_score = item.get("credibility_score", 0.5)
-        content_type = item.get("resource_type", "unknown")
-        type_weight = self.content_type_weights.get(content_type, 0.5)
-        
-        # Weighted combination of all factors
-        combined_score = (quality_score * 0.4) + (credibility_score * 0.3) + (type_weight * 0.3)
-        
-        return combined_score
+        return float(self.ranking_engine.base_scores([item])[0])
 
     def _apply_final_ranking(self, content_items: List[Dict[str, Any]], preferences: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Apply final ranking based on all criteria"""
-        preferences = preferences or {}
-        
-        # Calculate final scores for each item
-        for item in content_items:
-            base_score = self._calculate_item_score(item)
-            
-            # Apply preference bonuses
-            preference_bonus = 0.0
-            
-            # Learning style bonus
-            if "learning_style" in preferences:
-                item_styles = item.get("learning_styles", [])
-                preferred_styles = preferences["learning_style"]
-                style_matches = len(set(item_styles) & set(preferred_styles))
-                preference_bonus += (style_matches * 0.1)
-            
-            # Difficulty match bonus
-            if "difficulty" in preferences:
-                if item.get("difficulty") == preferences["difficulty"]:
-                    preference_bonus += 0.15
-            
-            # Time preference bonus
-            if "preferred_time_range" in preferences:
-                item_time = item.get("estimated_time_minutes", 30)
-                time_range = preferences["preferred_time_range"]
-                if time_range == "short" and item_time <= 30:
-                    preference_bonus += 0.1
-                elif time_range == "medium" and 30 < item_time <= 90:
-                    preference_bonus += 0.1
-                elif time_range == "long" and item_time > 90:
-                    preference_bonus += 0.1
-            
-            item["final_score"] = min(1.0, base_score + preference_bonus)
-        
-        # Sort by final score
-        return sorted(content_items, key=lambda x: x.get("final_score", 0), reverse=True)
+        return self.ranking_engine.rank(content_items, preferences)
 
     def _check_cache(self, query: str) -> List[Dict[str, Any]]:
         """Check if we have cached results for the query"""
@@ -800,7 +1569,8 @@ class VertexAIClient:
                     description = self._extract_description(result, doc_data)
                     
                     # Enhanced resource type detection
-                    resource_type = self._determine_resource_type_enhanced(uri, title, description)
+                    signals = analyze_resource(uri, title, description)
+                    resource_type = signals["resource_type_enhanced"]
                     
                     # Create enhanced content item
                     content_item = {
@@ -810,7 +1580,7 @@ class VertexAIClient:
                         "source": self._extract_domain(uri) if uri else "Unknown Source",
                         "resource_type": resource_type,
                         "estimated_time_minutes": self._estimate_content_time_enhanced(resource_type, description),
-                        "difficulty": self._estimate_difficulty_enhanced(title, description),
+                        "difficulty": signals["difficulty_enhanced"],
                         "quality_score": self._calculate_initial_quality_score(result, doc_data),
                         "learning_styles": self._determine_learning_styles_enhanced(resource_type),
                         "metadata": doc_data,
@@ -850,45 +1620,7 @@ class VertexAIClient:
 
     def _determine_resource_type_enhanced(self, url: str, title: str, description: str) -> str:
         """Enhanced resource type detection using multiple signals"""
-        if not url:
-            return "article"
-            
-        url_lower = url.lower()
-        title_lower = title.lower()
-        desc_lower = description.lower()
-        
-        # Video content detection
-        video_indicators = ["youtube.com", "vimeo.com", "video", "watch"]
-        if any(indicator in url_lower for indicator in video_indicators):
-            return "video"
-        
-        # Course detection
-        course_indicators = ["course", "coursera.org/learn", "udemy.com/course", "edx.org/course", "class", "curriculum"]
-        if any(indicator in url_lower for indicator in course_indicators) or \
-           any(indicator in title_lower for indicator in course_indicators):
-            return "course"
-        
-        # Interactive content detection
-        interactive_indicators = ["github.com", "codepen.io", "repl.it", "interactive", "playground", "tutorial"]
-        if any(indicator in url_lower for indicator in interactive_indicators):
-            return "interactive"
-        
-        # Documentation detection
-        doc_indicators = ["docs.", "/docs", "documentation", "reference", "api"]
-        if any(indicator in url_lower for indicator in doc_indicators):
-            return "documentation"
-        
-        # Academic content detection
-        academic_indicators = [".edu", "arxiv.org", "research", "paper", "journal", "academic"]
-        if any(indicator in url_lower for indicator in academic_indicators):
-            return "academic"
-        
-        # Tutorial detection
-        tutorial_indicators = ["tutorial", "how-to", "guide", "step-by-step"]
-        if any(indicator in title_lower or indicator in desc_lower for indicator in tutorial_indicators):
-            return "tutorial"
-        
-        return "article"  # Default fallback
+        return analyze_resource(url, title, description)["resource_type_enhanced"]
 
     def _estimate_content_time_enhanced(self, resource_type: str, description: str) -> int:
         """Enhanced time estimation using multiple factors"""
@@ -928,35 +1660,7 @@ class VertexAIClient:
 
     def _estimate_difficulty_enhanced(self, title: str, description: str) -> str:
         """Enhanced difficulty estimation using multiple signals"""
-        text = f"{title} {description}".lower()
-        
-        # Enhanced keyword lists
-        beginner_indicators = [
-            'beginner', 'introduction', 'intro', 'basic', 'basics', 'start', 'starting',
-            'fundamental', 'fundamentals', '101', 'starter', 'novice', 'first steps',
-            'getting started', 'learn', 'learning', 'simple', 'easy'
-        ]
-        
-        advanced_indicators = [
-            'advanced', 'expert', 'complex', 'deep dive', 'mastering', 'master',
-            'professional', 'comprehensive', 'in-depth', 'optimization', 'architecture',
-            'enterprise', 'production', 'scaling', 'performance'
-        ]
-        
-        # Count occurrences with weights
-        beginner_score = sum(2 if word in title.lower() else 1 for word in beginner_indicators if word in text)
-        advanced_score = sum(2 if word in title.lower() else 1 for word in advanced_indicators if word in text)
-        
-        # Consider intermediate indicators
-        intermediate_indicators = ['intermediate', 'practical', 'application', 'implement']
-        intermediate_score = sum(1 for word in intermediate_indicators if word in text)
-        
-        if advanced_score > beginner_score and advanced_score > intermediate_score:
-            return "advanced"
-        elif beginner_score > 0:
-            return "beginner"
-        else:
-            return "intermediate"
+        return analyze_resource("", title, description)["difficulty_enhanced"]
 
     def _determine_learning_styles_enhanced(self, resource_type: str) -> List[str]:
         """Enhanced learning style determination"""
@@ -1021,15 +1725,21 @@ class VertexAIClient:
         try:
             self._track_usage("generation", {"query": query, "content_count": len(content_items), "operation": "generate_learning_path"})
             
-            content_summary = self._create_content_summary(content_items)
-            prompt = self._create_learning_path_prompt(query, content_summary, preferences)
+            prompt = self._create_learning_path_prompt(query, RESOURCES_PLACEHOLDER, preferences)
+            prompt, _ = self.prompt_builder.build(
+                "learning_path_generation",
+                prompt,
+                content_items[:20],
+                ["title", "type", "source", "quality", "difficulty", "minutes", "snippet"]
+            )
             
             response = await self._execute_model_async(
                 prompt,
                 temperature=0.2,
                 max_tokens=8192,
                 top_p=0.95,
-                top_k=40
+                top_k=40,
+                operation="learning_path_generation"
             )
             
             learning_path = self._parse_learning_path_response(response, content_items)
@@ -1061,7 +1771,8 @@ class VertexAIClient:
                 temperature=0.3,
                 max_tokens=8192,
                 top_p=0.95,
-                top_k=40
+                top_k=40,
+                operation="customization"
             )
             
             # Parse the customized learning path
@@ -1082,19 +1793,6 @@ class VertexAIClient:
             learning_path["customization_error"] = str(e)
             return learning_path
 
-    def _create_content_summary(self, extracted_contents: List[Dict[str, Any]]) -> str:
-        """Create enhanced content summary with quality indicators"""
-        summaries = []
-        for i, content in enumerate(extracted_contents[:20]):
-            quality_indicator = "⭐" * int(content.get('quality_score', 0.5) * 5)
-            summary = f"{i+1}. {content['title']} ({content['resource_type']} from {content['source']}) {quality_indicator}"
-            summary += f"\nDescription: {content['description'][:200]}..."
-            summary += f"\nDifficulty: {content['difficulty']}, Time: {content['estimated_time_minutes']} min"
-            summary += f"\nLearning Styles: {', '.join(content.get('learning_styles', []))}"
-            summaries.append(summary)
-        
-        return "\n\n".join(summaries)
-
     def _create_learning_path_prompt(self, query: str, content_summary: str, preferences: Dict[str, Any] = None) -> str:
         """Enhanced prompt creation with better context"""
         preferences_str = json.dumps(preferences) if preferences else "{}"
@@ -1103,7 +1801,7 @@ class VertexAIClient:
         You are an expert educational content curator with deep knowledge of learning science and pedagogy. 
         Your task is to create a comprehensive, pedagogically sound learning path for: "{query}"
         
-        Available educational resources:
+        Available educational resources (one per row, "|"-separated):
         {content_summary}
         
         User preferences and constraints: {preferences_str}
@@ -1171,7 +1869,7 @@ class VertexAIClient:
             }
             current_structure.append(module_info)
         
-        current_structure_str = json.dumps(current_structure, indent=2)
+        current_structure_str = RESOURCES_PLACEHOLDER
         
         prompt = f"""
         You are an expert educational content curator. Your task is to customize an existing learning path based on new user preferences.
@@ -1182,7 +1880,7 @@ class VertexAIClient:
         Difficulty: {learning_path.get("difficulty", "intermediate")}
         Estimated Hours: {learning_path.get("estimated_hours", 0)}
         
-        CURRENT MODULE STRUCTURE:
+        CURRENT MODULE STRUCTURE (one module per row, "|"-separated):
         {current_structure_str}
         
         NEW USER PREFERENCES: {preferences_str}
@@ -1219,10 +1917,16 @@ class VertexAIClient:
         Ensure the customization maintains educational quality while meeting the user's new preferences.
         """
         
+        prompt, _ = self.prompt_builder.build(
+            "customization",
+            prompt,
+            current_structure,
+            ["title", "description", "resources_count", "estimated_hours"]
+        )
         return prompt
 
     async def _execute_model_async(self, prompt: str, temperature: float = 0.2, max_tokens: int = 4096,
-                                   top_p: float = 0.95, top_k: int = 40) -> str:
+                                   top_p: float = 0.95, top_k: int = 40, operation: str = "model_call") -> str:
         """Enhanced model execution with better error handling"""
         try:
             token_estimate = len(prompt.split()) * 1.3
@@ -1232,58 +1936,30 @@ class VertexAIClient:
                 "max_tokens": max_tokens
             })
             
-            generation_config = {
-                "temperature": temperature,
-                "max_output_tokens": max_tokens,
-                "top_p": top_p,
-                "top_k": top_k
-            }
-            
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(
-                None, 
-                lambda: self._execute_model_sync(prompt, generation_config)
-            )
-            
-        except Exception as e:
-            logger.error(f"Error executing enhanced model: {str(e)}")
-            return f'{{"error": "{str(e)}"}}'
-
-    def _execute_model_sync(self, prompt: str, generation_config: Dict[str, Any]) -> str:
-        """Enhanced synchronous model execution"""
-        try:
-            config = GenerationConfig(
-                temperature=generation_config.get("temperature", 0.2),
-                max_output_tokens=generation_config.get("max_output_tokens", 4096),
-                top_p=generation_config.get("top_p", 0.95),
-                top_k=generation_config.get("top_k", 40)
+            generation_config = genai.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_tokens,
+                top_p=top_p,
+                top_k=top_k
             )
             
-            response = self.model.generate_content(prompt, generation_config=config)
+            return await self._generate(prompt, generation_config, operation)
             
-            if hasattr(response, "text"):
-                return response.text
-            else:
-                return str(response)
-                
         except Exception as e:
-            logger.error(f"Enhanced model execution error: {str(e)}")
+            logger.error(f"Error executing enhanced model: {str(e)}")
             return f'{{"error": "{str(e)}"}}'
 
     def _parse_learning_path_response(self, response: str, extracted_contents: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Enhanced response parsing with better validation"""
-        try:
-            cleaned_response = self._clean_json_response(response)
-            learning_path = json.loads(cleaned_response)
-            
-            # Enhanced validation and enrichment
-            self._validate_and_enrich_learning_path(learning_path, extracted_contents)
-            
-            return learning_path
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {str(e)}")
+        learning_path = parse_json_response(response)
+        if not isinstance(learning_path, dict):
+            logger.error("JSON parsing error: no learning path object in response")
             return self._create_fallback_learning_path("Unknown Query", extracted_contents)
+        
+        # Enhanced validation and enrichment
+        self._validate_and_enrich_learning_path(learning_path, extracted_contents)
+        
+        return learning_path
 
     def _validate_and_enrich_learning_path(self, learning_path: Dict[str, Any], content_items: List[Dict[str, Any]]):
         """Validate and enrich the learning path structure"""
@@ -1460,7 +2136,8 @@ class VertexAIClient:
             response = await self._execute_model_async(
                 prompt,
                 temperature=0.2,  # Low temperature for consistent flashcard format
-                max_tokens=2048
+                max_tokens=2048,
+                operation="flashcards"
             )
             
             # Parse and validate flashcards
@@ -1488,10 +2165,10 @@ class VertexAIClient:
         
         instruction = difficulty_instructions.get(difficulty, difficulty_instructions["intermediate"])
         
-        return f"""
+        prompt = f"""
         You are an expert educational content creator. Generate {num_cards} high-quality study flashcards from the following content.
 
-        CONTENT: {content}
+        CONTENT: {RESOURCES_PLACEHOLDER}
 
         REQUIREMENTS:
         - Difficulty level: {difficulty} - {instruction}
@@ -1519,50 +2196,37 @@ class VertexAIClient:
 
         Generate exactly {num_cards} flashcards. Ensure the JSON is valid and properly formatted.
         """
+        # The content may be long user text; truncate it to the input budget
+        return self.prompt_builder.fit_text("flashcards", prompt, RESOURCES_PLACEHOLDER, content)
 
     def _parse_flashcard_response(self, response: str) -> List[Dict[str, Any]]:
         """Parse AI response into structured flashcard data with robust error handling"""
-        try:
-            # Clean the response and extract JSON
-            cleaned_response = self._clean_json_response(response)
-            
-            # Try to extract JSON array
-            json_start = cleaned_response.find('[')
-            json_end = cleaned_response.rfind(']') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_str = cleaned_response[json_start:json_end]
-                flashcards = json.loads(json_str)
-                
-                # Validate structure
-                validated_flashcards = []
-                for i, card in enumerate(flashcards):
-                    if isinstance(card, dict) and "question" in card and "answer" in card:
-                        validated_card = {
-                            "id": f"card_{i+1}",
-                            "question": str(card.get("question", "")).strip(),
-                            "answer": str(card.get("answer", "")).strip(),
-                            "hint": str(card.get("hint", "")).strip(),
-                            "topic": str(card.get("topic", "General")).strip()
-                        }
-                        
-                        # Only add if question and answer are non-empty
-                        if validated_card["question"] and validated_card["answer"]:
-                            validated_flashcards.append(validated_card)
-                
-                if validated_flashcards:
-                    return validated_flashcards
-                else:
-                    raise ValueError("No valid flashcards found in response")
-            else:
-                raise ValueError("Could not extract valid JSON array from response")
+        flashcards = parse_json_response(response)
+        if isinstance(flashcards, dict):
+            flashcards = flashcards.get("flashcards")
+        if not isinstance(flashcards, list):
+            logger.error("JSON parsing error in flashcard response: no flashcard array")
+            raise ValueError("Could not extract valid JSON array from response")
+        
+        # Validate structure
+        validated_flashcards = []
+        for i, card in enumerate(flashcards):
+            if isinstance(card, dict) and "question" in card and "answer" in card:
+                validated_card = {
+                    "id": f"card_{i+1}",
+                    "question": str(card.get("question", "")).strip(),
+                    "answer": str(card.get("answer", "")).strip(),
+                    "hint": str(card.get("hint", "")).strip(),
+                    "topic": str(card.get("topic", "General")).strip()
+                }
                 
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error in flashcard response: {str(e)}")
-            raise ValueError(f"Invalid JSON in flashcard response: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error parsing flashcard response: {str(e)}")
-            raise
+                # Only add if question and answer are non-empty
+                if validated_card["question"] and validated_card["answer"]:
+                    validated_flashcards.append(validated_card)
+        
+        if not validated_flashcards:
+            raise ValueError("No valid flashcards found in response")
+        return validated_flashcards
 
     def _enhance_flashcards(self, flashcards: List[Dict[str, Any]], difficulty: str) -> List[Dict[str, Any]]:
         """Enhance flashcards with additional metadata and features"""
@@ -1605,40 +2269,3 @@ class VertexAIClient:
             })
         
         return fallback_cards
-
-    def _clean_json_response(self, response: str) -> str:
-        """Clean and prepare response text for JSON parsing"""
-        if not response:
-            return ""
-        
-        # Remove common markdown code block markers
-        response = response.replace("```json", "").replace("```", "")
-        
-        # Remove extra whitespace and newlines
-        response = response.strip()
-        
-        # Remove any leading/trailing text that might interfere with JSON parsing
-        lines = response.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('//'):
-                cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
-        """Enhanced JSON cleaning with multiple fallback strategies"""
-        # Remove markdown indicators
-        response = response.replace("```json", "").replace("```", "")
-        
-        # Remove potential prefixes/suffixes
-        response = response.strip()
-        
-        # Find JSON object boundaries
-        start_idx = response.find('{')
-        end_idx = response.rfind('}')
-        
-        if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-            response = response[start_idx:end_idx + 1]
-        
-        return response